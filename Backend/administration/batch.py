@@ -0,0 +1,454 @@
+"""
+Transactional batch writes for the admin editor: one request creating,
+updating and deleting backgrounds, decks, project cards and pages.
+
+Rows created by the batch get a client chosen `ref`; later operations use it
+wherever an id is expected, so a deck, its cards and their pages can be built
+in one request. Every operation is validated before anything is written, with
+each referenced row fetched in one `in_bulk` query per model. The batch is
+then applied in one transaction as deletes (leaving tombstones for
+`changes`), creates (in dependency order) and updates, each a bulk query per
+model. Updates bump the row versions (see `versioning`), so editors holding an
+older ETag get a 412 afterwards.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException, ValidationError
+
+from portfolio.cache import invalidate
+from portfolio.models import (
+    BackgroundData,
+    Deck,
+    ImageReferencing,
+    PagesModel,
+    ProjectCard,
+    SlugEntry,
+)
+from portfolio.sprites import schedule_deck_sprites
+
+from .changes import TOMBSTONE_NAMES, record_deletions
+from .models import ImageUpload, Tombstone
+from .serializers import (
+    BackgroundDataSerializer,
+    DeckSerializer,
+    PagesModelSerializer,
+    ProjectCardSerializer,
+)
+
+
+class BatchConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The batch conflicts with the stored rows."
+    default_code = "batch_conflict"
+
+
+class RefField(serializers.Field):
+    """Id of a stored row, or the `ref` of a row created earlier in the batch."""
+
+    default_error_messages = {
+        "invalid": "Expected an id or the ref of an earlier create.",
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)) or data == "":
+            self.fail("invalid")
+        return data
+
+    def to_representation(self, value):
+        return value
+
+
+# Field validation only: relations are resolved by the batch, in bulk.
+
+
+class BatchBackgroundDataSerializer(BackgroundDataSerializer):
+    owner = serializers.CharField(max_length=50)
+
+
+class BatchDeckSerializer(DeckSerializer):
+    owner = serializers.CharField(max_length=50)
+
+
+class BatchProjectCardSerializer(ProjectCardSerializer):
+    owner = serializers.CharField(max_length=50)
+    deck_id = RefField()
+
+
+class BatchPagesModelSerializer(PagesModelSerializer):
+    owner = serializers.CharField(max_length=50)
+    project_card_id = RefField(required=False)
+
+    class Meta(PagesModelSerializer.Meta):
+        validators = []
+
+
+@dataclass(frozen=True)
+class BatchModel:
+    model: type
+    serializer: type
+    # Validated field -> (model attribute, target), targets being "slug",
+    # "image" or a batch model name.
+    relations: dict = field(default_factory=dict)
+
+
+OWNER = {"owner": ("owner", "slug")}
+
+BATCH_MODELS = {
+    "background": BatchModel(BackgroundData, BatchBackgroundDataSerializer, OWNER),
+    "deck": BatchModel(
+        Deck,
+        BatchDeckSerializer,
+        {
+            **OWNER,
+            "image_id": ("image", "image"),
+            "hover_img_id": ("hover_img", "image"),
+        },
+    ),
+    "project_card": BatchModel(
+        ProjectCard,
+        BatchProjectCardSerializer,
+        {**OWNER, "image_id": ("image", "image"), "deck_id": ("deck", "deck")},
+    ),
+    "page": BatchModel(
+        PagesModel,
+        BatchPagesModelSerializer,
+        {**OWNER, "project_card_id": ("project_card", "project_card")},
+    ),
+}
+
+# Deletes run children first, creates parents first.
+DELETE_ORDER = ("page", "project_card", "deck", "background")
+CREATE_ORDER = ("background", "deck", "project_card", "page")
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=["create", "update", "delete"])
+    model = serializers.ChoiceField(choices=list(BATCH_MODELS))
+    id = serializers.IntegerField(required=False, help_text="Row to update or delete")
+    ref = serializers.CharField(
+        required=False,
+        max_length=50,
+        help_text="Temporary id of a created row, usable by later operations",
+    )
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] != "create" and "id" not in attrs:
+            raise ValidationError({"id": "Updates and deletes need an id."})
+        if attrs["op"] != "delete" and "data" not in attrs:
+            raise ValidationError({"data": "Creates and updates need data."})
+        return attrs
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(
+        many=True, allow_empty=False, max_length=settings.BATCH_MAX_OPERATIONS
+    )
+
+
+class BatchResultSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    op = serializers.CharField()
+    model = serializers.CharField()
+    id = serializers.IntegerField()
+    ref = serializers.CharField(required=False)
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    status = serializers.CharField()
+    results = BatchResultSerializer(many=True)
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class Batch:
+    """Validates a list of operations, then applies them with `apply`."""
+
+    def __init__(self, operations):
+        self.operations = operations
+        self.created = {}
+        self.deleted = set()
+        self.creates = defaultdict(list)
+        self.updates = defaultdict(dict)
+        self.deletes = defaultdict(list)
+        # (model, pk) of updated rows -> owner id before the batch.
+        self.owners = {}
+        self.slugs = set()
+        self.sprite_slugs = set()
+        self.results = []
+
+        self.validated = self._validate_fields()
+        self.rows = self._fetch_rows()
+        self._plan()
+
+    def _validate_fields(self):
+        errors, validated = {}, []
+        for index, operation in enumerate(self.operations):
+            if operation["op"] == "delete":
+                validated.append({})
+                continue
+            serializer = BATCH_MODELS[operation["model"]].serializer(
+                data=operation["data"], partial=operation["op"] == "update"
+            )
+            if serializer.is_valid():
+                validated.append(serializer.validated_data)
+            else:
+                errors[str(index)] = serializer.errors
+        if errors:
+            raise ValidationError({"operations": errors})
+        return validated
+
+    def _fetch_rows(self):
+        wanted = defaultdict(set)
+        page_cards = set()
+        for operation, data in zip(self.operations, self.validated):
+            spec = BATCH_MODELS[operation["model"]]
+            if "id" in operation:
+                wanted[operation["model"]].add(operation["id"])
+            for name, (attr, target) in spec.relations.items():
+                value = data.get(name)
+                if _is_id(value) or (target == "slug" and value):
+                    wanted[target].add(value)
+            if operation["model"] == "page" and _is_id(data.get("project_card_id")):
+                page_cards.add(data["project_card_id"])
+
+        rows = {
+            "slug": SlugEntry.objects.in_bulk(wanted["slug"], field_name="slug"),
+            "image": ImageUpload.objects.only("id").in_bulk(wanted["image"]),
+        }
+        for name, spec in BATCH_MODELS.items():
+            queryset = spec.model.objects.select_related("owner")
+            rows[name] = queryset.in_bulk(wanted[name])
+
+        # Project cards getting a page, and the page they already have.
+        self.card_pages = dict(
+            PagesModel.objects.filter(project_card_id__in=page_cards).values_list(
+                "project_card_id", "id"
+            )
+            if page_cards
+            else ()
+        )
+        return rows
+
+    def _resolve(self, target, value):
+        if value is None:
+            return None
+        if target == "slug":
+            entry = self.rows["slug"].get(value)
+            if entry is None:
+                raise ValidationError(f"Unknown slug '{value}'.")
+            return entry
+        if not _is_id(value):
+            created = self.created.get(value)
+            if created is None or created[0] != target:
+                raise ValidationError(f"No {target} was created as '{value}' before.")
+            return created[1]
+        instance = self.rows[target].get(value)
+        if instance is None:
+            raise ValidationError(f"Invalid {target} id {value}.")
+        if (target, value) in self.deleted:
+            raise ValidationError(f"{target} {value} is deleted earlier in the batch.")
+        return instance
+
+    def _assign(self, spec, instance, data):
+        errors = {}
+        for name, value in data.items():
+            relation = spec.relations.get(name)
+            if relation is None:
+                setattr(instance, name, value)
+                continue
+            attr, target = relation
+            try:
+                setattr(instance, attr, self._resolve(target, value))
+            except ValidationError as exc:
+                errors[name] = exc.detail
+        if errors:
+            raise ValidationError(errors)
+
+    def _check_page(self, instance):
+        card = instance.project_card
+        if card is None:
+            return
+        key = card.pk if card.pk is not None else id(card)
+        page_id = self.card_pages.get(key)
+        if page_id is not None and page_id != instance.pk:
+            if ("page", page_id) not in self.deleted:
+                raise ValidationError(
+                    {"project_card_id": "A page for this project card already exists."}
+                )
+        self.card_pages[key] = instance.pk
+
+    def _target(self, operation):
+        model, pk = operation["model"], operation["id"]
+        instance = self.rows[model].get(pk)
+        if instance is None:
+            raise ValidationError({"id": f"Invalid {model} id {pk}."})
+        if (model, pk) in self.deleted:
+            raise ValidationError({"id": f"{model} {pk} is deleted earlier."})
+        return instance
+
+    def _check_unused(self, model, pk):
+        """Rejects deleting a row that earlier creates or updates point at."""
+        for name, spec in BATCH_MODELS.items():
+            pending = self.creates[name] + [
+                instance for instance, _ in self.updates[name].values()
+            ]
+            for attr, target in spec.relations.values():
+                if target != model:
+                    continue
+                if any(getattr(row, f"{attr}_id") == pk for row in pending):
+                    raise ValidationError(
+                        {"id": f"{model} {pk} is used by an earlier operation."}
+                    )
+
+    def _plan_operation(self, operation, data):
+        model = operation["model"]
+        spec = BATCH_MODELS[model]
+
+        if operation["op"] == "create":
+            ref = operation.get("ref")
+            if ref is not None and ref in self.created:
+                raise ValidationError({"ref": f"'{ref}' is already used."})
+            instance = spec.model()
+            self._assign(spec, instance, data)
+            if model == "page":
+                self._check_page(instance)
+            if ref is not None:
+                self.created[ref] = (model, instance)
+            self.creates[model].append(instance)
+            self.slugs.add(instance.owner.slug)
+            if model == "deck" and (instance.image or instance.hover_img):
+                self.sprite_slugs.add(instance.owner.slug)
+            return instance
+
+        instance = self._target(operation)
+        slug = instance.owner.slug
+        self.slugs.add(slug)
+        if operation["op"] == "delete":
+            self._check_unused(model, instance.pk)
+            self.deleted.add((model, instance.pk))
+            self.updates[model].pop(instance.pk, None)
+            self.owners.pop((model, instance.pk), None)
+            self.deletes[model].append(instance)
+            if model == "deck" and (instance.image_id or instance.hover_img_id):
+                self.sprite_slugs.add(slug)
+            return instance
+
+        images = (instance.image_id, instance.hover_img_id) if model == "deck" else None
+        self.owners.setdefault((model, instance.pk), instance.owner_id)
+        self._assign(spec, instance, data)
+        if model == "page" and "project_card_id" in data:
+            self._check_page(instance)
+        _, fields = self.updates[model].setdefault(instance.pk, (instance, set()))
+        fields.update(spec.relations.get(name, (name,))[0] for name in data)
+        self.slugs.add(instance.owner.slug)
+        if images is not None and (
+            slug != instance.owner.slug
+            or images != (instance.image_id, instance.hover_img_id)
+        ):
+            self.sprite_slugs.update((slug, instance.owner.slug))
+        return instance
+
+    def _plan(self):
+        errors = {}
+        for index, (operation, data) in enumerate(zip(self.operations, self.validated)):
+            try:
+                instance = self._plan_operation(operation, data)
+            except ValidationError as exc:
+                errors[str(index)] = exc.detail
+                continue
+            self.results.append((index, operation, instance))
+        if errors:
+            raise ValidationError({"operations": errors})
+
+    def apply(self):
+        """
+        Writes the batch in one transaction and returns a result per
+        operation. Raises BatchConflict when a constraint rejects it or a
+        row to update is gone.
+        """
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                deleted = [
+                    BATCH_MODELS[name].model.objects.filter(
+                        pk__in=[instance.pk for instance in self.deletes[name]]
+                    )
+                    for name in DELETE_ORDER
+                    if self.deletes[name]
+                ]
+                if deleted:
+                    record_deletions(*deleted)
+                for name in DELETE_ORDER:
+                    if self.deletes[name]:
+                        BATCH_MODELS[name].model.objects.filter(
+                            pk__in=[instance.pk for instance in self.deletes[name]]
+                        ).delete()
+
+                for name in CREATE_ORDER:
+                    model = BATCH_MODELS[name].model
+                    if self.creates[name]:
+                        model.objects.bulk_create(self.creates[name])
+                        if issubclass(model, ImageReferencing):
+                            model.bulk_sync_references(self.creates[name], created=True)
+
+                for name, updates in self.updates.items():
+                    if not updates:
+                        continue
+                    model = BATCH_MODELS[name].model
+                    instances = [instance for instance, _ in updates.values()]
+                    fields = {"edited_at", "version"}.union(
+                        *(fields for _, fields in updates.values())
+                    )
+                    for instance in instances:
+                        instance.edited_at = now
+                        instance.version = F("version") + 1
+                    # Rows deleted meanwhile, or by a cascade of this batch.
+                    if model.objects.bulk_update(instances, sorted(fields)) < len(
+                        instances
+                    ):
+                        raise BatchConflict(f"Some {name} rows no longer exist.")
+                    if issubclass(model, ImageReferencing):
+                        model.bulk_sync_references(instances)
+
+                moved = [
+                    (self.updates[name][pk][0], owner_id)
+                    for (name, pk), owner_id in self.owners.items()
+                    if self.updates[name][pk][0].owner_id != owner_id
+                ]
+                if moved:
+                    Tombstone.objects.bulk_create(
+                        Tombstone(
+                            model=TOMBSTONE_NAMES[type(instance)],
+                            object_id=instance.pk,
+                            owner_id=owner_id,
+                        )
+                        for instance, owner_id in moved
+                    )
+
+                invalidate(*self.slugs)
+                schedule_deck_sprites(*self.sprite_slugs)
+        except IntegrityError as exc:
+            raise BatchConflict() from exc
+
+        results = []
+        for index, operation, instance in self.results:
+            result = {
+                "index": index,
+                "op": operation["op"],
+                "model": operation["model"],
+                "id": instance.pk,
+            }
+            if "ref" in operation:
+                result["ref"] = operation["ref"]
+            results.append(result)
+        return results
@@ -0,0 +1,201 @@
+"""
+Delta sync for the admin workspace: the decks, project cards, pages,
+backgrounds and images of a slug created, edited or deleted since a cursor,
+so clients apply the difference instead of reloading every list.
+
+Changed rows are found through the `sort_ts`, `created_at` / `edited_at` and
+`uploaded_at` columns. Deleted rows, and rows moved to another slug, leave a
+Tombstone for the slug they left. Write timestamps are taken before their
+transaction commits, so cursors point CHANGES_CURSOR_OVERLAP_SECONDS back and
+a row may be sent twice.
+"""
+
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from portfolio.fast_serializers import (
+    deck_rows,
+    project_card_rows,
+    serialize_decks,
+    serialize_project_cards,
+)
+from portfolio.models import BackgroundData, Deck, PagesModel, ProjectCard
+from portfolio.queries import listed_images
+
+from .models import ImageUpload, Tombstone
+from .serializers import (
+    BackgroundDataSerializer,
+    DeckSerializer,
+    ImageListSerializer,
+    PagesModelSerializer,
+    ProjectCardSerializer,
+)
+
+TOMBSTONE_NAMES = {
+    Deck: "deck",
+    ProjectCard: "project_card",
+    PagesModel: "page",
+    BackgroundData: "background",
+    ImageUpload: "image",
+}
+
+# Rows deleted along with the rows of a model, and the lookup finding them.
+CASCADES = {
+    Deck: ((ProjectCard, "deck__in"), (PagesModel, "project_card__deck__in")),
+    ProjectCard: ((PagesModel, "project_card__in"),),
+}
+
+
+def record_deletions(*querysets):
+    """
+    Tombstones the rows of `querysets` and the rows deleting them cascades
+    to, in two queries. Call it in the deleting transaction, before deleting.
+    """
+    parts = []
+    for queryset in querysets:
+        parts.append(queryset)
+        parts.extend(
+            model.objects.filter(**{lookup: queryset.values("pk")})
+            for model, lookup in CASCADES.get(queryset.model, ())
+        )
+    rows = [
+        part.order_by()
+        .annotate(tombstone_model=Value(TOMBSTONE_NAMES[part.model]))
+        .values_list("tombstone_model", "pk", "owner_id")
+        for part in parts
+    ]
+    now = timezone.now()
+    Tombstone.objects.bulk_create(
+        Tombstone(model=model, object_id=pk, owner_id=owner_id, deleted_at=now)
+        for model, pk, owner_id in rows[0].union(*rows[1:])
+        if owner_id is not None
+    )
+
+
+def record_move(instance, old_owner_id):
+    """Tombstones `instance` for the slug it left, when its owner changed."""
+    if instance.owner_id != old_owner_id:
+        Tombstone.objects.create(
+            model=TOMBSTONE_NAMES[type(instance)],
+            object_id=instance.pk,
+            owner_id=old_owner_id,
+        )
+
+
+def encode_cursor(moment):
+    payload = json.dumps({"t": moment.isoformat()})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        moment = parse_datetime(json.loads(base64.urlsafe_b64decode(cursor))["t"])
+    except (TypeError, ValueError, KeyError):
+        moment = None
+    if moment is None:
+        raise ValidationError({"since": "Invalid cursor."})
+    return moment
+
+
+class DeletedRowsSerializer(serializers.Serializer):
+    deck = serializers.ListField(child=serializers.IntegerField())
+    project_card = serializers.ListField(child=serializers.IntegerField())
+    page = serializers.ListField(child=serializers.IntegerField())
+    background = serializers.ListField(child=serializers.IntegerField())
+    image = serializers.ListField(child=serializers.IntegerField())
+
+
+class ChangesSerializer(serializers.Serializer):
+    cursor = serializers.CharField(help_text="`since` of the next sync")
+    reset = serializers.BooleanField(
+        help_text="The rows are the whole state of the slug: drop what is not in them"
+    )
+    decks = DeckSerializer(many=True)
+    project_cards = ProjectCardSerializer(many=True)
+    pages = PagesModelSerializer(many=True)
+    backgrounds = BackgroundDataSerializer(many=True)
+    images = ImageListSerializer(many=True)
+    deleted = DeletedRowsSerializer(help_text="Ids of rows the slug no longer has")
+
+
+def changes_since(entry, since=None):
+    """
+    Returns the changes of the slug `entry` since the cursor time `since`, or
+    its whole state when there is none or it predates the kept tombstones.
+    """
+    now = timezone.now()
+    retention = timedelta(days=settings.CHANGES_TOMBSTONE_DAYS)
+    reset = since is None or since < now - retention
+
+    def changed(queryset, *fields):
+        if reset:
+            return queryset
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f"{field}__gt": since})
+        return queryset.filter(condition)
+
+    decks = serialize_decks(
+        deck_rows(changed(Deck.objects.filter(owner=entry), "sort_ts"))
+    )
+    cards = serialize_project_cards(
+        project_card_rows(changed(ProjectCard.objects.filter(owner=entry), "sort_ts"))
+    )
+    pages = PagesModelSerializer(
+        changed(
+            PagesModel.objects.filter(owner=entry).select_related("owner"), "sort_ts"
+        ),
+        many=True,
+    ).data
+    backgrounds = BackgroundDataSerializer(
+        changed(
+            BackgroundData.objects.filter(owner=entry).select_related("owner"),
+            "created_at",
+            "edited_at",
+        ),
+        many=True,
+    ).data
+    images = ImageListSerializer(
+        changed(listed_images().filter(owner=entry), "uploaded_at", "updated_at"),
+        many=True,
+    ).data
+
+    deleted = {name: [] for name in TOMBSTONE_NAMES.values()}
+    if not reset:
+        # Rows moved away and back again are alive.
+        alive = {
+            "deck": {row["id"] for row in decks},
+            "project_card": {row["id"] for row in cards},
+            "page": {row["id"] for row in pages},
+            "background": {row["id"] for row in backgrounds},
+            "image": {row["id"] for row in images},
+        }
+        tombstones = (
+            Tombstone.objects.filter(owner=entry, deleted_at__gt=since)
+            .values_list("model", "object_id")
+            .order_by("object_id")
+        )
+        for model, pk in tombstones.distinct():
+            if pk not in alive[model]:
+                deleted[model].append(pk)
+
+    return {
+        "cursor": encode_cursor(
+            now - timedelta(seconds=settings.CHANGES_CURSOR_OVERLAP_SECONDS)
+        ),
+        "reset": reset,
+        "decks": decks,
+        "project_cards": cards,
+        "pages": pages,
+        "backgrounds": backgrounds,
+        "images": images,
+        "deleted": deleted,
+    }
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from PIL import UnidentifiedImageError
+
+from administration.metadata import METADATA_FIELDS
+from administration.models import ImageUpload
+from administration.previews import variant_preview_metadata
+from portfolio.cache import invalidate
+from portfolio.models import Deck, ProjectCard
+
+
+class Command(BaseCommand):
+    help = (
+        "Computes width, height, aspect ratio, dominant color and placeholder "
+        "for ImageUpload rows that have none yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--all",
+            dest="recompute",
+            action="store_true",
+            help="Recompute the metadata of every image, not only missing ones.",
+        )
+
+    def handle(self, *args, batch_size, recompute, **options):
+        images = ImageUpload.objects.exclude(image="").order_by("id")
+        if not recompute:
+            images = images.filter(Q(width__isnull=True) | Q(placeholder=""))
+
+        updated = failed = 0
+        batch = []
+        for image in images.iterator(chunk_size=batch_size):
+            try:
+                with image.image.open("rb") as file:
+                    image.fill_metadata(file)
+                if not image.placeholder:
+                    for field, value in variant_preview_metadata(
+                        image.image.name
+                    ).items():
+                        setattr(image, field, value)
+            except (OSError, UnidentifiedImageError) as exc:
+                failed += 1
+                self.stderr.write(f"{image.id} {image.image.name}: {exc}")
+                continue
+
+            batch.append(image)
+            if len(batch) >= batch_size:
+                updated += self._save(batch)
+                batch = []
+        updated += self._save(batch)
+
+        owners = set(Deck.objects.values_list("owner__slug", flat=True))
+        owners.update(ProjectCard.objects.values_list("owner__slug", flat=True))
+        invalidate(*owners)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Updated {updated} images, {failed} failed.")
+        )
+
+    def _save(self, batch):
+        now = timezone.now()
+        for image in batch:
+            image.updated_at = now
+        ImageUpload.objects.bulk_update(batch, [*METADATA_FIELDS, "updated_at"])
+        return len(batch)
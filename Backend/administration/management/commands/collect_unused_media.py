@@ -0,0 +1,180 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from administration import variants
+from administration.changes import record_deletions
+from administration.models import ImageUpload, MediaBlob
+from administration.storage import UPLOAD_DIR, image_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes upload files that no image row points at, variants of images "
+        "that are gone or at qualities and widths no longer served and, with "
+        "--unreferenced, images no deck, project card or page uses. Only "
+        "files and images older than --min-age-hours are considered."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--min-age-hours", type=float, default=24)
+        parser.add_argument(
+            "--unreferenced",
+            action="store_true",
+            help="Also delete images without any ImageReference.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be deleted without deleting anything.",
+        )
+
+    def handle(
+        self, *args, batch_size, min_age_hours, unreferenced, dry_run, **options
+    ):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.cutoff = timezone.now() - timedelta(hours=min_age_hours)
+        verb = "Would delete" if dry_run else "Deleted"
+
+        if unreferenced:
+            images = self.collect_unreferenced_images()
+            self.stdout.write(f"{verb} {images} unreferenced images.")
+        files, size = self.collect_orphaned_files()
+        self.stdout.write(f"{verb} {files} orphaned files ({size} bytes).")
+        files, size = self.collect_stale_variants()
+        self.stdout.write(f"{verb} {files} stale variants ({size} bytes).")
+
+    def collect_unreferenced_images(self):
+        candidates = ImageUpload.objects.filter(
+            references__isnull=True, uploaded_at__lt=self.cutoff
+        ).order_by("id")
+
+        deleted = last_id = 0
+        while True:
+            ids = list(
+                candidates.filter(id__gt=last_id).values_list("id", flat=True)[
+                    : self.batch_size
+                ]
+            )
+            if not ids:
+                return deleted
+            last_id = ids[-1]
+            if self.dry_run:
+                deleted += len(ids)
+                continue
+
+            with transaction.atomic():
+                # Recheck under lock: a reference may have been added since.
+                rows = list(
+                    ImageUpload.objects.select_for_update(of=("self",))
+                    .filter(id__in=ids, references__isnull=True)
+                    .values_list("id", "image")
+                )
+                unused = ImageUpload.objects.filter(id__in=[pk for pk, name in rows])
+                record_deletions(unused)
+                unused.delete()
+                MediaBlob.release(*(name for pk, name in rows if name))
+            deleted += len(rows)
+
+    def orphan_candidates(self):
+        storage = image_storage()
+        root = storage.path(UPLOAD_DIR)
+        cutoff = self.cutoff.timestamp()
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                if stat.st_mtime < cutoff:
+                    name = os.path.relpath(path, storage.location)
+                    yield name.replace(os.sep, "/"), stat.st_size
+
+    def collect_orphaned_files(self):
+        storage = image_storage()
+        deleted = freed = 0
+        batch = {}
+
+        def flush():
+            nonlocal deleted, freed
+            names = list(batch)
+            used = set(
+                MediaBlob.objects.filter(name__in=names).values_list("name", flat=True)
+            )
+            used.update(
+                ImageUpload.objects.filter(image__in=names).values_list(
+                    "image", flat=True
+                )
+            )
+            for name in names:
+                if name in used:
+                    continue
+                if not self.dry_run and not self.delete_untouched(storage, name):
+                    continue
+                deleted += 1
+                freed += batch[name]
+            batch.clear()
+
+        for name, size in self.orphan_candidates():
+            batch[name] = size
+            if len(batch) >= self.batch_size:
+                flush()
+        if batch:
+            flush()
+        return deleted, freed
+
+    def delete_untouched(self, storage, name):
+        """
+        Deletes the file `name` unless an upload deduplicated onto it since it
+        was listed. Moving it aside first makes the check atomic: an upload
+        touching it before the move shows in its mtime, one after the move
+        finds no file and writes its own copy.
+        """
+        path = storage.path(name)
+        aside = f"{path}.collecting"
+        try:
+            os.replace(path, aside)
+        except FileNotFoundError:
+            return False
+        if os.stat(aside).st_mtime >= self.cutoff.timestamp():
+            os.replace(aside, path)
+            return False
+        os.unlink(aside)
+        return True
+
+    def collect_stale_variants(self):
+        """Variants of gone images, or at a width or quality no longer served."""
+        widths = {*settings.IMAGE_VARIANT_WIDTHS, settings.DECK_SPRITE_TILE_WIDTH}
+        served = {
+            variants.variant_filename(width, quality, fmt)
+            for width in widths
+            for quality in settings.IMAGE_VARIANT_QUALITIES
+            for fmt in variants.FORMATS
+        }
+        names = ImageUpload.objects.exclude(image="").values_list("image", flat=True)
+        sources = {
+            variants.source_key(name)
+            for name in names.iterator(chunk_size=self.batch_size)
+        }
+
+        root = os.path.join(settings.MEDIA_ROOT, settings.IMAGE_VARIANT_DIR)
+        cutoff = self.cutoff.timestamp()
+        deleted = freed = 0
+        for directory, _, files in os.walk(root):
+            source = os.path.basename(directory)
+            for filename in files:
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                if stat.st_mtime >= cutoff or (
+                    source in sources and filename in served
+                ):
+                    continue
+                if not self.dry_run:
+                    os.unlink(path)
+                deleted += 1
+                freed += stat.st_size
+        return deleted, freed
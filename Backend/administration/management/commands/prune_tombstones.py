@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from administration.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes tombstones older than CHANGES_TOMBSTONE_DAYS. Clients syncing "
+        "from before then get the full state of their slug instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=None,
+            help="Age after which a tombstone is deleted.",
+        )
+
+    def handle(self, *args, days, **options):
+        if days is None:
+            days = settings.CHANGES_TOMBSTONE_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+
+        pruned, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(f"Pruned {pruned} tombstones.")
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from administration.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes resumable upload sessions, and their part files, that have "
+        "not received a chunk for UPLOAD_SESSION_EXPIRY_HOURS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=float,
+            default=None,
+            help="Idle time after which a session expires.",
+        )
+
+    def handle(self, *args, hours, **options):
+        if hours is None:
+            hours = settings.UPLOAD_SESSION_EXPIRY_HOURS
+        cutoff = timezone.now() - timedelta(hours=hours)
+
+        purged = 0
+        for session in UploadSession.objects.filter(edited_at__lt=cutoff).iterator():
+            session.delete()
+            purged += 1
+        self.stdout.write(f"Purged {purged} upload sessions.")
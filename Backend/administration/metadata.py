@@ -0,0 +1,74 @@
+"""
+Metadata stored with every ImageUpload so clients can reserve layout and
+paint a placeholder before the image itself arrives.
+"""
+
+import base64
+import io
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+DOMINANT_COLOR_SAMPLE = 64
+DOMINANT_COLOR_PALETTE = 8
+
+# Keys of the `*_meta` objects in deck and project card responses.
+METADATA_FIELDS = ("width", "height", "aspect_ratio", "dominant_color", "placeholder")
+
+
+def _dominant_color(image):
+    sample = image.convert("RGB")
+    sample.thumbnail((DOMINANT_COLOR_SAMPLE, DOMINANT_COLOR_SAMPLE))
+    quantized = sample.quantize(colors=DOMINANT_COLOR_PALETTE)
+    count, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3 : index * 3 + 3]
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def _placeholder(image):
+    """Tiny blurred-up WebP preview (LQIP) as a data URI, a few hundred bytes."""
+    preview = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    height = max(1, round(preview.height * PLACEHOLDER_WIDTH / preview.width))
+    preview = preview.resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR)
+    buffer = io.BytesIO()
+    preview.save(buffer, "WEBP", quality=PLACEHOLDER_QUALITY)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def preview_metadata(image):
+    """Dominant color and placeholder of a decoded image."""
+    return {
+        "dominant_color": _dominant_color(image),
+        "placeholder": _placeholder(image),
+    }
+
+
+def image_metadata(file):
+    """
+    Returns width, height, aspect ratio, dominant color and placeholder of an
+    image file, as displayed (EXIF orientation applied). Color and placeholder
+    are left empty for sources over IMAGE_METADATA_INLINE_PIXELS even after a
+    reduced decode; `administration.previews` fills them later.
+    """
+    if hasattr(file, "seek"):
+        file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in (5, 6, 7, 8):
+            width, height = height, width
+        metadata = {
+            "width": width,
+            "height": height,
+            "aspect_ratio": round(width / height, 4),
+            "dominant_color": "",
+            "placeholder": "",
+        }
+        # Color and placeholder only need a small decode of JPEG sources.
+        image.draft("RGB", (DOMINANT_COLOR_SAMPLE, DOMINANT_COLOR_SAMPLE))
+        if image.width * image.height <= settings.IMAGE_METADATA_INLINE_PIXELS:
+            metadata.update(preview_metadata(ImageOps.exif_transpose(image)))
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return metadata
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:30
+
+import administration.models
+import administration.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_references(apps, schema_editor):
+    ImageUpload = apps.get_model('administration', 'ImageUpload')
+    MediaBlob = apps.get_model('administration', 'MediaBlob')
+    references = ImageUpload.objects.exclude(image='').values('image').annotate(count=Count('id'))
+    MediaBlob.objects.bulk_create(
+        MediaBlob(name=row['image'], ref_count=row['count']) for row in references
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0002_alter_imageupload_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='imageupload',
+            name='image',
+            field=models.ImageField(storage=administration.storage.image_storage, upload_to=administration.models.upload_dynamicly),
+        ),
+        migrations.RunPython(count_existing_references, migrations.RunPython.noop),
+    ]
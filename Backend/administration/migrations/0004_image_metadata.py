@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0003_media_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='aspect_ratio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='dominant_color',
+            field=models.CharField(blank=True, default='', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='placeholder',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:44
+
+import re
+
+from django.db import migrations, models
+
+LEGACY_PATH_RE = re.compile(r'^uploads/([^/]+)/[^/]+$')
+
+
+def backfill_owner(apps, schema_editor):
+    """
+    Owner from the legacy `uploads/<slug>/<file>` path, or for content
+    addressed files from the first deck, project card or page using the image.
+    """
+    ImageUpload = apps.get_model('administration', 'ImageUpload')
+    ImageReference = apps.get_model('portfolio', 'ImageReference')
+
+    used_by = {}
+    references = ImageReference.objects.order_by('id').values_list(
+        'image_id', 'deck__owner', 'project_card__owner', 'page__owner'
+    )
+    for image_id, *owners in references:
+        used_by.setdefault(image_id, next(filter(None, owners), None))
+
+    updates = []
+    for pk, name in ImageUpload.objects.values_list('id', 'image').iterator():
+        match = LEGACY_PATH_RE.match(name or '')
+        owner = match.group(1) if match else used_by.get(pk)
+        if owner:
+            updates.append(ImageUpload(id=pk, owner=owner[:50]))
+    ImageUpload.objects.bulk_update(updates, ['owner'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0005_upload_session'),
+        ('portfolio', '0017_image_reference'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='uploadsession',
+            old_name='upload_slug',
+            new_name='owner',
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='owner',
+            field=models.CharField(default='shmooz', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='administrat_uploade_f675f5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['owner', '-uploaded_at', '-id'], name='administrat_owner_6c432d_idx'),
+        ),
+        migrations.RunPython(backfill_owner, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:56
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+backfill_model = import_module('portfolio.migrations.0019_owner_foreign_key').backfill_model
+
+
+def backfill_tenants(apps, schema_editor):
+    """Images and sessions of slugs without a SlugEntry are left without owner."""
+    SlugEntry = apps.get_model('portfolio', 'SlugEntry')
+    backfill_model(apps.get_model('administration', 'ImageUpload'), SlugEntry)
+    backfill_model(apps.get_model('administration', 'UploadSession'), SlugEntry)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('administration', '0006_image_owner'),
+        ('portfolio', '0019_owner_foreign_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='images', to='portfolio.slugentry'),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='portfolio.slugentry'),
+        ),
+        migrations.RunPython(backfill_tenants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0007_owner_foreign_key'),
+        ('portfolio', '0020_replace_owner_slugs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='imageupload',
+            name='administrat_owner_6c432d_idx',
+        ),
+        migrations.RemoveField(
+            model_name='imageupload',
+            name='owner',
+        ),
+        migrations.RemoveField(
+            model_name='uploadsession',
+            name='owner',
+        ),
+        migrations.RenameField(
+            model_name='imageupload',
+            old_name='tenant',
+            new_name='owner',
+        ),
+        migrations.RenameField(
+            model_name='uploadsession',
+            old_name='tenant',
+            new_name='owner',
+        ),
+        migrations.AlterField(
+            model_name='imageupload',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='images', to='portfolio.slugentry'),
+        ),
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='portfolio.slugentry'),
+        ),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['owner', '-uploaded_at', '-id'], name='administrat_owner_i_eb01e4_idx'),
+        ),
+    ]
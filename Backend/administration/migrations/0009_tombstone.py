@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("administration", "0008_replace_owner_slugs"),
+        ("portfolio", "0021_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=20)),
+                ("object_id", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tombstones",
+                        to="portfolio.slugentry",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["owner", "deleted_at"],
+                        name="administrat_owner_i_82c11f_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("administration", "0009_tombstone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imageupload",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
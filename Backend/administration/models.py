@@ -1,22 +1,193 @@
-from django.db import models
+import os
+import uuid
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .metadata import image_metadata
+from .storage import image_storage
 
 # Create your models here.
 
 
 def upload_dynamicly(instance, filename):
-    slug = getattr(instance, "upload_slug", "shmooz")
-    return f"uploads/{slug}/{filename}"
+    # ContentAddressedStorage names files by digest and drops this directory.
+    return f"uploads/{filename}"
+
+
+class MediaBlob(models.Model):
+    """Number of ImageUpload rows sharing one content addressed file."""
+
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+    @classmethod
+    def acquire(cls, *names):
+        """Adds one reference per name, creating missing blobs in one upsert."""
+        counts = Counter(names)
+        if not counts:
+            return
+        table = connection.ops.quote_name(cls._meta.db_table)
+        rows = ", ".join(["(%s, %s, %s)"] * len(counts))
+        sql = (
+            f"INSERT INTO {table} (name, ref_count, created_at) VALUES {rows} "
+            f"ON CONFLICT (name) DO UPDATE "
+            f"SET ref_count = {table}.ref_count + EXCLUDED.ref_count"
+        )
+        now = timezone.now()
+        params = [value for name, n in counts.items() for value in (name, n, now)]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @classmethod
+    def release(cls, *names):
+        """
+        Drops one reference per name and the blobs left without any. Their
+        files stay until `collect_unused_media` deletes them: deleting inline
+        would race with an upload of the same bytes deduplicated onto the file.
+        """
+        counts = Counter(names)
+        by_count = defaultdict(list)
+        for name, n in counts.items():
+            by_count[n].append(name)
+        for n, group in by_count.items():
+            cls.objects.filter(name__in=group, ref_count__gt=0).update(
+                ref_count=Greatest(F("ref_count") - n, 0)
+            )
+        cls.objects.filter(name__in=list(counts), ref_count=0).delete()
 
 
 class ImageUpload(models.Model):
     title = models.CharField(max_length=50)
-    image = models.ImageField(upload_to=upload_dynamicly)
+    owner = models.ForeignKey(
+        "portfolio.SlugEntry",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="images",
+    )
+    image = models.ImageField(upload_to=upload_dynamicly, storage=image_storage)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
-    upload_slug = None
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    aspect_ratio = models.FloatField(null=True, blank=True)
+    dominant_color = models.CharField(max_length=7, blank=True, default="")
+    placeholder = models.TextField(blank=True, default="")
+    # Part of the validators of responses embedding the image's data.
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["id"]
+        indexes = [
+            models.Index(fields=["-uploaded_at", "-id"]),
+            models.Index(fields=["owner", "-uploaded_at", "-id"]),
+        ]
 
     def __str__(self):
         return self.title
+
+    def fill_metadata(self, file=None):
+        """Sets dimensions, dominant color and placeholder from the image."""
+        for field, value in image_metadata(file or self.image).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding and self.image:
+                MediaBlob.acquire(self.image.name)
+
+    def delete(self, *args, **kwargs):
+        name = self.image.name
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if name:
+                MediaBlob.release(name)
+        return result
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload. Chunks are written in place into a part file under
+    MEDIA_ROOT/UPLOAD_SESSION_DIR; `received` is the length of the contiguous
+    prefix stored so far, where the client resumes.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    title = models.CharField(max_length=50)
+    filename = models.CharField(max_length=255)
+    owner = models.ForeignKey(
+        "portfolio.SlugEntry",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="upload_sessions",
+    )
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    edited_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    @property
+    def part_path(self):
+        return image_storage().path(f"{settings.UPLOAD_SESSION_DIR}/{self.pk}.part")
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            os.makedirs(os.path.dirname(self.part_path), exist_ok=True)
+            open(self.part_path, "wb").close()
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        path = self.part_path
+        result = super().delete(*args, **kwargs)
+
+        def remove():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+        transaction.on_commit(remove)
+        return result
+
+
+class Tombstone(models.Model):
+    """
+    A deleted deck, project card, page, background or image, or one moved to
+    another slug, kept so `/api/auth/changes/` can report it to clients that
+    synced before. Pruned by `prune_tombstones`.
+    """
+
+    owner = models.ForeignKey(
+        "portfolio.SlugEntry",
+        on_delete=models.CASCADE,
+        related_name="tombstones",
+    )
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["owner", "deleted_at"])]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id}"
@@ -0,0 +1,183 @@
+"""
+JSON Patch (RFC 6902) for page content, so the page editor sends the edit
+instead of the whole block list.
+
+The patch is applied to the stored content in memory and validated before
+anything is written: a failing operation leaves the row as it was. Only the
+blocks the operations touched are validated again; the others were valid when
+they were stored.
+"""
+
+import copy
+
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import JSONParser
+
+from .serializers import validate_block
+
+_UNSET = object()
+
+
+class PatchConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The patch does not apply to the stored content."
+    default_code = "patch_conflict"
+
+
+class JSONPatchParser(JSONParser):
+    media_type = "application/json-patch+json"
+
+
+class JSONPatchOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(
+        choices=["add", "remove", "replace", "move", "copy", "test"]
+    )
+    path = serializers.CharField(allow_blank=True, trim_whitespace=False)
+    value = serializers.JSONField(required=False, allow_null=True)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # `from` is a keyword, so it cannot be declared as an attribute.
+        fields["from"] = serializers.CharField(
+            required=False, allow_blank=True, trim_whitespace=False
+        )
+        return fields
+
+    def validate(self, attrs):
+        if attrs["op"] in ("add", "replace", "test") and "value" not in attrs:
+            raise serializers.ValidationError({"value": "This field is required."})
+        if attrs["op"] in ("move", "copy") and "from" not in attrs:
+            raise serializers.ValidationError({"from": "This field is required."})
+        return attrs
+
+
+def parse_pointer(pointer):
+    """Splits a JSON Pointer (RFC 6901) into its reference tokens."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchConflict(f"'{pointer}' is not a JSON Pointer.")
+    return [
+        token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")
+    ]
+
+
+def _index(container, token, pointer, append=False):
+    if append and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchConflict(f"'{pointer}' does not name an array index.")
+    index = int(token)
+    if index >= len(container) + append:
+        raise PatchConflict(f"'{pointer}' is out of range.")
+    return index
+
+
+def _child(container, token, pointer):
+    if isinstance(container, list):
+        return container[_index(container, token, pointer)]
+    if isinstance(container, dict) and token in container:
+        return container[token]
+    raise PatchConflict(f"'{pointer}' does not exist.")
+
+
+def _resolve(document, tokens, pointer):
+    for token in tokens:
+        document = _child(document, token, pointer)
+    return document
+
+
+def _add(document, tokens, value, pointer):
+    parent = _resolve(document, tokens[:-1], pointer)
+    if isinstance(parent, list):
+        parent.insert(_index(parent, tokens[-1], pointer, append=True), value)
+    elif isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        raise PatchConflict(f"'{pointer}' does not exist.")
+
+
+def _remove(document, tokens, pointer):
+    parent = _resolve(document, tokens[:-1], pointer)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, tokens[-1], pointer))
+    if isinstance(parent, dict) and tokens[-1] in parent:
+        return parent.pop(tokens[-1])
+    raise PatchConflict(f"'{pointer}' does not exist.")
+
+
+def apply_patch(content, operations):
+    """
+    Applies `operations` to `content` in place and returns the new content
+    with the blocks the operations touched. A whole-document replacement
+    touches every block. Raises PatchConflict when an operation does not
+    apply, leaving `content` partly patched.
+    """
+    touched = {}
+    replaced = False
+
+    def touch(tokens, pointer, value=_UNSET):
+        if len(tokens) > 1:
+            block = _child(content, tokens[0], pointer)
+        elif len(tokens) == 1 and value is not _UNSET:
+            block = value
+        else:
+            return
+        touched[id(block)] = block
+
+    for operation in operations:
+        op, pointer = operation["op"], operation["path"]
+        tokens = parse_pointer(pointer)
+        if op == "test":
+            if _resolve(content, tokens, pointer) != operation["value"]:
+                raise PatchConflict(f"The test of '{pointer}' failed.")
+            continue
+
+        if op in ("move", "copy"):
+            source = parse_pointer(operation["from"])
+            if op == "move" and tokens[: len(source)] == source and tokens != source:
+                raise PatchConflict("A value cannot be moved into itself.")
+            if op == "copy":
+                value = copy.deepcopy(_resolve(content, source, operation["from"]))
+            elif not source:
+                value = content
+            else:
+                touch(source, operation["from"])
+                value = _remove(content, source, operation["from"])
+        elif op == "remove":
+            if not tokens:
+                raise PatchConflict("The content itself cannot be removed.")
+            touch(tokens, pointer)
+            _remove(content, tokens, pointer)
+            continue
+        else:
+            value = operation["value"]
+
+        if not tokens:
+            content, replaced = value, True
+            continue
+        if op == "replace":
+            _remove(content, tokens, pointer)
+        # A block moved as a whole was valid where it was.
+        moved_block = op == "move" and len(tokens) == 1 and len(source) == 1
+        _add(content, tokens, value, pointer)
+        if not moved_block:
+            touch(tokens, pointer, value)
+
+    if replaced:
+        return content, content if isinstance(content, list) else []
+    return content, [block for block in content if id(block) in touched]
+
+
+def validate_patched_content(content, blocks):
+    """Validates the touched `blocks` of patched `content` like a PUT would."""
+    if not isinstance(content, list):
+        raise serializers.ValidationError(
+            {"content": ["Content must be a list of blocks."]}
+        )
+    for block in blocks:
+        try:
+            validate_block(block)
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({"content": exc.detail})
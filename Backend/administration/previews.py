@@ -0,0 +1,93 @@
+"""
+Dominant color and placeholder of uploads too large to decode in the request.
+
+Pillow can only decode JPEG at a reduced scale; other sources over
+IMAGE_METADATA_INLINE_PIXELS are stored without color and placeholder, which
+are filled once the upload commits from the smallest variant, rendered in the
+bounded variant pool (see `administration.variants`).
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+from portfolio.cache import invalidate
+from portfolio.models import Deck, ProjectCard
+
+from . import variants
+from .metadata import preview_metadata
+from .models import ImageUpload
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-preview")
+_queued = set()
+_queued_lock = threading.Lock()
+
+
+def variant_preview_metadata(name):
+    """Dominant color and placeholder of the stored image `name`."""
+    path = variants.get_variant(
+        image_storage(),
+        name,
+        min(settings.IMAGE_VARIANT_WIDTHS),
+        settings.IMAGE_VARIANT_DEFAULT_QUALITY,
+        "webp",
+    )
+    with Image.open(path) as image:
+        return preview_metadata(image)
+
+
+def fill_previews(pk):
+    """Fills the color and placeholder of the ImageUpload `pk` if it has none."""
+    image = ImageUpload.objects.filter(pk=pk, placeholder="").only("image").first()
+    if image is None:
+        return
+    values = variant_preview_metadata(image.image.name)
+    updated = ImageUpload.objects.filter(pk=pk, placeholder="").update(
+        **values, updated_at=timezone.now()
+    )
+    if updated:
+        owners = Deck.objects.filter(Q(image_id=pk) | Q(hover_img_id=pk))
+        cards = ProjectCard.objects.filter(image_id=pk)
+        invalidate(
+            *owners.values_list("owner__slug", flat=True),
+            *cards.values_list("owner__slug", flat=True),
+        )
+
+
+def _fill_in_background(pk):
+    try:
+        fill_previews(pk)
+    except Exception:
+        logger.exception("Filling the previews of image %s failed", pk)
+    finally:
+        with _queued_lock:
+            _queued.discard(pk)
+        connections.close_all()
+
+
+def _schedule(pk):
+    if not settings.IMAGE_PREVIEW_BACKGROUND:
+        fill_previews(pk)
+        return
+    with _queued_lock:
+        if pk in _queued:
+            return
+        _queued.add(pk)
+    _executor.submit(_fill_in_background, pk)
+
+
+def schedule_previews(*images):
+    """Fills the missing previews of saved `images` once the transaction commits."""
+    for image in images:
+        if image.pk and not image.placeholder:
+            transaction.on_commit(partial(_schedule, image.pk))
@@ -1,5 +1,6 @@
 import re
 
+from django.conf import settings
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
@@ -7,7 +8,11 @@ from rest_framework.exceptions import ValidationError
 
 from portfolio.models import BackgroundData, Deck, PagesModel, ProjectCard, SlugEntry
 
-from .models import ImageUpload
+from .metadata import METADATA_FIELDS
+from .models import ImageUpload, UploadSession
+from .uploads import ProbedImageField, UploadTooLarge
+from .variants import srcset, variant_url
+from .versioning import VersionedUpdateMixin
 
 GRID_TEMPLATE_RE = re.compile(
     r"^(repeat\(\d+,\s*(?:[a-zA-Z0-9().%\s-]+)\)|[a-zA-Z0-9().%\s-]+)+$"
@@ -93,25 +98,159 @@ def validate_link_item(value):
     return value
 
 
+def validate_block(block):
+    if not isinstance(block, dict):
+        raise ValidationError("Each block must be a dictionary.")
+
+    if "id" not in block or "content" not in block:
+        raise ValidationError("Each block must have 'id' and 'content'.")
+
+    if "gridTemplateColumns" not in block or "gridTemplateRows" not in block:
+        raise ValidationError("Each Block must have column and row templates")
+
+    col = block.get("gridTemplateColumns")
+    row = block.get("gridTemplateRows")
+    validate_grid_template(col)
+    validate_grid_template(row)
+
+    if not isinstance(block["content"], list):
+        raise ValidationError("Block 'content' must be a list.")
+
+    for item in block["content"]:
+        if not isinstance(item, dict) or "type" not in item or "id" not in item:
+            raise ValidationError("Each content item must have 'id' and 'type'.")
+
+        if "rowStart" not in item or "colStart" not in item:
+            raise ValidationError(f"{item['id']} does not have starting position")
+
+        if item["type"] not in ["image", "text", "link"]:
+            raise ValidationError(f"Unsupported content type: {item['type']}")
+
+        if item["type"] == "image":
+            validate_image_item(item)
+        if item["type"] == "text":
+            validate_text_item(item)
+        if item["type"] == "link":
+            validate_link_item(item)
+
+    return block
+
+
 class SlugEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = SlugEntry
         fields = ["id", "slug", "created_at", "edited_at"]
 
 
+class OwnerField(serializers.SlugRelatedField):
+    """The owning SlugEntry, read and written as its slug."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("slug_field", "slug")
+        if not kwargs.get("read_only"):
+            kwargs.setdefault("queryset", SlugEntry.objects.all())
+        super().__init__(**kwargs)
+
+
+class ImageMetadataSerializer(serializers.Serializer):
+    width = serializers.IntegerField()
+    height = serializers.IntegerField()
+    aspect_ratio = serializers.FloatField()
+    dominant_color = serializers.CharField()
+    placeholder = serializers.CharField(help_text="LQIP data URI")
+
+
+def image_meta(image_obj):
+    if image_obj is None or image_obj.width is None:
+        return None
+    return {field: getattr(image_obj, field) for field in METADATA_FIELDS}
+
+
 class ImageUploadSerializer(serializers.ModelSerializer):
+    owner = OwnerField(read_only=True)
+    image = ProbedImageField()
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ImageUpload
-        fields = ["id", "title", "image", "uploaded_at"]
+        fields = [
+            "id",
+            "title",
+            "owner",
+            "image",
+            "srcset",
+            "width",
+            "height",
+            "aspect_ratio",
+            "dominant_color",
+            "placeholder",
+            "uploaded_at",
+        ]
+        read_only_fields = [*METADATA_FIELDS]
+
+    @extend_schema_field(OpenApiTypes.STR)
+    def get_srcset(self, obj):
+        return srcset(obj.id, obj.image.name)
+
+
+class ImageListSerializer(serializers.ModelSerializer):
+    """
+    Compact image row for pickers: a thumbnail instead of the srcset and
+    placeholder, and the number of deck, project card and page uses.
+    """
+
+    thumbnail = serializers.SerializerMethodField()
+    usage_count = serializers.IntegerField(read_only=True)
+    owner = OwnerField(read_only=True)
+
+    class Meta:
+        model = ImageUpload
+        fields = [
+            "id",
+            "title",
+            "owner",
+            "image",
+            "thumbnail",
+            "width",
+            "height",
+            "dominant_color",
+            "usage_count",
+            "uploaded_at",
+        ]
+        read_only_fields = fields
+
+    @extend_schema_field(OpenApiTypes.STR)
+    def get_thumbnail(self, obj):
+        return variant_url(obj.id, obj.image.name, settings.IMAGE_THUMBNAIL_WIDTH)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    slug = OwnerField(source="owner", required=False)
+
+    class Meta:
+        model = UploadSession
+        fields = ["id", "title", "filename", "slug", "size", "received", "created_at"]
+        read_only_fields = ["id", "received", "created_at"]
+
+    def validate_size(self, value):
+        if value > settings.IMAGE_UPLOAD_MAX_BYTES:
+            raise UploadTooLarge()
+        if value == 0:
+            raise ValidationError("An upload cannot be empty.")
+        return value
 
 
 class PageNamesSerializer(serializers.ModelSerializer):
+    owner = OwnerField(read_only=True)
+
     class Meta:
         model = BackgroundData
         fields = ["id", "owner", "page1", "page2", "created_at", "edited_at"]
 
 
 class GradientColorsSerializer(serializers.ModelSerializer):
+    owner = OwnerField(read_only=True)
+
     class Meta:
         model = BackgroundData
         fields = [
@@ -129,6 +268,8 @@ class GradientColorsSerializer(serializers.ModelSerializer):
 
 
 class PageDetailsSerializer(serializers.ModelSerializer):
+    owner = OwnerField(read_only=True)
+
     class Meta:
         model = BackgroundData
         fields = [
@@ -143,7 +284,9 @@ class PageDetailsSerializer(serializers.ModelSerializer):
         ]
 
 
-class BackgroundDataSerializer(serializers.ModelSerializer):
+class BackgroundDataSerializer(VersionedUpdateMixin, serializers.ModelSerializer):
+    owner = OwnerField()
+
     class Meta:
         model = BackgroundData
         fields = [
@@ -163,17 +306,24 @@ class BackgroundDataSerializer(serializers.ModelSerializer):
             "ellipseHeight",
             "created_at",
             "edited_at",
+            "version",
         ]
+        read_only_fields = ["version"]
 
 
-class DeckSerializer(serializers.ModelSerializer):
+class DeckSerializer(VersionedUpdateMixin, serializers.ModelSerializer):
+    owner = OwnerField()
     image_id = serializers.IntegerField(write_only=True, required=True)
     hover_img_id = serializers.IntegerField(
         write_only=True, required=False, allow_null=True
     )
 
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    image_meta = serializers.SerializerMethodField()
     hover_img_url = serializers.SerializerMethodField()
+    hover_img_srcset = serializers.SerializerMethodField()
+    hover_img_meta = serializers.SerializerMethodField()
 
     class Meta:
         model = Deck
@@ -185,9 +335,13 @@ class DeckSerializer(serializers.ModelSerializer):
             "image",
             "image_id",
             "image_url",
+            "image_srcset",
+            "image_meta",
             "hover_img",
             "hover_img_id",
             "hover_img_url",
+            "hover_img_srcset",
+            "hover_img_meta",
             "card_amount",
             "x_offsets",
             "y_offsets",
@@ -200,10 +354,21 @@ class DeckSerializer(serializers.ModelSerializer):
             "hover_brightness",
             "created_at",
             "edited_at",
+            "version",
             "text_color",
             "hover_color",
         ]
-        read_only_fields = ["id", "image_url", "hover_img_url", "created_at"]
+        read_only_fields = [
+            "id",
+            "image_url",
+            "image_srcset",
+            "image_meta",
+            "hover_img_url",
+            "hover_img_srcset",
+            "hover_img_meta",
+            "created_at",
+            "version",
+        ]
 
     def create(self, validated_data):
         image_id = validated_data.pop("image_id")
@@ -249,7 +414,7 @@ class DeckSerializer(serializers.ModelSerializer):
 
         return data
 
-    def update(self, instance, validated_data):
+    def assign(self, instance, validated_data):
         image_id = validated_data.pop("image_id", None)
         hover_img_id = validated_data.pop("hover_img_id", None)
 
@@ -268,11 +433,7 @@ class DeckSerializer(serializers.ModelSerializer):
             else:
                 instance.hover_img = None
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        instance.save()
-        return instance
+        super().assign(instance, validated_data)
 
     @extend_schema_field(OpenApiTypes.URI)
     def _get_image_url(self, image_obj):
@@ -288,10 +449,34 @@ class DeckSerializer(serializers.ModelSerializer):
     def get_hover_img_url(self, obj):
         return self._get_image_url(obj.hover_img)
 
+    def _get_image_srcset(self, image_obj):
+        if image_obj and image_obj.image:
+            return srcset(image_obj.id, image_obj.image.name)
+        return None
+
+    @extend_schema_field(OpenApiTypes.STR)
+    def get_image_srcset(self, obj):
+        return self._get_image_srcset(obj.image)
+
+    @extend_schema_field(OpenApiTypes.STR)
+    def get_hover_img_srcset(self, obj):
+        return self._get_image_srcset(obj.hover_img)
+
+    @extend_schema_field(ImageMetadataSerializer(allow_null=True))
+    def get_image_meta(self, obj):
+        return image_meta(obj.image)
 
-class ProjectCardSerializer(serializers.ModelSerializer):
+    @extend_schema_field(ImageMetadataSerializer(allow_null=True))
+    def get_hover_img_meta(self, obj):
+        return image_meta(obj.hover_img)
+
+
+class ProjectCardSerializer(VersionedUpdateMixin, serializers.ModelSerializer):
+    owner = OwnerField()
     image_id = serializers.IntegerField(write_only=True, required=True)
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    image_meta = serializers.SerializerMethodField()
     deck_id = serializers.IntegerField(write_only=True, required=True)
     deck = serializers.PrimaryKeyRelatedField(read_only=True)
 
@@ -309,12 +494,15 @@ class ProjectCardSerializer(serializers.ModelSerializer):
             "image",
             "image_id",
             "image_url",
+            "image_srcset",
+            "image_meta",
             "deck_id",
             "deck",
             "created_at",
             "edited_at",
+            "version",
         ]
-        read_only_fields = ["id", "image", "created_at", "edited_at"]
+        read_only_fields = ["id", "image", "created_at", "edited_at", "version"]
 
     def create(self, validated_data):
         image_id = validated_data.pop("image_id")
@@ -336,8 +524,19 @@ class ProjectCardSerializer(serializers.ModelSerializer):
             return obj.image.image.url
         return None
 
+    @extend_schema_field(OpenApiTypes.STR)
+    def get_image_srcset(self, obj):
+        if obj.image and obj.image.image:
+            return srcset(obj.image.id, obj.image.image.name)
+        return None
+
+    @extend_schema_field(ImageMetadataSerializer(allow_null=True))
+    def get_image_meta(self, obj):
+        return image_meta(obj.image)
 
-class PagesModelSerializer(serializers.ModelSerializer):
+
+class PagesModelSerializer(VersionedUpdateMixin, serializers.ModelSerializer):
+    owner = OwnerField()
     project_card_id = serializers.IntegerField(write_only=True, required=False)
 
     class Meta:
@@ -350,49 +549,16 @@ class PagesModelSerializer(serializers.ModelSerializer):
             "project_card_id",
             "created_at",
             "edited_at",
+            "version",
         ]
-        read_only_fields = ["id", "created_at", "edited_at"]
+        read_only_fields = ["id", "created_at", "edited_at", "version"]
 
     def validate_content(self, content):
         if not isinstance(content, list):
             raise ValidationError("Content must be a list of blocks.")
 
         for block in content:
-            if not isinstance(block, dict):
-                raise ValidationError("Each block must be a dictionary.")
-
-            if "id" not in block or "content" not in block:
-                raise ValidationError("Each block must have 'id' and 'content'.")
-
-            if "gridTemplateColumns" not in block or "gridTemplateRows" not in block:
-                raise ValidationError("Each Block must have column and row templates")
-
-            col = block.get("gridTemplateColumns")
-            row = block.get("gridTemplateRows")
-            validate_grid_template(col)
-            validate_grid_template(row)
-
-            if not isinstance(block["content"], list):
-                raise ValidationError("Block 'content' must be a list.")
-
-            for item in block["content"]:
-                if "type" not in item or "id" not in item:
-                    raise ValidationError(
-                        "Each content item must have 'id' and 'type'."
-                    )
-
-                if "rowStart" not in item or "colStart" not in item:
-                    raise ValidationError(f"{item[id]} does not have starting position")
-
-                if item["type"] not in ["image", "text", "link"]:
-                    raise ValidationError(f"Unsupported content type: {item['type']}")
-
-                if item["type"] == "image":
-                    validate_image_item(item)
-                if item["type"] == "text":
-                    validate_text_item(item)
-                if item["type"] == "link":
-                    validate_link_item(item)
+            validate_block(block)
 
         return content
 
@@ -414,3 +580,21 @@ class PagesModelSerializer(serializers.ModelSerializer):
             validated_data["project_card"] = project_card
 
         return PagesModel.objects.create(**validated_data)
+
+
+class SlugBootstrapSerializer(serializers.Serializer):
+    background = GradientColorsSerializer()
+    page_names = PageNamesSerializer()
+    page_details = PageDetailsSerializer()
+    decks = DeckSerializer(many=True)
+    project_cards = serializers.DictField(
+        child=ProjectCardSerializer(many=True),
+        help_text="Project cards grouped by deck ID",
+    )
+
+
+class PreloadHintsSerializer(serializers.Serializer):
+    links = serializers.ListField(
+        child=serializers.CharField(),
+        help_text="`Link` header values, also sent joined in the `Link` header",
+    )
@@ -0,0 +1,83 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+UPLOAD_DIR = "uploads"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Names every file after the SHA-256 of its bytes, sharded in two levels of
+    subdirectories: `uploads/ab/cd/abcd...ef.png`. The name computed by
+    `upload_to` only contributes the extension.
+
+    Saving bytes that are already stored returns the existing name without
+    writing, so identical uploads share one file; `MediaBlob` counts the rows
+    pointing at it. Since a name never changes content, files can be cached
+    as immutable. Files are only ever deleted by `collect_unused_media`, which
+    leaves recently touched ones alone.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, "seek"):
+            content.seek(0)
+
+        return self.digest_name(digest.hexdigest(), os.path.splitext(name)[1])
+
+    def digest_name(self, key, extension):
+        return f"{UPLOAD_DIR}/{key[:2]}/{key[2:4]}/{key}{extension.lower()}"
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        name = self.hashed_name(name, content)
+        if self.touch(name):
+            return name
+        # Should a concurrent save of the same bytes win the race, Django
+        # stores this copy under a suffixed name; both remain valid.
+        return self._save(name, content)
+
+    def touch(self, name):
+        """
+        Marks the stored file `name` as just used so that it is not collected
+        before the row pointing at it commits. Returns False if there is none.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def adopt(self, path, key, extension):
+        """
+        Renames the local file at `path`, whose SHA-256 is `key`, into place
+        without copying it, or removes it when those bytes are already stored.
+        `path` must be on the same filesystem as the storage location.
+        """
+        name = self.digest_name(key, extension)
+        if self.touch(name):
+            os.unlink(path)
+            return name
+        target = self.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+        os.replace(path, target)
+        return name
+
+
+_image_storage = ContentAddressedStorage()
+
+
+def image_storage():
+    return _image_storage
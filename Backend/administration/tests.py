@@ -1,3 +1,1309 @@
-from django.test import TestCase
+import copy
+import hashlib
+import io
+import json
+import os
+import shutil
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from portfolio.models import (
+    BackgroundData,
+    Deck,
+    ImageReference,
+    PagesModel,
+    ProjectCard,
+    SlugEntry,
+)
+from shmooz.testing import (
+    PAGE_CONTENT,
+    QueryBudgetMixin,
+    TemporaryMediaRootMixin,
+    png_bytes,
+    png_upload,
+    seed_slug,
+)
+
+from . import variants
+from .changes import encode_cursor
+from .metadata import image_metadata
+from .models import ImageUpload, MediaBlob, Tombstone, UploadSession
+from .previews import fill_previews
+from .storage import ContentAddressedStorage, image_storage
+from .versioning import PreconditionFailed, save_changes
+from .views import REFRESH_COOKIE
+
+OFFSETS = [0.0, 1.0, 2.0]
+
+
+def json_body(data):
+    return {"data": data, "format": "json"}
+
+
+def batch_operations(f):
+    """Creates, updates and deletes of every batch model, refs included."""
+    background = {
+        "owner": f.slug,
+        "color1": "#000000",
+        "color2": "#111111",
+        "color3": "#222222",
+        "position1": "0%",
+        "position2": "50%",
+        "position3": "100%",
+        "page1": "About",
+        "page2": "Contact",
+    }
+    deck = {
+        "title": "new",
+        "displayed_name": "New",
+        "owner": f.slug,
+        "image_id": f.images[0].id,
+        "text_color": "#ffffff",
+        "hover_color": "#000000",
+    }
+    card = {
+        "title": "card",
+        "text": "text",
+        "text_color": "#ffffff",
+        "label_letter": "C",
+        "label_color": "#000000",
+        "inline_color": "#cccccc",
+        "owner": f.slug,
+        "image_id": f.images[1].id,
+        "deck_id": "deck",
+    }
+    page = {
+        "owner": f.slug,
+        "category": "project_new",
+        "content": PAGE_CONTENT,
+        "project_card_id": "card",
+    }
+    image_content = copy.deepcopy(PAGE_CONTENT)
+    image_content[0]["content"].append(
+        {
+            "id": "image-1",
+            "type": "image",
+            "url": f"/api/images/{f.images[1].id}/variant",
+            "rowStart": 1,
+            "colStart": 2,
+        }
+    )
+    return [
+        {"op": "create", "model": "background", "data": background},
+        {"op": "create", "model": "deck", "ref": "deck", "data": deck},
+        {"op": "create", "model": "project_card", "ref": "card", "data": card},
+        {"op": "create", "model": "page", "data": page},
+        {
+            "op": "update",
+            "model": "deck",
+            "id": f.decks[0].id,
+            "data": {"displayed_name": "Renamed", "hover_img_id": f.images[0].id},
+        },
+        {
+            "op": "update",
+            "model": "project_card",
+            "id": f.cards[0].id,
+            "data": {"image_id": f.images[0].id},
+        },
+        {
+            "op": "update",
+            "model": "page",
+            "id": f.pages[0].id,
+            "data": {"content": image_content},
+        },
+        {"op": "delete", "model": "page", "id": f.pages[1].id},
+        {"op": "delete", "model": "project_card", "id": f.cards[-1].id},
+        {"op": "delete", "model": "deck", "id": f.decks[-1].id},
+        {"op": "delete", "model": "background", "id": f.background.id},
+    ]
+
+
+class AdminEndpointQueryBudgetTests(
+    TemporaryMediaRootMixin, QueryBudgetMixin, TestCase
+):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            "admin", password="budget-password", is_staff=True
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def test_token_endpoints(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "post",
+                "/api/token/",
+                json_body({"username": "admin", "password": "budget-password"}),
+            )
+        )
+        self.client.cookies[REFRESH_COOKIE] = str(RefreshToken.for_user(self.user))
+        self.assertQueryBudget(lambda f: ("post", "/api/token/refresh/", json_body({})))
+        self.assertQueryBudget(
+            lambda f: ("post", "/api/auth/logout/", {}), status_code=204
+        )
+
+    def test_auth_reads(self):
+        for path in ("/api/auth/", "/api/auth/csrf/", "/api/auth/read-cache/"):
+            with self.subTest(path=path):
+                self.assertQueryBudget(lambda f: ("get", path, {}))
+
+    def test_create_deck(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "post",
+                f"/api/auth/create_deck/{f.slug}",
+                json_body(
+                    {
+                        "title": "new",
+                        "displayed_name": "New",
+                        "owner": f.slug,
+                        "image_id": f.images[0].id,
+                        "hover_img_id": f.images[1].id,
+                        "card_amount": 3,
+                        "x_offsets": OFFSETS,
+                        "y_offsets": OFFSETS,
+                        "rotations": OFFSETS,
+                        "alphas": OFFSETS,
+                        "brightness": OFFSETS,
+                        "text_color": "#ffffff",
+                        "hover_color": "#000000",
+                    }
+                ),
+            ),
+            status_code=201,
+        )
+
+    def test_create_project_card(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "post",
+                f"/api/auth/create_project_card/{f.slug}",
+                json_body(
+                    {
+                        "title": "new",
+                        "text": "text",
+                        "text_color": "#ffffff",
+                        "label_letter": "N",
+                        "label_color": "#000000",
+                        "inline_color": "#cccccc",
+                        "owner": f.slug,
+                        "image_id": f.images[0].id,
+                        "deck_id": f.decks[0].id,
+                    }
+                ),
+            ),
+            status_code=201,
+        )
+
+    def test_create_background(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "post",
+                "/api/auth/create_background/",
+                json_body(
+                    {
+                        "owner": f.slug,
+                        "color1": "#000000",
+                        "color2": "#111111",
+                        "color3": "#222222",
+                        "position1": "0%",
+                        "position2": "50%",
+                        "position3": "100%",
+                        "page1": "About",
+                        "page2": "Contact",
+                    }
+                ),
+            ),
+            status_code=201,
+        )
+
+    def test_create_slug(self):
+        self.assertQueryBudget(
+            lambda f: ("post", "/api/auth/create_slug/", json_body({"slug": "new"})),
+            status_code=201,
+        )
+
+    def test_batch(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "post",
+                "/api/auth/batch/",
+                json_body({"operations": batch_operations(f)}),
+            )
+        )
+
+    def test_changes(self):
+        since = encode_cursor(timezone.now() - timedelta(minutes=1))
+        self.assertQueryBudget(lambda f: ("get", f"/api/auth/changes/{f.slug}", {}))
+        self.assertQueryBudget(
+            lambda f: ("get", f"/api/auth/changes/{f.slug}?since={since}", {})
+        )
+
+    def test_upload_page(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "post",
+                "/api/auth/upload_page/",
+                json_body(
+                    {"owner": f.slug, "category": "extra", "content": PAGE_CONTENT}
+                ),
+            ),
+            status_code=201,
+        )
+
+    def test_upload_image(self):
+        for path in ("/api/upload-image/", "/api/upload-image/{slug}"):
+            with self.subTest(path=path):
+                self.assertQueryBudget(
+                    lambda f: (
+                        "post",
+                        path.format(slug=f.slug),
+                        {
+                            "data": {"title": "upload", "image": png_upload()},
+                            "format": "multipart",
+                        },
+                    ),
+                    status_code=201,
+                )
+
+    def test_bulk_upload_images(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "post",
+                f"/api/upload-images/{f.slug}",
+                {
+                    "data": {
+                        "images": [
+                            png_upload(f"{i}.png", color=f"#00000{i}") for i in range(4)
+                        ]
+                    },
+                    "format": "multipart",
+                },
+            ),
+            status_code=201,
+        )
+
+    def start_session(self, data, received=None):
+        session = UploadSession.objects.create(
+            title="upload",
+            filename="upload.png",
+            size=len(data),
+            received=len(data) if received is None else received,
+            created_by=self.user,
+        )
+        with open(session.part_path, "wb") as part:
+            part.write(data)
+        return session
+
+    def test_upload_session(self):
+        data = png_bytes()
+        self.assertQueryBudget(
+            lambda f: (
+                "post",
+                "/api/upload-sessions/",
+                json_body({"title": "upload", "filename": "a.png", "size": 10}),
+            ),
+            status_code=201,
+        )
+        self.assertQueryBudget(
+            lambda f: ("get", f"/api/upload-sessions/{self.start_session(data).pk}", {})
+        )
+        self.assertQueryBudget(
+            lambda f: (
+                "put",
+                f"/api/upload-sessions/{self.start_session(data, received=0).pk}",
+                {
+                    "data": data,
+                    "content_type": "application/octet-stream",
+                    "HTTP_CONTENT_RANGE": f"bytes 0-{len(data) - 1}/{len(data)}",
+                },
+            )
+        )
+        self.assertQueryBudget(
+            lambda f: (
+                "delete",
+                f"/api/upload-sessions/{self.start_session(data).pk}",
+                {},
+            ),
+            status_code=204,
+        )
+        self.assertQueryBudget(
+            lambda f: (
+                "post",
+                f"/api/upload-sessions/{self.start_session(data).pk}/finalize",
+                {},
+            ),
+            status_code=201,
+        )
+
+    def test_alter_deck(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "put",
+                f"/api/auth/alter_deck/{f.decks[0].id}",
+                json_body({"displayed_name": "Renamed"}),
+            )
+        )
+        self.assertQueryBudget(
+            lambda f: ("delete", f"/api/auth/alter_deck/{f.decks[0].id}", {}),
+            status_code=204,
+        )
+
+    def test_alter_project_card(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "put",
+                f"/api/auth/alter_project_card/{f.cards[0].id}",
+                json_body({"title": "Renamed"}),
+            )
+        )
+        self.assertQueryBudget(
+            lambda f: ("delete", f"/api/auth/alter_project_card/{f.cards[0].id}", {}),
+            status_code=204,
+        )
+
+    def test_alter_page(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "put",
+                f"/api/auth/alter_page/{f.pages[0].id}",
+                json_body({"content": PAGE_CONTENT}),
+            )
+        )
+        self.assertQueryBudget(
+            lambda f: (
+                "patch",
+                f"/api/auth/alter_page/{f.pages[0].id}",
+                json_body(
+                    [{"op": "replace", "path": "/0/content/0/text", "value": "Hi"}]
+                ),
+            )
+        )
+        self.assertQueryBudget(
+            lambda f: ("delete", f"/api/auth/alter_page/{f.pages[0].id}", {}),
+            status_code=204,
+        )
+
+    def test_alter_slug(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "put",
+                f"/api/auth/alter_slug/{f.entry.id}",
+                json_body({"slug": f"{f.slug}-renamed"}),
+            )
+        )
+        self.assertQueryBudget(
+            lambda f: (
+                "delete",
+                f"/api/auth/alter_slug/{SlugEntry.objects.create(slug=f'{f.slug}-empty').id}",
+                {},
+            ),
+            status_code=204,
+        )
+
+    def test_alter_background(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "put",
+                f"/api/auth/alter_background/{f.background.id}",
+                json_body({"page1": "Work"}),
+            )
+        )
+        self.assertQueryBudget(
+            lambda f: ("delete", f"/api/auth/alter_background/{f.background.id}", {}),
+            status_code=204,
+        )
+
+
+class SlugEntryTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("editor")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        self.fixture = seed_slug("acme", 1)
+
+    def test_rename_keeps_the_content(self):
+        response = self.client.put(
+            f"/api/auth/alter_slug/{self.fixture.entry.id}",
+            {"slug": "acme-renamed"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["slug_entry"]["slug"], "acme-renamed")
+        decks = self.client.get("/api/deck/acme-renamed").json()["results"]
+        self.assertEqual([deck["owner"] for deck in decks], ["acme-renamed"])
+
+    def test_slugs_owning_content_are_not_deleted(self):
+        path = f"/api/auth/alter_slug/{self.fixture.entry.id}"
+        self.assertEqual(self.client.delete(path).status_code, 409)
+        self.assertTrue(SlugEntry.objects.filter(slug="acme").exists())
+
+
+class VersionedUpdateTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("editor")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        self.fixture = seed_slug("acme", 1)
+
+    def test_edits_are_one_update_of_the_changed_fields(self):
+        page = self.fixture.pages[0]
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.put(
+                f"/api/auth/alter_page/{page.id}", {"category": "about"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response["ETag"], response.data["version"]), ('"2"', 2))
+        updates = [
+            query["sql"]
+            for query in captured.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"category"', updates[0])
+        self.assertNotIn('"content"', updates[0])
+
+    def test_stale_versions_are_rejected(self):
+        f = self.fixture
+        edits = {
+            f"/api/auth/alter_deck/{f.decks[0].id}": {"displayed_name": "Renamed"},
+            f"/api/auth/alter_project_card/{f.cards[0].id}": {"title": "Renamed"},
+            f"/api/auth/alter_page/{f.pages[0].id}": {"content": []},
+            f"/api/auth/alter_background/{f.background.id}": {"page1": "Work"},
+        }
+        for path, data in edits.items():
+            with self.subTest(path=path):
+                first = self.client.put(path, data, format="json", HTTP_IF_MATCH='"1"')
+                self.assertEqual(first.status_code, 200)
+                stale = self.client.put(
+                    path, {}, format="json", HTTP_IF_MATCH='"1", W/"2"'
+                )
+                self.assertEqual(stale.status_code, 412)
+                current = self.client.put(
+                    path, {}, format="json", HTTP_IF_MATCH=first["ETag"]
+                )
+                self.assertEqual(current["ETag"], '"3"')
+
+    def test_rows_changed_after_reading_are_not_overwritten(self):
+        page = PagesModel.objects.get(pk=self.fixture.pages[0].pk)
+        PagesModel.objects.filter(pk=page.pk).update(version=2)
+        page.category = "about"
+        with self.assertRaises(PreconditionFailed):
+            save_changes(page, ["category"])
+        self.assertEqual(PagesModel.objects.get(pk=page.pk).category, "page_one")
+
+
+class PageContentPatchTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("editor")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        self.page = seed_slug("acme", 1).pages[0]
+        self.path = f"/api/auth/alter_page/{self.page.id}"
+
+    def patch(self, operations, **headers):
+        return self.client.generic(
+            "PATCH",
+            self.path,
+            json.dumps(operations),
+            content_type="application/json-patch+json",
+            **headers,
+        )
+
+    def content(self):
+        return PagesModel.objects.get(pk=self.page.pk).content
+
+    def test_patch_edits_the_content(self):
+        block = copy.deepcopy(PAGE_CONTENT[0])
+        block["id"] = "block-2"
+        response = self.patch(
+            [
+                {"op": "test", "path": "/0/content/0/text", "value": "Hello"},
+                {"op": "replace", "path": "/0/content/0/text", "value": "Hi"},
+                {"op": "add", "path": "/-", "value": block},
+                {"op": "move", "from": "/1", "path": "/0"},
+                {"op": "remove", "path": "/0/content/0/rowStart"},
+                {"op": "add", "path": "/0/content/0/rowStart", "value": 2},
+            ],
+            HTTP_IF_MATCH='"1"',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], '"2"')
+        content = self.content()
+        self.assertEqual([block["id"] for block in content], ["block-2", "block-1"])
+        self.assertEqual(content[0]["content"][0]["rowStart"], 2)
+        self.assertEqual(content[1]["content"][0]["text"], "Hi")
+
+    def test_only_touched_blocks_are_validated(self):
+        broken = {"id": "legacy", "content": []}
+        PagesModel.objects.filter(pk=self.page.pk).update(
+            content=[*PAGE_CONTENT, broken]
+        )
+        ok = self.patch([{"op": "replace", "path": "/0/content/0/text", "value": "Hi"}])
+        self.assertEqual(ok.status_code, 200)
+
+        invalid = self.patch([{"op": "remove", "path": "/0/gridTemplateRows"}])
+        self.assertEqual(invalid.status_code, 400)
+        self.assertIn("content", invalid.data)
+        self.assertEqual(
+            self.patch([{"op": "add", "path": "/0", "value": None}]).status_code, 400
+        )
+        self.assertEqual(self.content()[0]["content"][0]["text"], "Hi")
+
+    def test_patches_apply_entirely_or_not_at_all(self):
+        for operations in (
+            [
+                {"op": "replace", "path": "/0/content/0/text", "value": "Hi"},
+                {"op": "test", "path": "/0/id", "value": "other"},
+            ],
+            [{"op": "remove", "path": "/0/content/5"}],
+            [{"op": "move", "from": "/0", "path": "/0/content/0"}],
+            [{"op": "add", "path": "/01/id", "value": "x"}],
+        ):
+            with self.subTest(operations=operations):
+                self.assertEqual(self.patch(operations).status_code, 409)
+        self.assertEqual(self.content(), PAGE_CONTENT)
+        malformed = self.patch([{"op": "replace", "path": "/0/id"}])
+        self.assertEqual(malformed.status_code, 400)
+        stale = self.patch([], HTTP_IF_MATCH='"7"')
+        self.assertEqual(stale.status_code, 412)
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("editor")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        self.fixture = seed_slug("acme", 2)
+
+    def batch(self, operations):
+        return self.client.post(
+            "/api/auth/batch/", {"operations": operations}, format="json"
+        )
+
+    def test_builds_and_edits_in_one_request(self):
+        f = self.fixture
+        operations = batch_operations(f)
+        response = self.batch(operations)
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual(
+            [result["index"] for result in results], list(range(len(operations)))
+        )
+
+        deck = Deck.objects.get(pk=results[1]["id"])
+        card = ProjectCard.objects.get(pk=results[2]["id"])
+        page = PagesModel.objects.get(pk=results[3]["id"])
+        self.assertEqual(
+            (deck.owner, card.deck, page.project_card), (f.entry, deck, card)
+        )
+        self.assertEqual(
+            set(
+                ImageReference.objects.filter(deck=deck).values_list(
+                    "image_id", "field"
+                )
+            ),
+            {(f.images[0].id, "image")},
+        )
+        self.assertTrue(ImageReference.objects.filter(project_card=card).exists())
+
+        edited = Deck.objects.get(pk=f.decks[0].pk)
+        self.assertEqual((edited.displayed_name, edited.version), ("Renamed", 2))
+        self.assertIsNotNone(edited.edited_at)
+        self.assertEqual(
+            set(
+                ImageReference.objects.filter(deck=edited).values_list(
+                    "image_id", "field"
+                )
+            ),
+            {(f.images[0].id, "image"), (f.images[0].id, "hover_img")},
+        )
+        self.assertEqual(
+            set(
+                ImageReference.objects.filter(page=f.pages[0]).values_list(
+                    "image_id", flat=True
+                )
+            ),
+            {f.images[1].id},
+        )
+        self.assertFalse(Deck.objects.filter(pk=f.decks[-1].pk).exists())
+        self.assertEqual(
+            list(BackgroundData.objects.filter(owner=f.entry)),
+            [BackgroundData.objects.get(pk=results[0]["id"])],
+        )
+
+    def test_nothing_is_written_unless_every_operation_is_valid(self):
+        f = self.fixture
+        operations = batch_operations(f)
+        operations[2]["data"]["deck_id"] = "missing"
+        operations[3]["data"]["owner"] = "nobody"
+        operations[6]["data"]["content"] = "not blocks"
+        response = self.batch(operations)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data["operations"]), {"6"})
+        # Field errors are reported before references are resolved.
+        operations[6]["data"]["content"] = PAGE_CONTENT
+        errors = self.batch(operations).data["operations"]
+        self.assertEqual(set(errors), {"2", "3"})
+        self.assertIn("deck_id", errors["2"])
+        self.assertEqual(Deck.objects.count(), 2)
+        malformed = self.batch([{"op": "update", "model": "deck", "data": {}}])
+        self.assertEqual(malformed.status_code, 400)
+
+    def test_rows_deleted_or_in_use_are_rejected(self):
+        f = self.fixture
+        card = {"op": "delete", "model": "project_card", "id": f.cards[-1].id}
+        update = {
+            "op": "update",
+            "model": "project_card",
+            "id": f.cards[-1].id,
+            "data": {"title": "moved"},
+        }
+        errors = self.batch([card, update]).data["operations"]
+        self.assertEqual(set(errors), {"1"})
+
+        deck = {"op": "delete", "model": "deck", "id": f.decks[-1].id}
+        move = {**update, "id": f.cards[0].id, "data": {"deck_id": f.decks[-1].id}}
+        errors = self.batch([move, deck]).data["operations"]
+        self.assertEqual(set(errors), {"1"})
+
+        # The card goes with its deck before the update runs.
+        response = self.batch([deck, update])
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(Deck.objects.filter(pk=f.decks[-1].pk).exists())
+
+    def test_constraint_violations_roll_back_the_batch(self):
+        f = self.fixture
+        operations = batch_operations(f)
+        operations[3]["data"]["category"] = "page_one"
+        response = self.batch(operations)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Deck.objects.count(), 2)
+        self.assertTrue(ProjectCard.objects.filter(pk=f.cards[-1].pk).exists())
+
+
+@override_settings(CHANGES_CURSOR_OVERLAP_SECONDS=0)
+class ChangesTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("editor")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        self.fixture = seed_slug("acme", 2)
+        seed_slug("other", 1)
+
+    def sync(self, slug="acme", since=None):
+        response = self.client.get(
+            f"/api/auth/changes/{slug}", {"since": since} if since else {}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, rows):
+        return {row["id"] for row in rows}
+
+    def test_first_sync_is_the_whole_slug(self):
+        f = self.fixture
+        data = self.sync()
+        self.assertTrue(data["reset"])
+        self.assertEqual(self.ids(data["decks"]), {deck.id for deck in f.decks})
+        self.assertEqual(self.ids(data["project_cards"]), {card.id for card in f.cards})
+        self.assertEqual(self.ids(data["pages"]), {page.id for page in f.pages})
+        self.assertEqual(self.ids(data["backgrounds"]), {f.background.id})
+        self.assertEqual(self.ids(data["images"]), {image.id for image in f.images})
+
+        unchanged = self.sync(since=data["cursor"])
+        self.assertFalse(unchanged["reset"])
+        for name in ("decks", "project_cards", "pages", "backgrounds", "images"):
+            self.assertEqual(unchanged[name], [])
+        self.assertFalse(any(unchanged["deleted"].values()))
+
+    def test_previews_filled_after_the_cursor_are_synced(self):
+        image = self.fixture.images[0]
+        ImageUpload.objects.filter(pk=image.pk).update(
+            dominant_color="", placeholder=""
+        )
+        cursor = self.sync()["cursor"]
+
+        values = {"dominant_color": "#123456", "placeholder": "data:image/webp;base64,"}
+        with mock.patch(
+            "administration.previews.variant_preview_metadata", return_value=values
+        ):
+            fill_previews(image.pk)
+
+        (synced,) = self.sync(since=cursor)["images"]
+        self.assertEqual(synced["id"], image.id)
+        self.assertEqual(synced["dominant_color"], "#123456")
+
+    def test_edits_and_deletions_since_the_cursor(self):
+        f = self.fixture
+        cursor = self.sync()["cursor"]
+        self.client.put(
+            f"/api/auth/alter_deck/{f.decks[0].id}",
+            {"displayed_name": "Renamed"},
+            format="json",
+        )
+        deleted = f.decks[-1]
+        response = self.client.delete(f"/api/auth/alter_deck/{deleted.id}")
+        self.assertEqual(response.status_code, 204)
+
+        data = self.sync(since=cursor)
+        self.assertEqual(self.ids(data["decks"]), {f.decks[0].id})
+        self.assertEqual(data["decks"][0]["displayed_name"], "Renamed")
+        cards = [card for card in f.cards if card.deck_id == deleted.id]
+        self.assertEqual(data["deleted"]["deck"], [deleted.id])
+        self.assertCountEqual(
+            data["deleted"]["project_card"], [card.id for card in cards]
+        )
+        self.assertCountEqual(
+            data["deleted"]["page"],
+            [page.id for page in f.pages if page.project_card in cards],
+        )
+
+    def test_moved_rows_leave_the_old_slug(self):
+        card = self.fixture.cards[0]
+        cursor = self.sync()["cursor"]
+        path = f"/api/auth/alter_project_card/{card.id}"
+        self.client.put(path, {"owner": "other"}, format="json")
+
+        self.assertEqual(self.sync(since=cursor)["deleted"]["project_card"], [card.id])
+        other = self.sync("other", since=cursor)
+        self.assertEqual(self.ids(other["project_cards"]), {card.id})
+
+        self.client.put(path, {"owner": "acme"}, format="json")
+        back = self.sync(since=cursor)
+        self.assertEqual(self.ids(back["project_cards"]), {card.id})
+        self.assertEqual(back["deleted"]["project_card"], [])
+
+    def test_batch_deletions_leave_tombstones(self):
+        page = self.fixture.pages[1]
+        cursor = self.sync()["cursor"]
+        response = self.client.post(
+            "/api/auth/batch/",
+            {"operations": [{"op": "delete", "model": "page", "id": page.id}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sync(since=cursor)["deleted"]["page"], [page.id])
+
+    def test_cursors(self):
+        response = self.client.get("/api/auth/changes/acme", {"since": "nonsense"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("since", response.data)
+        expired = encode_cursor(timezone.now() - timedelta(days=31))
+        self.assertTrue(self.sync(since=expired)["reset"])
+        self.assertEqual(self.client.get("/api/auth/changes/none").status_code, 404)
+
+    def test_old_tombstones_are_pruned(self):
+        self.client.delete(f"/api/auth/alter_page/{self.fixture.pages[1].id}")
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        self.client.delete(f"/api/auth/alter_page/{self.fixture.pages[0].id}")
+        call_command("prune_tombstones", stdout=io.StringIO())
+        self.assertEqual(
+            list(Tombstone.objects.values_list("object_id", flat=True)),
+            [self.fixture.pages[0].id],
+        )
+
+
+class ContentAddressedStorageTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        SlugEntry.objects.bulk_create(
+            SlugEntry(slug=slug) for slug in ("shmooz", "one", "two")
+        )
+        user = get_user_model().objects.create_user("uploader")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+
+    def upload(self, name, slug="shmooz", **kwargs):
+        response = self.client.post(
+            f"/api/upload-image/{slug}",
+            {"title": name, "image": png_upload(name, **kwargs)},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        return ImageUpload.objects.get(id=response.data["data"]["id"])
+
+    def test_files_are_named_by_content_hash(self):
+        image = self.upload("Card Art.PNG")
+        digest = hashlib.sha256(png_bytes()).hexdigest()
+        self.assertEqual(
+            image.image.name, f"uploads/{digest[:2]}/{digest[2:4]}/{digest}.png"
+        )
+        self.assertTrue(os.path.exists(image.image.path))
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.upload("a.png", slug="one")
+        second = self.upload("b.png", slug="two")
+        other = self.upload("a.png", slug="one", color="#ff0000")
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).ref_count, 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(first.image.path))), 1)
+
+    def test_blob_is_dropped_with_its_last_reference(self):
+        first = self.upload("a.png")
+        second = self.upload("b.png")
+        path = first.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=second.image.name).ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.exists())
+        # Left for collect_unused_media, so a concurrent upload of the same
+        # bytes never ends up pointing at a deleted file.
+        self.assertTrue(os.path.exists(path))
+
+
+class ImageMetadataTests(TemporaryMediaRootMixin, TestCase):
+    def test_upload_stores_metadata(self):
+        user = get_user_model().objects.create_user("uploader")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        response = client.post(
+            "/api/upload-image/",
+            {"title": "wide", "image": png_upload(size=(300, 200), color="#ff0000")},
+            format="multipart",
+        )
+
+        data = response.data["data"]
+        self.assertEqual((data["width"], data["height"]), (300, 200))
+        self.assertEqual(data["aspect_ratio"], 1.5)
+        self.assertEqual(data["dominant_color"], "#ff0000")
+        self.assertTrue(data["placeholder"].startswith("data:image/webp;base64,"))
+
+    @override_settings(
+        IMAGE_METADATA_INLINE_PIXELS=1000, IMAGE_PREVIEW_BACKGROUND=False
+    )
+    def test_large_sources_get_previews_after_commit(self):
+        user = get_user_model().objects.create_user("uploader")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                "/api/upload-image/",
+                {"title": "big", "image": png_upload(size=(300, 200), color="#0000ff")},
+                format="multipart",
+            )
+            data = response.data["data"]
+            self.assertEqual((data["width"], data["height"]), (300, 200))
+            self.assertEqual((data["dominant_color"], data["placeholder"]), ("", ""))
+
+        image = ImageUpload.objects.get()
+        self.assertRegex(image.dominant_color, "^#0[0-9a-f]0[0-9a-f]f[0-9a-f]$")
+        self.assertTrue(image.placeholder.startswith("data:image/webp;base64,"))
+
+    def test_exif_orientation_swaps_dimensions(self):
+        buffer = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new("RGB", (40, 20)).save(buffer, format="JPEG", exif=exif)
+
+        metadata = image_metadata(buffer)
+        self.assertEqual((metadata["width"], metadata["height"]), (20, 40))
+        self.assertEqual(metadata["aspect_ratio"], 0.5)
+
+    def test_backfill_command(self):
+        name = default_storage.save("uploads/legacy/a.png", ContentFile(png_bytes()))
+        image = ImageUpload.objects.create(title="legacy", image=name)
+        missing = ImageUpload.objects.create(title="gone", image="uploads/gone.png")
+
+        stderr = io.StringIO()
+        call_command("backfill_image_metadata", stdout=io.StringIO(), stderr=stderr)
+
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (4, 4))
+        self.assertEqual(image.dominant_color, "#336699")
+        self.assertIn(str(missing.id), stderr.getvalue())
+
+
+class UploadValidationTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("uploader")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+
+    def upload(self, file):
+        return self.client.post(
+            "/api/upload-image/", {"title": "upload", "image": file}, format="multipart"
+        )
+
+    def test_uploads_stream_to_temporary_files(self):
+        with mock.patch.object(
+            ContentAddressedStorage, "_save", autospec=True, return_value="x.png"
+        ) as save:
+            self.upload(png_upload())
+        self.assertIsInstance(save.call_args.args[2], TemporaryUploadedFile)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=64)
+    def test_rejects_files_over_the_byte_limit(self):
+        response = self.upload(png_upload(size=(64, 64), color="#123456"))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1_000_000)
+    def test_rejects_pixel_bombs_without_decoding(self):
+        bomb = png_upload(size=(3000, 3000))
+        with mock.patch.object(Image.Image, "load") as load:
+            response = self.upload(bomb)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("3000x3000", str(response.data["image"]))
+        load.assert_not_called()
+
+    def test_rejects_non_images_and_unsupported_formats(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (4, 4)).save(buffer, format="BMP")
+        for file in (
+            SimpleUploadedFile("notes.png", b"not an image"),
+            SimpleUploadedFile("image.bmp", buffer.getvalue()),
+        ):
+            with self.subTest(name=file.name):
+                self.assertEqual(self.upload(file).status_code, 400)
+
+
+class BulkImageUploadTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("uploader")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+
+    def upload(self, files, **data):
+        return self.client.post(
+            "/api/upload-images/", {"images": files, **data}, format="multipart"
+        )
+
+    def test_stores_every_file_with_one_insert(self):
+        files = [
+            png_upload("a.png"),
+            png_upload("b.png"),
+            png_upload("c.png", color="#ff0000"),
+        ]
+        with self.assertNumQueries(6):
+            response = self.upload(files, titles=["First", "Second"])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["status"], "success")
+
+        titles = [result["data"]["title"] for result in response.data["results"]]
+        self.assertEqual(titles, ["First", "Second", "c"])
+        images = ImageUpload.objects.all()
+        self.assertEqual(len(images), 3)
+        self.assertTrue(all(image.width == 4 for image in images))
+        # a.png and b.png have the same bytes and share one file.
+        self.assertEqual(images[0].image.name, images[1].image.name)
+        self.assertEqual(MediaBlob.objects.get(name=images[0].image.name).ref_count, 2)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=256)
+    def test_reports_failures_per_file(self):
+        files = [
+            png_upload("ok.png"),
+            SimpleUploadedFile("notes.png", b"not an image"),
+            png_upload("huge.png", size=(256, 256), color="#123456"),
+        ]
+        response = self.upload(files)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data["status"], "partial")
+        statuses = [
+            (result["filename"], result["status"])
+            for result in response.data["results"]
+        ]
+        self.assertEqual(
+            statuses, [("ok.png", 201), ("notes.png", 400), ("huge.png", 413)]
+        )
+        self.assertEqual(ImageUpload.objects.get().title, "ok")
+
+    def test_fails_when_nothing_is_stored(self):
+        response = self.upload([SimpleUploadedFile("notes.png", b"not an image")])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["status"], "failed")
+        self.assertEqual(self.upload([]).status_code, 400)
+        self.assertFalse(ImageUpload.objects.exists())
+
+
+class UploadSessionTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        SlugEntry.objects.create(slug="budget")
+        self.user = get_user_model().objects.create_user("uploader")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        self.data = png_bytes(size=(32, 24), color="#884422")
+
+    def start(self, size=None, **extra):
+        response = self.client.post(
+            "/api/upload-sessions/",
+            {
+                "title": "chunked",
+                "filename": "Art.PNG",
+                "size": len(self.data) if size is None else size,
+                **extra,
+            },
+            format="json",
+        )
+        return response
+
+    def send(self, session_id, start, end):
+        return self.client.put(
+            f"/api/upload-sessions/{session_id}",
+            self.data[start : end + 1],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end}/{len(self.data)}",
+        )
+
+    def finalize(self, session_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"/api/upload-sessions/{session_id}/finalize")
+
+    def test_chunks_are_assembled_and_renamed_into_storage(self):
+        session_id = self.start(slug="budget").data["id"]
+        middle = len(self.data) // 2
+        self.assertEqual(self.send(session_id, 0, middle - 1).data["received"], middle)
+        # A retried chunk overlapping received bytes is accepted.
+        self.send(session_id, middle - 10, middle + 9)
+        response = self.send(session_id, middle, len(self.data) - 1)
+        self.assertEqual(response.data["received"], len(self.data))
+
+        part_path = UploadSession.objects.get(pk=session_id).part_path
+        inode = os.stat(part_path).st_ino
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 201)
+
+        key = hashlib.sha256(self.data).hexdigest()
+        image = ImageUpload.objects.get()
+        self.assertEqual(image.image.name, f"uploads/{key[:2]}/{key[2:4]}/{key}.png")
+        self.assertEqual((image.width, image.height), (32, 24))
+        self.assertEqual(image.owner.slug, "budget")
+        self.assertEqual(MediaBlob.objects.get(name=image.image.name).ref_count, 1)
+        # Renamed, not copied.
+        self.assertEqual(os.stat(image.image.path).st_ino, inode)
+        with image.image.open("rb") as stored:
+            self.assertEqual(stored.read(), self.data)
+        self.assertFalse(os.path.exists(part_path))
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_rehashes_when_the_running_hash_is_unavailable(self):
+        session_id = self.start().data["id"]
+        self.send(session_id, 0, len(self.data) - 1)
+        with mock.patch.dict("administration.uploads._hashers", clear=True):
+            response = self.finalize(session_id)
+        key = hashlib.sha256(self.data).hexdigest()
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(key, ImageUpload.objects.get().image.name)
+
+    def test_failed_finalizes_can_be_retried(self):
+        session_id = self.start().data["id"]
+        self.send(session_id, 0, len(self.data) - 1)
+        part_path = UploadSession.objects.get(pk=session_id).part_path
+        with mock.patch(
+            "administration.models.image_metadata", side_effect=OSError("boom")
+        ):
+            with self.assertRaises(OSError):
+                self.finalize(session_id)
+        self.assertTrue(os.path.exists(part_path))
+        self.assertFalse(ImageUpload.objects.exists())
+
+        self.assertEqual(self.finalize(session_id).status_code, 201)
+        with ImageUpload.objects.get().image.open("rb") as stored:
+            self.assertEqual(stored.read(), self.data)
+        self.assertFalse(os.path.exists(part_path))
+
+    @override_settings(IMAGE_METADATA_INLINE_PIXELS=100, IMAGE_PREVIEW_BACKGROUND=False)
+    def test_large_finalized_sources_get_previews_after_adoption(self):
+        # Bytes no other test stores, so the file is not already in place.
+        self.data = png_bytes(size=(32, 24), color="#228844")
+        session_id = self.start().data["id"]
+        self.send(session_id, 0, len(self.data) - 1)
+        part_path = UploadSession.objects.get(pk=session_id).part_path
+        self.assertEqual(self.finalize(session_id).status_code, 201)
+
+        image = ImageUpload.objects.get()
+        self.assertTrue(os.path.exists(image.image.path))
+        self.assertFalse(os.path.exists(part_path))
+        self.assertRegex(image.dominant_color, "^#2[0-9a-f]8[0-9a-f]4[0-9a-f]$")
+        self.assertTrue(image.placeholder.startswith("data:image/webp;base64,"))
+
+    def test_ranges_must_continue_the_received_prefix(self):
+        session_id = self.start().data["id"]
+        response = self.send(session_id, 10, 19)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["received"], 0)
+        self.assertEqual(self.finalize(session_id).status_code, 409)
+
+    def test_rejects_malformed_and_oversized_ranges(self):
+        session_id = self.start().data["id"]
+        for header in (
+            "bytes 0-9/*",
+            "bytes 9-0/10",
+            f"bytes 0-9/{len(self.data) + 1}",
+        ):
+            with self.subTest(header=header):
+                response = self.client.put(
+                    f"/api/upload-sessions/{session_id}",
+                    self.data[:10],
+                    content_type="application/octet-stream",
+                    HTTP_CONTENT_RANGE=header,
+                )
+                self.assertEqual(response.status_code, 400)
+        with override_settings(UPLOAD_SESSION_MAX_CHUNK_BYTES=8):
+            self.assertEqual(self.send(session_id, 0, 9).status_code, 413)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=64)
+    def test_rejects_sessions_over_the_byte_limit(self):
+        self.assertEqual(self.start().status_code, 413)
+
+    def test_invalid_images_are_rejected_on_finalize(self):
+        self.data = b"not an image at all"
+        session_id = self.start().data["id"]
+        self.send(session_id, 0, len(self.data) - 1)
+        self.assertEqual(self.finalize(session_id).status_code, 400)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_sessions_belong_to_their_creator(self):
+        session_id = self.start().data["id"]
+        other = get_user_model().objects.create_user("other")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(other)}"
+        )
+        self.assertEqual(
+            self.client.get(f"/api/upload-sessions/{session_id}").status_code, 404
+        )
+
+
+class CollectUnusedMediaTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        shutil.rmtree(image_storage().path("uploads"), ignore_errors=True)
+        self.old = timezone.now() - timedelta(days=2)
+
+    def store(self, data, age=None):
+        name = image_storage().save("file.png", ContentFile(data))
+        if age is not False:
+            timestamp = (age or self.old).timestamp()
+            os.utime(image_storage().path(name), (timestamp, timestamp))
+        return name
+
+    def upload(self, color):
+        image = ImageUpload(title=color, image=png_upload(color=color))
+        image.save()
+        ImageUpload.objects.filter(pk=image.pk).update(uploaded_at=self.old)
+        os.utime(image.image.path, (self.old.timestamp(),) * 2)
+        return image
+
+    def collect(self, *args):
+        out = io.StringIO()
+        call_command("collect_unused_media", *args, "--batch-size=1", stdout=out)
+        return out.getvalue()
+
+    def test_deletes_old_files_without_an_image(self):
+        orphan = self.store(b"orphan")
+        recent = self.store(b"recent", age=False)
+        image = self.upload("#101010")
+
+        self.assertIn(
+            "Would delete 1 orphaned files (6 bytes)", self.collect("--dry-run")
+        )
+        self.assertTrue(image_storage().exists(orphan))
+
+        self.assertIn("Deleted 1 orphaned files", self.collect())
+        self.assertFalse(image_storage().exists(orphan))
+        self.assertTrue(image_storage().exists(recent))
+        self.assertTrue(image_storage().exists(image.image.name))
+
+    def test_keeps_files_an_upload_deduplicated_onto(self):
+        released = self.upload("#606060")
+        name = released.image.name
+        released.delete()
+
+        # The same bytes are uploaded again before their new row commits.
+        self.assertEqual(
+            image_storage().save("again.png", png_upload(color="#606060")), name
+        )
+        self.assertIn("Deleted 0 orphaned files", self.collect())
+        self.assertTrue(image_storage().exists(name))
+
+        os.utime(image_storage().path(name), (self.old.timestamp(),) * 2)
+        self.assertIn("Deleted 1 orphaned files", self.collect())
+        self.assertFalse(image_storage().exists(name))
+        self.assertEqual(os.listdir(os.path.dirname(image_storage().path(name))), [])
+
+    def test_deletes_variants_no_longer_served(self):
+        kept = self.upload("#404040")
+        gone = self.upload("#505050")
+        paths = {
+            "kept": variants.variant_path(kept.image.name, 160, 75, "webp"),
+            "off_grid": variants.variant_path(kept.image.name, 160, 74, "webp"),
+            "gone": variants.variant_path(gone.image.name, 160, 75, "webp"),
+            "recent": variants.variant_path(gone.image.name, 320, 75, "webp"),
+        }
+        for label, path in paths.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(b"variant")
+            if label != "recent":
+                os.utime(path, (self.old.timestamp(),) * 2)
+        ImageUpload.objects.filter(pk=gone.pk).delete()
+
+        self.assertIn("Deleted 2 stale variants (14 bytes)", self.collect())
+        self.assertEqual(
+            {label for label, path in paths.items() if os.path.exists(path)},
+            {"kept", "recent"},
+        )
+
+    def test_unreferenced_images_are_deleted_on_request(self):
+        used = self.upload("#202020")
+        unused = self.upload("#303030")
+        Deck.objects.create(
+            title="deck",
+            displayed_name="Deck",
+            owner=SlugEntry.objects.create(slug="gc"),
+            image=used,
+            text_color="#ffffff",
+            hover_color="#000000",
+        )
+
+        self.assertIn("Deleted 0 orphaned files", self.collect())
+        self.assertEqual(ImageUpload.objects.count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            output = self.collect("--unreferenced")
+        self.assertIn("Deleted 1 unreferenced images", output)
+        self.assertEqual(list(ImageUpload.objects.all()), [used])
+        self.assertFalse(MediaBlob.objects.filter(name=unused.image.name).exists())
+        self.assertFalse(image_storage().exists(unused.image.name))
+        self.assertTrue(image_storage().exists(used.image.name))
@@ -0,0 +1,215 @@
+"""
+Upload handling that never holds an image in memory or decodes it before its
+size is known to be acceptable.
+
+Request bodies stream to temporary files through a handler that aborts once a
+file exceeds IMAGE_UPLOAD_MAX_BYTES, and images are accepted from their header
+alone (format and dimensions) against IMAGE_UPLOAD_FORMATS and
+IMAGE_UPLOAD_MAX_PIXELS.
+
+Resumable uploads (`UploadSession`) receive byte ranges written in place into
+a part file, hashing them as they arrive, so finalizing is a rename into the
+content addressed storage.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Upload exceeds the maximum allowed size."
+    default_code = "upload_too_large"
+
+
+class BoundedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams every file to disk and stops reading once a file exceeds
+    IMAGE_UPLOAD_MAX_BYTES or the body announces more than
+    IMAGE_UPLOAD_MAX_REQUEST_BYTES.
+
+    With `keep_oversized`, the rest of an oversized file is discarded instead
+    and the file is kept with its full size, for `probe_image` to reject it
+    without failing the other files of the request.
+    """
+
+    keep_oversized = False
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        if content_length and content_length > settings.IMAGE_UPLOAD_MAX_REQUEST_BYTES:
+            raise UploadTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_BYTES:
+            if self.keep_oversized:
+                return None
+            raise UploadTooLarge()
+        return super().receive_data_chunk(raw_data, start)
+
+
+class BoundedUploadMixin:
+    """APIView mixin installing BoundedTemporaryFileUploadHandler."""
+
+    keep_oversized_files = False
+
+    def initial(self, request, *args, **kwargs):
+        handler = BoundedTemporaryFileUploadHandler(request._request)
+        handler.keep_oversized = self.keep_oversized_files
+        request._request.upload_handlers = [handler]
+        super().initial(request, *args, **kwargs)
+
+
+def probe_image(file):
+    """
+    Reads format and dimensions from the image header without decoding pixel
+    data, and rejects anything outside the configured limits.
+    """
+    if file.size is not None and file.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise UploadTooLarge()
+
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image_format = image.format
+            width, height = image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise serializers.ValidationError(
+            "Upload a valid image. The file you uploaded was either not an "
+            "image or a corrupted image."
+        )
+    finally:
+        file.seek(0)
+
+    if image_format not in settings.IMAGE_UPLOAD_FORMATS:
+        raise serializers.ValidationError(
+            f"Unsupported image format {image_format}; expected one of "
+            f"{', '.join(settings.IMAGE_UPLOAD_FORMATS)}."
+        )
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise serializers.ValidationError(
+            f"Image is {width}x{height}; at most "
+            f"{settings.IMAGE_UPLOAD_MAX_PIXELS} pixels are allowed."
+        )
+    return image_format, width, height
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_BULK_UPLOAD_WORKERS, thread_name_prefix="image-upload"
+)
+
+
+def map_uploads(func, *iterables):
+    """
+    Runs `func` over uploaded files in the upload worker pool and returns the
+    results in order. `func` must not use the database.
+    """
+    return list(_executor.map(func, *iterables))
+
+
+class ProbedImageField(serializers.FileField):
+    """
+    ImageField replacement validating images with `probe_image` instead of
+    loading and verifying the whole file.
+    """
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        probe_image(file)
+        return file
+
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+CHUNK_READ_SIZE = 64 * 1024
+HASHER_CACHE_SIZE = 64
+
+# Running SHA-256 of the contiguous prefix of recent sessions, keyed by session
+# id, as (offset, hasher). Chunks served by another process, or that rewrite
+# hashed bytes, drop the entry and `session_digest` rehashes the part file.
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+def parse_content_range(header):
+    """Returns (start, end, total) of a `bytes start-end/total` header."""
+    match = CONTENT_RANGE_RE.match(header or "")
+    if not match:
+        raise serializers.ValidationError(
+            "Content-Range must have the form 'bytes start-end/total'."
+        )
+    start, end, total = map(int, match.groups())
+    if end < start:
+        raise serializers.ValidationError("Content-Range end precedes its start.")
+    return start, end, total
+
+
+def _take_hasher(session_id, start):
+    with _hashers_lock:
+        offset, hasher = _hashers.pop(session_id, (0, None))
+    if start == 0:
+        return hashlib.sha256()
+    return hasher if hasher is not None and offset == start else None
+
+
+def _keep_hasher(session_id, offset, hasher):
+    with _hashers_lock:
+        _hashers[session_id] = (offset, hasher)
+        while len(_hashers) > HASHER_CACHE_SIZE:
+            _hashers.popitem(last=False)
+
+
+def write_chunk(session, start, end, stream):
+    """
+    Copies bytes `start`..`end` of the upload from `stream` into the part file
+    of `session`, extending its running hash when the chunk continues it.
+    """
+    length = end - start + 1
+    if length > settings.UPLOAD_SESSION_MAX_CHUNK_BYTES:
+        raise UploadTooLarge()
+
+    hasher = _take_hasher(session.pk, start)
+    written = 0
+    with open(session.part_path, "r+b") as part:
+        part.seek(start)
+        while written < length and stream is not None:
+            data = stream.read(min(CHUNK_READ_SIZE, length - written))
+            if not data:
+                break
+            part.write(data)
+            if hasher is not None:
+                hasher.update(data)
+            written += len(data)
+
+    if written != length:
+        raise serializers.ValidationError(
+            f"Expected {length} bytes for the range, received {written}."
+        )
+    if hasher is not None:
+        _keep_hasher(session.pk, end + 1, hasher)
+
+
+def session_digest(session):
+    """SHA-256 hex digest of a complete upload, rehashing only if needed."""
+    with _hashers_lock:
+        offset, hasher = _hashers.pop(session.pk, (0, None))
+    if hasher is None or offset != session.size:
+        hasher = hashlib.sha256()
+        with open(session.part_path, "rb") as part:
+            for data in iter(lambda: part.read(CHUNK_READ_SIZE), b""):
+                hasher.update(data)
+    return hasher.hexdigest()
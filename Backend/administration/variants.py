@@ -0,0 +1,148 @@
+"""
+Resized, re-encoded copies ("variants") of uploaded images.
+
+Variants are rendered with Pillow in a bounded thread pool and persisted under
+MEDIA_ROOT/<IMAGE_VARIANT_DIR>/, in one directory per source named after the
+hash of its name and sharded in two levels, so each file is rendered once.
+Variant URLs carry a version token derived from the source file name, which
+makes them safe to cache as immutable.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, ImageOps, features
+
+# format -> (content type, Pillow format name), in order of preference.
+FORMATS = {
+    "avif": ("image/avif", "AVIF"),
+    "webp": ("image/webp", "WEBP"),
+    "jpeg": ("image/jpeg", "JPEG"),
+}
+FALLBACK_FORMAT = "jpeg"
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix="image-variant"
+)
+_in_flight = {}
+_in_flight_lock = threading.RLock()
+
+
+def supported_formats():
+    return [
+        fmt for fmt, (_, pil_format) in FORMATS.items() if _pillow_supports(pil_format)
+    ]
+
+
+def _pillow_supports(pil_format):
+    if pil_format == "JPEG":
+        return True
+    return features.check(pil_format.lower())
+
+
+def negotiate_format(accept):
+    """Picks the preferred format the client lists in its Accept header."""
+    accept = accept or ""
+    for fmt in supported_formats():
+        if FORMATS[fmt][0] in accept:
+            return fmt
+    return FALLBACK_FORMAT
+
+
+def version_token(name):
+    return hashlib.sha1(name.encode()).hexdigest()[:12]
+
+
+def variant_url(image_id, name, width):
+    query = urlencode({"w": width, "v": version_token(name)})
+    return f"{reverse('image_variant', args=[image_id])}?{query}"
+
+
+def srcset(image_id, name):
+    """`srcset` attribute value listing every allowed width of an image."""
+    if not image_id or not name:
+        return None
+    return ", ".join(
+        f"{variant_url(image_id, name, width)} {width}w"
+        for width in settings.IMAGE_VARIANT_WIDTHS
+    )
+
+
+def snap_quality(quality):
+    """The allowed quality nearest to `quality`."""
+    return min(settings.IMAGE_VARIANT_QUALITIES, key=lambda q: (abs(q - quality), q))
+
+
+def source_key(name):
+    """Name of the directory holding the variants of the source `name`."""
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+def variant_filename(width, quality, fmt):
+    return f"{width}w-q{quality}.{fmt}"
+
+
+def variant_path(name, width, quality, fmt):
+    key = source_key(name)
+    return os.path.join(
+        settings.MEDIA_ROOT,
+        settings.IMAGE_VARIANT_DIR,
+        key[:2],
+        key[2:4],
+        key,
+        variant_filename(width, quality, fmt),
+    )
+
+
+def _render(storage, name, width, quality, fmt, path):
+    with storage.open(name, "rb") as source, Image.open(source) as image:
+        # Lets JPEG decode at a reduced scale that still covers `width`.
+        image.draft("RGB", (width, width))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+
+        if fmt == "jpeg":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                image.save(out, FORMATS[fmt][1], quality=quality)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return path
+
+
+def get_variant(storage, name, width, quality, fmt):
+    """
+    Returns the path of the variant, rendering it in the worker pool first if
+    it is not on disk yet. Concurrent requests for one variant share a render.
+    """
+    path = variant_path(name, width, quality, fmt)
+    if os.path.exists(path):
+        return path
+
+    def forget(_):
+        with _in_flight_lock:
+            _in_flight.pop(path, None)
+
+    with _in_flight_lock:
+        future = _in_flight.get(path)
+        if future is None:
+            future = _executor.submit(_render, storage, name, width, quality, fmt, path)
+            _in_flight[path] = future
+            future.add_done_callback(forget)
+    return future.result()
@@ -0,0 +1,96 @@
+"""
+Optimistic concurrency for the admin edit views.
+
+Edited models carry a `version` that every admin write bumps. Edit responses
+send it as the ETag; a PUT with `If-Match` only applies to the version it
+names and answers 412 otherwise, so two editors cannot silently overwrite
+each other. Updates are one UPDATE of the changed fields, `edited_at` and
+`version`, matching only the row at the version it was read at.
+"""
+
+from contextlib import nullcontext
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from portfolio.models import ImageReferencing
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The row was changed since this version; reload it first."
+    default_code = "precondition_failed"
+
+
+def version_etag(instance):
+    return quote_etag(str(instance.version))
+
+
+def check_if_match(request, instance):
+    """Raises PreconditionFailed when If-Match names no version of `instance`."""
+    header = request.headers.get("If-Match")
+    if header is None:
+        return
+    etags = parse_etags(header)
+    if "*" not in etags and version_etag(instance) not in etags:
+        raise PreconditionFailed()
+
+
+def save_changes(instance, fields):
+    """
+    Writes `fields` of `instance` with a new `edited_at` and `version` in one
+    UPDATE that only matches the row at the version it was read at, then
+    syncs its image references. Raises PreconditionFailed when the row changed
+    meanwhile.
+    """
+    model = type(instance)
+    now = timezone.now()
+    values = {
+        field.attname: getattr(instance, field.attname)
+        for field in map(model._meta.get_field, fields)
+    }
+    sync = isinstance(instance, ImageReferencing) and (
+        instance.reference_key() != instance._reference_key
+    )
+    with transaction.atomic() if sync else nullcontext():
+        updated = model.objects.filter(pk=instance.pk, version=instance.version).update(
+            **{**values, "edited_at": now, "version": instance.version + 1}
+        )
+        if not updated:
+            raise PreconditionFailed()
+        instance.edited_at = now
+        instance.version += 1
+        if sync:
+            model.bulk_sync_references([instance])
+
+
+class VersionedUpdateMixin:
+    """
+    ModelSerializer mixin saving updates through `save_changes`. Subclasses
+    that resolve fields themselves override `assign`.
+    """
+
+    def assign(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+
+    def update(self, instance, validated_data):
+        fields = [
+            field
+            for field in instance._meta.concrete_fields
+            if not field.primary_key and not field.generated
+        ]
+        before = [getattr(instance, field.attname) for field in fields]
+        self.assign(instance, validated_data)
+        save_changes(
+            instance,
+            [
+                field.name
+                for field, old in zip(fields, before)
+                if getattr(instance, field.attname) != old
+            ],
+        )
+        return instance
@@ -1,3 +1,11 @@
+import os
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.db.models.functions import Greatest
 from django.shortcuts import render
 from django.utils import timezone
 from django.utils.decorators import method_decorator
@@ -10,6 +18,7 @@ from drf_spectacular.utils import (
     extend_schema_view,
 )
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -18,9 +27,27 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from docs.schema import PageSchema
+from portfolio.cache import GLOBAL_SCOPE, invalidate, read_cache_stats
 from portfolio.models import BackgroundData, Deck, PagesModel, ProjectCard, SlugEntry
-
-from .models import ImageUpload
+from portfolio.sprites import schedule_deck_sprites
+from shmooz.query_budget import query_budget
+
+from .batch import Batch, BatchRequestSerializer, BatchResponseSerializer
+from .changes import (
+    ChangesSerializer,
+    changes_since,
+    decode_cursor,
+    record_deletions,
+    record_move,
+)
+from .models import ImageUpload, MediaBlob, UploadSession
+from .patching import (
+    JSONPatchOperationSerializer,
+    JSONPatchParser,
+    apply_patch,
+    validate_patched_content,
+)
+from .previews import schedule_previews
 from .serializers import (
     BackgroundDataSerializer,
     DeckSerializer,
@@ -28,7 +55,19 @@ from .serializers import (
     PagesModelSerializer,
     ProjectCardSerializer,
     SlugEntrySerializer,
+    UploadSessionSerializer,
+)
+from .storage import image_storage
+from .uploads import (
+    BoundedUploadMixin,
+    UploadTooLarge,
+    map_uploads,
+    parse_content_range,
+    probe_image,
+    session_digest,
+    write_chunk,
 )
+from .versioning import check_if_match, save_changes, version_etag
 
 # Create your views here.
 
@@ -41,59 +80,18 @@ COOKIE_KW = dict(
 )
 
 
-def _check_pages_conflicts(old_slug: str, new_slug: str):
-    if old_slug == new_slug:
-        return
-
-    old_cats = set(
-        PagesModel.objects.filter(owner=old_slug).values_list("category", flat=True)
-    )
-    if not old_cats:
-        return
-
-    new_cats = set(
-        PagesModel.objects.filter(owner=new_slug).values_list("category", flat=True)
-    )
-
-    conflicts = sorted(old_cats.intersection(new_cats))
-    if conflicts:
-        cats_txt = ", ".join(conflicts)
-        raise ValidationError(
-            {
-                "owner": (
-                    f"Cannot rename slug '{old_slug}' to '{new_slug}' because "
-                    f"PagesModel entries for categories [{cats_txt}] already exist for '{new_slug}'. "
-                    "Resolve/merge these pages first."
-                )
-            }
-        )
-
-
-def _propagate_owner_change(old_slug: str, new_slug: str) -> dict:
-    now = timezone.now()
-    results = {}
-
-    results["BackgroundData"] = BackgroundData.objects.filter(owner=old_slug).update(
-        owner=new_slug,
-        edited_at=now,
-    )
-    results["Deck"] = Deck.objects.filter(owner=old_slug).update(
-        owner=new_slug,
-        edited_at=now,
-    )
-    results["ProjectCard"] = ProjectCard.objects.filter(owner=old_slug).update(
-        owner=new_slug,
-        edited_at=now,
-    )
-    results["PagesModel"] = PagesModel.objects.filter(owner=old_slug).update(
-        owner=new_slug,
-        edited_at=now,
-    )
-
-    return results
+def _upload_owner(slug):
+    """
+    SlugEntry an upload belongs to: `slug`, which must exist, or the default
+    slug when there is one.
+    """
+    if slug:
+        return get_object_or_404(SlugEntry, slug=slug)
+    return SlugEntry.objects.filter(slug="shmooz").first()
 
 
 @extend_schema(summary="Get CSRF cookie")
+@query_budget(1)
 class CSRFCookieView(APIView):
     permission_classes = [AllowAny]
 
@@ -106,6 +104,7 @@ class CSRFCookieView(APIView):
     summary="Login (sets refresh token cookie, returns access in body)",
     responses={200: OpenApiResponse(description="OK")},
 )
+@query_budget(1)
 class CookieTokenObtainPairView(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
@@ -121,6 +120,7 @@ class CookieTokenObtainPairView(TokenObtainPairView):
     summary="Refresh (reads refresh token from HttpOnly cookie and rotates it)",
     responses={200: OpenApiResponse(description="OK")},
 )
+@query_budget(1)
 class CookieTokenRefreshView(TokenRefreshView):
     def post(self, request, *args, **kwargs):
         request.data["refresh"] = request.COOKIES.get(REFRESH_COOKIE)
@@ -131,6 +131,7 @@ class CookieTokenRefreshView(TokenRefreshView):
     summary="Logout (blacklist refresh and clear cookie)",
     responses={204: OpenApiResponse(description="No content")},
 )
+@query_budget(1)
 class LogoutView(APIView):
     def post(self, request):
         res = Response(status=204)
@@ -146,6 +147,7 @@ class LogoutView(APIView):
         403: OpenApiResponse(description="User not authorized"),
     },
 )
+@query_budget(1)
 class AdminApiView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -156,6 +158,19 @@ class AdminApiView(APIView):
         return Response({"message": "arayi da pichenia sheyvarebuls mirchevnia!"})
 
 
+@extend_schema(
+    summary="Read cache statistics",
+    description="Returns hit/miss counters of the public portfolio read cache.",
+    responses={200: OpenApiResponse(description="Hit and miss counters")},
+)
+@query_budget(1)
+class ReadCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(read_cache_stats())
+
+
 @extend_schema(
     summary="Upload an image",
     description="Uploads an image file and associates it with a given slug.",
@@ -175,18 +190,21 @@ class AdminApiView(APIView):
         400: OpenApiResponse(description="Invalid image or payload"),
     },
 )
-class ImageUploadView(APIView):
+@query_budget(6)
+class ImageUploadView(BoundedUploadMixin, APIView):
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, slug=None):
         serializer = ImageUploadSerializer(data=request.data)
         if serializer.is_valid():
-            image_instance = serializer.save(commit=False)
+            image_instance = ImageUpload(**serializer.validated_data)
 
-            image_instance.upload_slug = slug or "shmooz"
+            image_instance.owner = _upload_owner(slug)
+            image_instance.fill_metadata()
 
             image_instance.save()
+            schedule_previews(image_instance)
             return Response(
                 {
                     "status": "success",
@@ -197,6 +215,271 @@ class ImageUploadView(APIView):
         return Response(serializer.errors, status=400)
 
 
+def _prepare_upload(file, title, owner):
+    """
+    Validates and measures one file of a bulk upload and stores its bytes.
+    Returns the status for the file and the unsaved ImageUpload or errors.
+    """
+    serializer = ImageUploadSerializer(
+        data={"title": title or os.path.splitext(file.name)[0][:50], "image": file}
+    )
+    try:
+        if not serializer.is_valid():
+            return 400, serializer.errors
+    except UploadTooLarge as exc:
+        return exc.status_code, {"image": [exc.detail]}
+
+    image_instance = ImageUpload(**serializer.validated_data)
+    image_instance.owner = owner
+    image_instance.fill_metadata()
+    image_instance.image.save(file.name, file, save=False)
+    return 201, image_instance
+
+
+@extend_schema(
+    summary="Upload several images",
+    description=(
+        "Uploads every file of the `images` field, titled by the matching "
+        "`titles` entry or the file name. Files are validated independently: "
+        "the response lists a result per file in order, with 207 when only "
+        "some of them were stored."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name="slug",
+            location=OpenApiParameter.PATH,
+            description="Slug for image categorization",
+            required=False,
+            type=str,
+        ),
+    ],
+    request={
+        "multipart/form-data": {
+            "type": "object",
+            "properties": {
+                "images": {
+                    "type": "array",
+                    "items": {"type": "string", "format": "binary"},
+                },
+                "titles": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["images"],
+        }
+    },
+    responses={
+        201: OpenApiResponse(description="Every image was stored"),
+        207: OpenApiResponse(description="Some images were stored"),
+        400: OpenApiResponse(description="No image was stored"),
+    },
+)
+@query_budget(6)
+class BulkImageUploadView(BoundedUploadMixin, APIView):
+    parser_classes = [MultiPartParser, FormParser]
+    permission_classes = [IsAuthenticated]
+    keep_oversized_files = True
+
+    def post(self, request, slug=None):
+        files = request.FILES.getlist("images")
+        if not files:
+            return Response({"images": ["No files were submitted."]}, status=400)
+        if len(files) > settings.IMAGE_BULK_UPLOAD_MAX_FILES:
+            return Response(
+                {
+                    "images": [
+                        f"At most {settings.IMAGE_BULK_UPLOAD_MAX_FILES} files "
+                        "can be uploaded at once."
+                    ]
+                },
+                status=400,
+            )
+        titles = request.data.getlist("titles")
+        titles += [None] * (len(files) - len(titles))
+
+        owner = _upload_owner(slug)
+        prepared = map_uploads(_prepare_upload, files, titles, [owner] * len(files))
+        instances = [
+            result for code, result in prepared if isinstance(result, ImageUpload)
+        ]
+        if instances:
+            with transaction.atomic():
+                ImageUpload.objects.bulk_create(instances)
+                MediaBlob.acquire(*(instance.image.name for instance in instances))
+                schedule_previews(*instances)
+
+        results = []
+        for index, (file, (code, result)) in enumerate(zip(files, prepared)):
+            entry = {"index": index, "filename": file.name, "status": code}
+            if code == 201:
+                entry["data"] = ImageUploadSerializer(result).data
+            else:
+                entry["errors"] = result
+            results.append(entry)
+
+        if len(instances) == len(files):
+            outcome, response_status = "success", 201
+        elif instances:
+            outcome, response_status = "partial", status.HTTP_207_MULTI_STATUS
+        else:
+            outcome, response_status = "failed", 400
+        return Response({"status": outcome, "results": results}, status=response_status)
+
+
+@extend_schema(
+    summary="Start a resumable upload",
+    description=(
+        "Creates an upload session for a file of `size` bytes. Send its bytes "
+        "with PUT requests carrying a Content-Range header, then finalize."
+    ),
+    request=UploadSessionSerializer,
+    responses={
+        201: UploadSessionSerializer,
+        400: OpenApiResponse(description="Validation error"),
+        413: OpenApiResponse(description="File exceeds the upload limit"),
+    },
+)
+@query_budget(3)
+class UploadSessionCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        if serializer.is_valid():
+            session = serializer.save(created_by=request.user)
+            response = Response(serializer.data, status=201)
+            response["Location"] = f"/api/upload-sessions/{session.pk}"
+            return response
+        return Response(serializer.errors, status=400)
+
+
+@extend_schema(
+    summary="Resume, send or abort a resumable upload",
+    description=(
+        "GET: Returns the session; `received` is where the upload resumes.\n\n"
+        "PUT: Writes the raw request body at the range given by "
+        "`Content-Range: bytes start-end/size`. A range may overlap bytes "
+        "already received but must not start past `received`.\n\n"
+        "DELETE: Aborts the upload."
+    ),
+    request={"application/octet-stream": bytes},
+    responses={
+        200: UploadSessionSerializer,
+        204: OpenApiResponse(description="Upload aborted"),
+        400: OpenApiResponse(description="Malformed or incomplete range"),
+        404: OpenApiResponse(description="Upload session not found"),
+        409: OpenApiResponse(description="Range starts past the received bytes"),
+        413: OpenApiResponse(description="Chunk exceeds the chunk size limit"),
+    },
+)
+@query_budget(3)
+class UploadSessionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        session = get_object_or_404(
+            UploadSession.objects.select_related("owner"),
+            pk=pk,
+            created_by=request.user,
+        )
+        return Response(UploadSessionSerializer(session).data)
+
+    def put(self, request, pk):
+        session = get_object_or_404(
+            UploadSession.objects.select_related("owner"),
+            pk=pk,
+            created_by=request.user,
+        )
+        start, end, total = parse_content_range(request.headers.get("Content-Range"))
+        if total != session.size or end >= session.size:
+            raise ValidationError(
+                f"Content-Range must lie within the {session.size} byte upload."
+            )
+        if start > session.received:
+            return Response(
+                {
+                    "detail": "Range starts past the received bytes.",
+                    "received": session.received,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        write_chunk(session, start, end, request.stream)
+        UploadSession.objects.filter(pk=session.pk).update(
+            received=Greatest("received", end + 1), edited_at=timezone.now()
+        )
+        session.received = max(session.received, end + 1)
+        return Response(UploadSessionSerializer(session).data)
+
+    def delete(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk, created_by=request.user)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@extend_schema(
+    summary="Finalize a resumable upload",
+    description=(
+        "Validates the assembled file and stores it as an image. The part file "
+        "is renamed into the upload storage rather than copied."
+    ),
+    request=None,
+    responses={
+        201: ImageUploadSerializer,
+        400: OpenApiResponse(description="Invalid image"),
+        404: OpenApiResponse(description="Upload session not found"),
+        409: OpenApiResponse(description="Upload is incomplete"),
+    },
+)
+@query_budget(9)
+class UploadSessionFinalizeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        with transaction.atomic():
+            session = get_object_or_404(
+                UploadSession.objects.select_related("owner").select_for_update(
+                    of=("self",)
+                ),
+                pk=pk,
+                created_by=request.user,
+            )
+            if session.received < session.size:
+                return Response(
+                    {
+                        "detail": "Upload is incomplete.",
+                        "received": session.received,
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            storage = image_storage()
+            key = session_digest(session)
+            extension = os.path.splitext(session.filename)[1]
+            image_instance = ImageUpload(
+                title=session.title, image=storage.digest_name(key, extension)
+            )
+            image_instance.owner = session.owner
+            with open(session.part_path, "rb") as part:
+                probe_image(File(part))
+                image_instance.fill_metadata(File(part))
+            image_instance.save()
+            # The part file moves last, once the row is committed, so a failed
+            # finalize leaves the session whole to be retried. Previews are
+            # rendered from the adopted file, so they are scheduled after it.
+            transaction.on_commit(
+                partial(storage.adopt, session.part_path, key, extension)
+            )
+            schedule_previews(image_instance)
+            session.delete()
+
+        return Response(
+            {
+                "status": "success",
+                "data": ImageUploadSerializer(image_instance).data,
+            },
+            status=201,
+        )
+
+
 @extend_schema(
     summary="Upload background data",
     description="Saves background gradient color data for a given slug.",
@@ -215,6 +498,7 @@ class ImageUploadView(APIView):
         400: OpenApiResponse(description="Validation error"),
     },
 )
+@query_budget(3)
 class BackgroundDataUploadView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -222,6 +506,7 @@ class BackgroundDataUploadView(APIView):
         serializer = BackgroundDataSerializer(data=request.data)
         if serializer.is_valid():
             background = serializer.save()
+            invalidate(background.owner.slug)
             return Response(BackgroundDataSerializer(background).data, status=201)
         return Response(serializer.errors, status=400)
 
@@ -256,6 +541,7 @@ class BackgroundDataUploadView(APIView):
         )
     ],
 )
+@query_budget(8)
 class DeckCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -266,6 +552,9 @@ class DeckCreateView(APIView):
         )
         if serializer.is_valid():
             deck = serializer.save()
+            invalidate(deck.owner.slug)
+            if deck.image_id or deck.hover_img_id:
+                schedule_deck_sprites(deck.owner.slug)
             return Response(DeckSerializer(deck).data, status=201)
         return Response(serializer.errors, status=400)
 
@@ -305,6 +594,7 @@ class DeckCreateView(APIView):
         )
     ],
 )
+@query_budget(8)
 class ProjectCardCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -315,6 +605,7 @@ class ProjectCardCreateView(APIView):
         )
         if serializer.is_valid():
             ProjectCard = serializer.save()
+            invalidate(ProjectCard.owner.slug)
             return Response(ProjectCardSerializer(ProjectCard).data, status=201)
         return Response(serializer.errors, status=400)
 
@@ -328,6 +619,7 @@ class ProjectCardCreateView(APIView):
         400: OpenApiResponse(description="Validation error"),
     },
 )
+@query_budget(4)
 class PageUploadView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -335,6 +627,7 @@ class PageUploadView(APIView):
         serializer = PagesModelSerializer(data=request.data)
         if serializer.is_valid():
             page = serializer.save()
+            invalidate(page.owner.slug)
             return Response(PagesModelSerializer(page).data, status=201)
         return Response(serializer.errors, status=400)
 
@@ -348,6 +641,7 @@ class PageUploadView(APIView):
         400: OpenApiResponse(description="Validation error"),
     },
 )
+@query_budget(3)
 class SlugCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -359,6 +653,115 @@ class SlugCreateView(APIView):
         return Response(serializer.errors, status=400)
 
 
+@extend_schema(
+    summary="Apply a batch of writes",
+    description=(
+        "Creates, updates and deletes backgrounds, decks, project cards and "
+        "pages in one transaction. `data` takes the fields of the matching "
+        "create endpoint; updates are partial. A create may name its row with "
+        "`ref`, which later operations use in place of an id (`deck_id`, "
+        "`project_card_id`).\n\n"
+        "Operations are validated in order and nothing is written unless all "
+        "of them are valid; errors are keyed by operation index. The batch is "
+        "then applied as its deletes, creates and updates, in that order."
+    ),
+    request=BatchRequestSerializer,
+    responses={
+        200: BatchResponseSerializer,
+        400: OpenApiResponse(description="Invalid operations, keyed by index"),
+        409: OpenApiResponse(description="The batch conflicts with stored rows"),
+    },
+    examples=[
+        OpenApiExample(
+            "Build a deck",
+            value={
+                "operations": [
+                    {
+                        "op": "create",
+                        "model": "deck",
+                        "ref": "deck",
+                        "data": {
+                            "title": "Work",
+                            "displayed_name": "Work",
+                            "owner": "testco",
+                            "image_id": 1,
+                        },
+                    },
+                    {
+                        "op": "create",
+                        "model": "project_card",
+                        "ref": "card",
+                        "data": {
+                            "title": "Landing Page",
+                            "text": "Welcome",
+                            "text_color": "#ffffff",
+                            "label_letter": "L",
+                            "label_color": "#000000",
+                            "inline_color": "#cccccc",
+                            "owner": "testco",
+                            "image_id": 2,
+                            "deck_id": "deck",
+                        },
+                    },
+                    {"op": "delete", "model": "project_card", "id": 7},
+                ]
+            },
+            request_only=True,
+        )
+    ],
+)
+@query_budget(44)
+class BatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = Batch(serializer.validated_data["operations"]).apply()
+        return Response({"status": "success", "results": results})
+
+
+@extend_schema(
+    summary="Changes of a slug since a cursor",
+    description=(
+        "Returns the decks, project cards, pages, backgrounds and images of the "
+        "slug created or edited since `since`, and the ids of rows it no "
+        "longer has. Without `since`, or with one older than the kept "
+        "tombstones, returns the whole state with `reset` set. Pass the "
+        "returned `cursor` as `since` next time; rows may be sent twice."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name="slug",
+            location=OpenApiParameter.PATH,
+            description="Owner slug",
+            required=True,
+            type=str,
+        ),
+        OpenApiParameter(
+            name="since",
+            location=OpenApiParameter.QUERY,
+            description="`cursor` of the previous sync",
+            required=False,
+            type=str,
+        ),
+    ],
+    responses={
+        200: ChangesSerializer,
+        400: OpenApiResponse(description="Invalid cursor"),
+        404: OpenApiResponse(description="Slug not found"),
+    },
+)
+@query_budget(8)
+class ChangesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, slug):
+        entry = get_object_or_404(SlugEntry, slug=slug)
+        since = request.query_params.get("since")
+        return Response(changes_since(entry, decode_cursor(since) if since else None))
+
+
 @extend_schema(
     summary="Update or delete a deck",
     description="PUT: Partially updates a deck.\n\nDELETE: Removes the specified deck.",
@@ -370,6 +773,13 @@ class SlugCreateView(APIView):
             required=True,
             type=int,
         ),
+        OpenApiParameter(
+            name="If-Match",
+            location=OpenApiParameter.HEADER,
+            description="PUT: ETag of the version being edited; other versions get 412",
+            required=False,
+            type=str,
+        ),
     ],
     request=DeckSerializer,
     responses={
@@ -377,26 +787,46 @@ class SlugCreateView(APIView):
         204: OpenApiResponse(description="Successfully deleted"),
         400: OpenApiResponse(description="Validation error"),
         404: OpenApiResponse(description="Deck not found"),
+        412: OpenApiResponse(
+            description="The row is no longer at the If-Match version"
+        ),
     },
 )
+@query_budget(14)
 class DeckUpdateDeleteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, pk):
-        deck = get_object_or_404(Deck, pk=pk)
+        deck = get_object_or_404(Deck.objects.select_related("owner"), pk=pk)
+        old_owner, old_owner_id = deck.owner.slug, deck.owner_id
+        old_images = (deck.image_id, deck.hover_img_id)
+        check_if_match(request, deck)
         serializer = DeckSerializer(
             deck, data=request.data, partial=True, context={"request": request}
         )
         if serializer.is_valid():
-            updated_deck = serializer.save()
-            updated_deck.edited_at = timezone.now()
-            updated_deck.save()
-            return Response(serializer.data)
+            with transaction.atomic():
+                updated_deck = serializer.save()
+                record_move(updated_deck, old_owner_id)
+            invalidate(old_owner, updated_deck.owner.slug)
+            if old_owner != updated_deck.owner.slug or old_images != (
+                updated_deck.image_id,
+                updated_deck.hover_img_id,
+            ):
+                schedule_deck_sprites(old_owner, updated_deck.owner.slug)
+            return Response(
+                serializer.data, headers={"ETag": version_etag(updated_deck)}
+            )
         return Response(serializer.errors, status=400)
 
     def delete(self, request, pk):
-        deck = get_object_or_404(Deck, pk=pk)
-        deck.delete()
+        deck = get_object_or_404(Deck.objects.select_related("owner"), pk=pk)
+        with transaction.atomic():
+            record_deletions(Deck.objects.filter(pk=deck.pk))
+            deck.delete()
+        invalidate(deck.owner.slug)
+        if deck.image_id or deck.hover_img_id:
+            schedule_deck_sprites(deck.owner.slug)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -411,6 +841,13 @@ class DeckUpdateDeleteView(APIView):
             required=True,
             type=int,
         ),
+        OpenApiParameter(
+            name="If-Match",
+            location=OpenApiParameter.HEADER,
+            description="PUT: ETag of the version being edited; other versions get 412",
+            required=False,
+            type=str,
+        ),
     ],
     request=ProjectCardSerializer,
     responses={
@@ -418,32 +855,48 @@ class DeckUpdateDeleteView(APIView):
         204: OpenApiResponse(description="Successfully deleted"),
         400: OpenApiResponse(description="Validation error"),
         404: OpenApiResponse(description="ProjectCard not found"),
+        412: OpenApiResponse(
+            description="The row is no longer at the If-Match version"
+        ),
     },
 )
+@query_budget(11)
 class ProjectCardUpdateDeleteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, pk):
-        card = get_object_or_404(ProjectCard, pk=pk)
+        card = get_object_or_404(ProjectCard.objects.select_related("owner"), pk=pk)
+        old_owner, old_owner_id = card.owner.slug, card.owner_id
+        check_if_match(request, card)
         serializer = ProjectCardSerializer(
             card, data=request.data, partial=True, context={"request": request}
         )
         if serializer.is_valid():
-            updated_card = serializer.save()
-            updated_card.edited_at = timezone.now()
-            updated_card.save()
-            return Response(serializer.data)
+            with transaction.atomic():
+                updated_card = serializer.save()
+                record_move(updated_card, old_owner_id)
+            invalidate(old_owner, updated_card.owner.slug)
+            return Response(
+                serializer.data, headers={"ETag": version_etag(updated_card)}
+            )
         return Response(serializer.errors, status=400)
 
     def delete(self, request, pk):
-        card = get_object_or_404(ProjectCard, pk=pk)
-        card.delete()
+        card = get_object_or_404(ProjectCard.objects.select_related("owner"), pk=pk)
+        with transaction.atomic():
+            record_deletions(ProjectCard.objects.filter(pk=card.pk))
+            card.delete()
+        invalidate(card.owner.slug)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 @extend_schema(
     summary="Update or delete a page",
-    description="PUT: Updates a page (JSON layout, project card link).\n\nDELETE: Deletes the page.",
+    description=(
+        "PUT: Updates a page (JSON layout, project card link).\n\n"
+        "PATCH: Applies a JSON Patch to the page's content.\n\n"
+        "DELETE: Deletes the page."
+    ),
     parameters=[
         OpenApiParameter(
             name="id",
@@ -452,6 +905,13 @@ class ProjectCardUpdateDeleteView(APIView):
             required=True,
             type=int,
         ),
+        OpenApiParameter(
+            name="If-Match",
+            location=OpenApiParameter.HEADER,
+            description="PUT, PATCH: ETag of the version being edited; other versions get 412",
+            required=False,
+            type=str,
+        ),
     ],
     request=PagesModelSerializer,
     responses={
@@ -459,26 +919,72 @@ class ProjectCardUpdateDeleteView(APIView):
         204: OpenApiResponse(description="Successfully deleted"),
         400: OpenApiResponse(description="Validation error"),
         404: OpenApiResponse(description="Page not found"),
+        412: OpenApiResponse(
+            description="The row is no longer at the If-Match version"
+        ),
     },
 )
+@query_budget(8)
 class PagesModelUpdateDeleteView(APIView):
     permission_classes = [IsAuthenticated]
+    parser_classes = [*APIView.parser_classes, JSONPatchParser]
 
     def put(self, request, pk):
-        page = get_object_or_404(PagesModel, pk=pk)
+        page = get_object_or_404(PagesModel.objects.select_related("owner"), pk=pk)
+        old_owner, old_owner_id = page.owner.slug, page.owner_id
+        check_if_match(request, page)
         serializer = PagesModelSerializer(
             page, data=request.data, partial=True, context={"request": request}
         )
         if serializer.is_valid():
-            updated_page = serializer.save()
-            updated_page.edited_at = timezone.now()
-            updated_page.save()
-            return Response(PagesModelSerializer(updated_page).data)
+            with transaction.atomic():
+                updated_page = serializer.save()
+                record_move(updated_page, old_owner_id)
+            invalidate(old_owner, updated_page.owner.slug)
+            return Response(
+                PagesModelSerializer(updated_page).data,
+                headers={"ETag": version_etag(updated_page)},
+            )
         return Response(serializer.errors, status=400)
 
+    @extend_schema(
+        summary="Patch a page's content",
+        description=(
+            "Applies a JSON Patch (RFC 6902) to the page's content block list, "
+            "atomically. Only the blocks the patch touches are validated again."
+        ),
+        request=JSONPatchOperationSerializer(many=True),
+        responses={
+            200: PagesModelSerializer,
+            400: OpenApiResponse(description="Malformed patch or invalid blocks"),
+            404: OpenApiResponse(description="Page not found"),
+            409: OpenApiResponse(description="The patch does not apply"),
+            412: OpenApiResponse(
+                description="The row is no longer at the If-Match version"
+            ),
+        },
+    )
+    def patch(self, request, pk):
+        page = get_object_or_404(PagesModel.objects.select_related("owner"), pk=pk)
+        check_if_match(request, page)
+        operations = JSONPatchOperationSerializer(data=request.data, many=True)
+        operations.is_valid(raise_exception=True)
+
+        content, blocks = apply_patch(page.content, operations.validated_data)
+        validate_patched_content(content, blocks)
+        page.content = content
+        save_changes(page, ["content"])
+        invalidate(page.owner.slug)
+        return Response(
+            PagesModelSerializer(page).data, headers={"ETag": version_etag(page)}
+        )
+
     def delete(self, request, pk):
-        page = get_object_or_404(PagesModel, pk=pk)
-        page.delete()
+        page = get_object_or_404(PagesModel.objects.select_related("owner"), pk=pk)
+        with transaction.atomic():
+            record_deletions(PagesModel.objects.filter(pk=page.pk))
+            page.delete()
+        invalidate(page.owner.slug)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -500,42 +1006,36 @@ class PagesModelUpdateDeleteView(APIView):
         204: OpenApiResponse(description="Successfully deleted"),
         400: OpenApiResponse(description="Validation error"),
         404: OpenApiResponse(description="SlugEntry not found"),
+        409: OpenApiResponse(description="The slug still owns content"),
     },
 )
+@query_budget(13)
 class SlugEntryUpdateDeleteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, pk):
         slug_entry = get_object_or_404(SlugEntry, pk=pk)
-        old_slug = slug_entry.slug
 
         serializer = SlugEntrySerializer(
             slug_entry, data=request.data, partial=True, context={"request": request}
         )
         serializer.is_valid(raise_exception=True)
 
-        new_slug = serializer.validated_data.get("slug", old_slug)
-
-        _check_pages_conflicts(old_slug, new_slug)
-
-        with transaction.atomic():
-            updated_entry = serializer.save()
-            updated_entry.edited_at = timezone.now()
-            updated_entry.save(update_fields=["edited_at"])
-
-            cascade_result = {}
-            if old_slug != new_slug:
-                cascade_result = _propagate_owner_change(old_slug, new_slug)
-
-        response_payload = {
-            "slug_entry": SlugEntrySerializer(updated_entry).data,
-            "cascade": cascade_result,
-        }
-        return Response(response_payload)
+        # Content references the entry by key, so renaming is this one row;
+        # saving it invalidates the cached reads of both names.
+        updated_entry = serializer.save(edited_at=timezone.now())
+        return Response({"slug_entry": SlugEntrySerializer(updated_entry).data})
 
     def delete(self, request, pk):
         slug_entry = get_object_or_404(SlugEntry, pk=pk)
-        slug_entry.delete()
+        try:
+            slug_entry.delete()
+        except ProtectedError:
+            return Response(
+                {"detail": "Delete the content of this slug before the slug."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        invalidate(GLOBAL_SCOPE, slug_entry.slug)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -550,6 +1050,13 @@ class SlugEntryUpdateDeleteView(APIView):
             required=True,
             type=int,
         ),
+        OpenApiParameter(
+            name="If-Match",
+            location=OpenApiParameter.HEADER,
+            description="PUT: ETag of the version being edited; other versions get 412",
+            required=False,
+            type=str,
+        ),
     ],
     request=BackgroundDataSerializer,
     responses={
@@ -557,24 +1064,41 @@ class SlugEntryUpdateDeleteView(APIView):
         204: OpenApiResponse(description="Successfully deleted"),
         400: OpenApiResponse(description="Validation error"),
         404: OpenApiResponse(description="BackgroundData not found"),
+        412: OpenApiResponse(
+            description="The row is no longer at the If-Match version"
+        ),
     },
 )
+@query_budget(7)
 class BackgroundDataUpdateDeleteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, pk):
-        background = get_object_or_404(BackgroundData, pk=pk)
+        background = get_object_or_404(
+            BackgroundData.objects.select_related("owner"), pk=pk
+        )
+        old_owner, old_owner_id = background.owner.slug, background.owner_id
+        check_if_match(request, background)
         serializer = BackgroundDataSerializer(
             background, data=request.data, partial=True, context={"request": request}
         )
         if serializer.is_valid():
-            updated = serializer.save()
-            updated.edited_at = timezone.now()
-            updated.save()
-            return Response(BackgroundDataSerializer(updated).data)
+            with transaction.atomic():
+                updated = serializer.save()
+                record_move(updated, old_owner_id)
+            invalidate(old_owner, updated.owner.slug)
+            return Response(
+                BackgroundDataSerializer(updated).data,
+                headers={"ETag": version_etag(updated)},
+            )
         return Response(serializer.errors, status=400)
 
     def delete(self, request, pk):
-        background = get_object_or_404(BackgroundData, pk=pk)
-        background.delete()
+        background = get_object_or_404(
+            BackgroundData.objects.select_related("owner"), pk=pk
+        )
+        with transaction.atomic():
+            record_deletions(BackgroundData.objects.filter(pk=background.pk))
+            background.delete()
+        invalidate(background.owner.slug)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,229 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+# Scope for responses that are not owned by a single slug (e.g. the slug list).
+GLOBAL_SCOPE = "*"
+
+STATS_KEYS = {
+    "hits": "portfolio:read-cache:hits",
+    "misses": "portfolio:read-cache:misses",
+}
+
+CACHED_HEADERS = ("ETag", "Last-Modified", "Cache-Control", "Vary", "Link")
+
+_negotiation = DefaultContentNegotiation()
+_pending = Counter()
+_pending_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.PORTFOLIO_READ_CACHE_ALIAS]
+
+
+def _generation_key(scope):
+    return f"portfolio:gen:{scope}"
+
+
+def get_generation(scope):
+    """
+    Returns the current generation of a scope. A missing counter starts from the
+    clock rather than 0 so an evicted counter can never resurrect old entries.
+    """
+    cache = _cache()
+    key = _generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def _bump(scopes):
+    cache = _cache()
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def invalidate(*scopes):
+    """
+    Drops every cached read response of the given slugs in O(1) by bumping their
+    generation counters once the current transaction commits.
+    """
+    scopes = {scope for scope in scopes if scope}
+    if scopes:
+        transaction.on_commit(partial(_bump, scopes))
+
+
+def _flush_counts():
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+    cache = _cache()
+    for name, count in pending.items():
+        try:
+            cache.incr(STATS_KEYS[name], count)
+        except ValueError:
+            if not cache.add(STATS_KEYS[name], count, timeout=None):
+                cache.incr(STATS_KEYS[name], count)
+
+
+def _count(name):
+    """
+    Counts a lookup in process memory; the shared counters are updated once
+    every PORTFOLIO_READ_CACHE_STATS_FLUSH lookups, not on each request.
+    """
+    with _pending_lock:
+        _pending[name] += 1
+        due = _pending.total() >= settings.PORTFOLIO_READ_CACHE_STATS_FLUSH
+    if due:
+        _flush_counts()
+
+
+def read_cache_stats():
+    """Hits and misses of every process, up to their last flush, and this one."""
+    _flush_counts()
+    cache = _cache()
+    stats = {name: cache.get(key, 0) for name, key in STATS_KEYS.items()}
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else None
+    return stats
+
+
+def _media_type(request):
+    """
+    Media type the default renderers answer `request` with, so Accept headers
+    picking the same renderer share entries.
+    """
+    renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+    try:
+        renderer, _ = _negotiation.select_renderer(Request(request), renderers)
+    except NotAcceptable:
+        return ""
+    return renderer.media_type
+
+
+def _response_key(request, scope, vary):
+    varying = "|".join(request.headers.get(header, "") for header in vary)
+    raw = f"{request.get_full_path()}|{_media_type(request)}|{varying}"
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f"portfolio:resp:{scope}:{get_generation(scope)}:{digest}"
+
+
+def _slug_scope(request, slug=None, **kwargs):
+    return slug
+
+
+class RememberedScope:
+    """
+    Scope looked up in the database, remembered per path in the read cache so
+    hits run no query. A remembered slug only goes stale when the row moved to
+    another slug, which bumped the old slug's generation: the lookup misses and
+    the scope is looked up again.
+    """
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+
+    def _key(self, request):
+        return f"portfolio:scope:{request.path}"
+
+    def remembered(self, request):
+        return _cache().get(self._key(request))
+
+    def __call__(self, request, *args, **kwargs):
+        slug = self.lookup(request, *args, **kwargs)
+        if slug:
+            _cache().set(
+                self._key(request), slug, settings.PORTFOLIO_READ_CACHE_TIMEOUT
+            )
+        return slug
+
+
+def cached_read(scope=_slug_scope, vary=()):
+    """
+    View decorator caching successful GET responses under the slug returned by
+    `scope(request, *args, **kwargs)`, or remembered by a RememberedScope.
+    Apply to `dispatch` through `method_decorator` so cached hits skip the
+    view and the database entirely. Entries vary by negotiated media type.
+    """
+    remembers = isinstance(scope, RememberedScope)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+
+            cache = _cache()
+            if remembers:
+                slug = scope.remembered(request)
+            else:
+                slug = scope(request, *args, **kwargs)
+            if slug:
+                key = _response_key(request, slug, vary)
+                entry = cache.get(key)
+                if entry is not None:
+                    _count("hits")
+                    return _replay(request, entry)
+            if remembers:
+                slug = scope(request, *args, **kwargs)
+                key = _response_key(request, slug, vary) if slug else None
+            if not slug:
+                return view_func(request, *args, **kwargs)
+
+            _count("misses")
+            response = view_func(request, *args, **kwargs)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+            if response.status_code == 200:
+                cache.set(
+                    key,
+                    {
+                        "content": response.content,
+                        "content_type": response["Content-Type"],
+                        "headers": {
+                            header: response[header]
+                            for header in CACHED_HEADERS
+                            if response.has_header(header)
+                        },
+                    },
+                    settings.PORTFOLIO_READ_CACHE_TIMEOUT,
+                )
+            response["X-Read-Cache"] = "MISS"
+            return response
+
+        return inner
+
+    return decorator
+
+
+def _replay(request, entry):
+    headers = entry["headers"]
+    last_modified = parse_http_date_safe(headers.get("Last-Modified", ""))
+    response = get_conditional_response(
+        request, etag=headers.get("ETag"), last_modified=last_modified
+    )
+    if response is None:
+        response = HttpResponse(entry["content"], content_type=entry["content_type"])
+    for header, value in headers.items():
+        response[header] = value
+    response["X-Read-Cache"] = "HIT"
+    return response
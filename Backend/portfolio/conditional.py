@@ -0,0 +1,113 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.db.models.functions import Coalesce
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from administration.models import ImageUpload
+
+from .models import SlugEntry
+
+
+def _last_modified_expression(model):
+    if any(field.name == "sort_ts" for field in model._meta.get_fields()):
+        return Max("sort_ts")
+    return Max(Coalesce("edited_at", "created_at"))
+
+
+def _embedded_fields(model):
+    """
+    Aggregates over the foreign keys of `model` whose rows responses embed: the
+    count and newest update of its images and the slug and edit of its owner.
+    """
+    aggregates = {}
+    for field in model._meta.concrete_fields:
+        if not field.is_relation:
+            continue
+        if field.related_model is ImageUpload:
+            aggregates[f"{field.name}_count"] = Count(field.name)
+            aggregates[f"{field.name}_updated"] = Max(f"{field.name}__updated_at")
+        elif field.related_model is SlugEntry:
+            aggregates[f"{field.name}_slug"] = Max(f"{field.name}__slug")
+            aggregates[f"{field.name}_edited"] = Max(f"{field.name}__edited_at")
+    return aggregates
+
+
+def queryset_validators(querysets, salt=""):
+    """
+    Builds a strong ETag and a Last-Modified timestamp for one or more querysets
+    from a single aggregate query each: row count and newest edit/creation
+    time, the count and newest update of the images the rows point at, and
+    the slug and last edit of their owner.
+    """
+    parts = [salt]
+    newest = None
+    for qs in querysets:
+        embedded = _embedded_fields(qs.model)
+        stats = qs.order_by().aggregate(
+            count=Count("id"),
+            last_modified=_last_modified_expression(qs.model),
+            **embedded,
+        )
+        stamps = [stats["count"]]
+        for name in ("last_modified", *embedded):
+            value = stats[name]
+            if isinstance(value, datetime):
+                if newest is None or value > newest:
+                    newest = value
+                value = value.isoformat()
+            stamps.append("-" if value is None else value)
+        parts.append(":".join(map(str, stamps)))
+
+    digest = hashlib.sha1("|".join(parts).encode()).hexdigest()
+    timestamp = int(newest.timestamp()) if newest else None
+    return quote_etag(digest), timestamp
+
+
+def conditional_get(validator_querysets, vary=()):
+    """
+    View decorator answering If-None-Match / If-Modified-Since with a 304 before
+    the view runs, so nothing is fetched or serialized for unchanged content.
+
+    `validator_querysets(request, *args, **kwargs)` returns the querysets whose
+    rows make up the response. Use through `method_decorator(..., name="get")`.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            querysets = validator_querysets(request, *args, **kwargs)
+            media_type = getattr(request, "accepted_media_type", "")
+            salt = f"{settings.PORTFOLIO_ETAG_VERSION}:{media_type}"
+            etag, last_modified = queryset_validators(querysets, salt=salt)
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response["ETag"] = etag
+                if last_modified is not None:
+                    response["Last-Modified"] = http_date(last_modified)
+                patch_cache_control(
+                    response,
+                    public=True,
+                    max_age=settings.PORTFOLIO_CACHE_MAX_AGE,
+                    stale_while_revalidate=settings.PORTFOLIO_STALE_WHILE_REVALIDATE,
+                )
+            patch_vary_headers(response, ("Accept", *vary))
+            return response
+
+        return inner
+
+    return decorator
@@ -0,0 +1,164 @@
+"""
+Read-only serialization for the public deck and project card endpoints.
+
+Rows are fetched with `.values()` (image file names joined in the same query)
+and turned into dicts matching `DeckSerializer` / `ProjectCardSerializer`
+output key for key, so the rendered JSON is byte-identical without building
+model instances or running SerializerMethodFields per row.
+"""
+
+from functools import lru_cache
+
+from rest_framework import serializers
+
+from administration.metadata import METADATA_FIELDS
+from administration.models import ImageUpload
+from administration.variants import srcset
+
+_datetime_field = serializers.DateTimeField()
+
+
+def _datetime(value):
+    if value is None:
+        return None
+    return _datetime_field.to_representation(value)
+
+
+@lru_cache(maxsize=4096)
+def _image_url(name):
+    if not name:
+        return None
+    return ImageUpload._meta.get_field("image").storage.url(name)
+
+
+@lru_cache(maxsize=4096)
+def _srcset(image_id, name):
+    return srcset(image_id, name)
+
+
+def _image_meta(row, prefix):
+    if row[f"{prefix}__width"] is None:
+        return None
+    return {field: row[f"{prefix}__{field}"] for field in METADATA_FIELDS}
+
+
+def _meta_values(prefix):
+    return tuple(f"{prefix}__{field}" for field in METADATA_FIELDS)
+
+
+DECK_VALUES = (
+    "id",
+    "title",
+    "displayed_name",
+    "owner__slug",
+    "image_id",
+    "image__image",
+    "hover_img_id",
+    "hover_img__image",
+    "card_amount",
+    "x_offsets",
+    "y_offsets",
+    "rotations",
+    "alphas",
+    "brightness",
+    "hover_x_offsets",
+    "hover_y_offsets",
+    "hover_rotations",
+    "hover_brightness",
+    "created_at",
+    "edited_at",
+    "version",
+    "sort_ts",
+    "text_color",
+    "hover_color",
+    *_meta_values("image"),
+    *_meta_values("hover_img"),
+)
+
+PROJECT_CARD_VALUES = (
+    "id",
+    "title",
+    "text",
+    "text_color",
+    "label_letter",
+    "label_color",
+    "inline_color",
+    "owner__slug",
+    "image_id",
+    "image__image",
+    "deck_id",
+    "created_at",
+    "edited_at",
+    "version",
+    "sort_ts",
+    *_meta_values("image"),
+)
+
+
+def deck_rows(queryset):
+    return queryset.values(*DECK_VALUES)
+
+
+def project_card_rows(queryset):
+    return queryset.values(*PROJECT_CARD_VALUES)
+
+
+def serialize_deck(row):
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "displayed_name": row["displayed_name"],
+        "owner": row["owner__slug"],
+        "image": row["image_id"],
+        "image_url": _image_url(row["image__image"]),
+        "image_srcset": _srcset(row["image_id"], row["image__image"]),
+        "image_meta": _image_meta(row, "image"),
+        "hover_img": row["hover_img_id"],
+        "hover_img_url": _image_url(row["hover_img__image"]),
+        "hover_img_srcset": _srcset(row["hover_img_id"], row["hover_img__image"]),
+        "hover_img_meta": _image_meta(row, "hover_img"),
+        "card_amount": row["card_amount"],
+        "x_offsets": row["x_offsets"],
+        "y_offsets": row["y_offsets"],
+        "rotations": row["rotations"],
+        "alphas": row["alphas"],
+        "brightness": row["brightness"],
+        "hover_x_offsets": row["hover_x_offsets"],
+        "hover_y_offsets": row["hover_y_offsets"],
+        "hover_rotations": row["hover_rotations"],
+        "hover_brightness": row["hover_brightness"],
+        "created_at": _datetime(row["created_at"]),
+        "edited_at": _datetime(row["edited_at"]),
+        "version": row["version"],
+        "text_color": row["text_color"],
+        "hover_color": row["hover_color"],
+    }
+
+
+def serialize_project_card(row):
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "text": row["text"],
+        "text_color": row["text_color"],
+        "label_letter": row["label_letter"],
+        "label_color": row["label_color"],
+        "inline_color": row["inline_color"],
+        "owner": row["owner__slug"],
+        "image": row["image_id"],
+        "image_url": _image_url(row["image__image"]),
+        "image_srcset": _srcset(row["image_id"], row["image__image"]),
+        "image_meta": _image_meta(row, "image"),
+        "deck": row["deck_id"],
+        "created_at": _datetime(row["created_at"]),
+        "edited_at": _datetime(row["edited_at"]),
+        "version": row["version"],
+    }
+
+
+def serialize_decks(rows):
+    return [serialize_deck(row) for row in rows]
+
+
+def serialize_project_cards(rows):
+    return [serialize_project_card(row) for row in rows]
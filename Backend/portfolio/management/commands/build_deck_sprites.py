@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from portfolio.models import Deck, DeckSprite
+from portfolio.sprites import build_deck_sprite, delete_retired_sprites
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the deck image sprite atlas of every slug with decks, or of "
+        "--slug only. Atlases whose images did not change are left as they are. "
+        "Superseded atlases older than --retention-hours are deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--slug", action="append", default=None)
+        parser.add_argument(
+            "--retention-hours",
+            type=float,
+            default=None,
+            help="Age after which a superseded atlas is deleted.",
+        )
+
+    def handle(self, *args, slug, retention_hours, **options):
+        if retention_hours is None:
+            retention_hours = settings.DECK_SPRITE_RETENTION_HOURS
+        owners = slug
+        if owners is None:
+            owners = set(Deck.objects.values_list("owner__slug", flat=True))
+            owners.update(DeckSprite.objects.values_list("owner__slug", flat=True))
+
+        built = 0
+        for owner in sorted(owners):
+            if build_deck_sprite(owner) is not None:
+                built += 1
+        self.stdout.write(f"{built} deck sprites up to date.")
+
+        deleted = delete_retired_sprites(timedelta(hours=retention_hours))
+        self.stdout.write(f"Deleted {deleted} superseded deck sprites.")
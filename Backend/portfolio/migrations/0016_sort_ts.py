@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:07
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0002_alter_imageupload_options'),
+        ('portfolio', '0015_deck_hover_color'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deck',
+            name='sort_ts',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce('edited_at', 'created_at'), output_field=models.DateTimeField()),
+        ),
+        migrations.AddField(
+            model_name='pagesmodel',
+            name='sort_ts',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce('edited_at', 'created_at'), output_field=models.DateTimeField()),
+        ),
+        migrations.AddField(
+            model_name='projectcard',
+            name='sort_ts',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce('edited_at', 'created_at'), output_field=models.DateTimeField()),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['owner', 'sort_ts'], name='portfolio_d_owner_e9fbcc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagesmodel',
+            index=models.Index(fields=['owner', 'sort_ts'], name='portfolio_p_owner_0c8ef6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectcard',
+            index=models.Index(fields=['owner', 'sort_ts'], name='portfolio_p_owner_207cc0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectcard',
+            index=models.Index(fields=['owner', 'deck', 'sort_ts'], name='portfolio_p_owner_0cb7a3_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from portfolio.references import content_image_urls, resolve_image_urls
+
+
+def index_existing_references(apps, schema_editor):
+    ImageUpload = apps.get_model('administration', 'ImageUpload')
+    Deck = apps.get_model('portfolio', 'Deck')
+    ProjectCard = apps.get_model('portfolio', 'ProjectCard')
+    PagesModel = apps.get_model('portfolio', 'PagesModel')
+    ImageReference = apps.get_model('portfolio', 'ImageReference')
+
+    references = []
+    for deck_id, image_id, hover_img_id in Deck.objects.values_list('id', 'image_id', 'hover_img_id'):
+        if image_id is not None:
+            references.append(ImageReference(image_id=image_id, field='image', deck_id=deck_id))
+        if hover_img_id is not None:
+            references.append(ImageReference(image_id=hover_img_id, field='hover_img', deck_id=deck_id))
+    for card_id, image_id in ProjectCard.objects.exclude(image=None).values_list('id', 'image_id'):
+        references.append(ImageReference(image_id=image_id, field='image', project_card_id=card_id))
+    for page_id, content in PagesModel.objects.values_list('id', 'content').iterator():
+        for image_id in resolve_image_urls(content_image_urls(content), ImageUpload):
+            references.append(ImageReference(image_id=image_id, field='content', page_id=page_id))
+    ImageReference.objects.bulk_create(references, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0005_upload_session'),
+        ('portfolio', '0016_sort_ts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=20)),
+                ('deck', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.deck')),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='references', to='administration.imageupload')),
+                ('page', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.pagesmodel')),
+                ('project_card', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.projectcard')),
+            ],
+        ),
+        migrations.RunPython(index_existing_references, migrations.RunPython.noop),
+    ]
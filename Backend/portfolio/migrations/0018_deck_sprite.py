@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0017_image_reference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeckSprite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=50, unique=True)),
+                ('image', models.FileField(max_length=255, upload_to='')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('tiles', models.JSONField(default=dict)),
+                ('source_key', models.CharField(max_length=40)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('edited_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+OWNED_MODELS = ('BackgroundData', 'Deck', 'DeckSprite', 'PagesModel', 'ProjectCard')
+
+
+def backfill_model(model, SlugEntry):
+    """
+    Points the rows of `model` at the SlugEntry of their owner slug in batches,
+    each committed on its own so the table stays writable meanwhile.
+    """
+    entry = SlugEntry.objects.filter(slug=OuterRef('owner')).values('id')[:1]
+    pending = model.objects.filter(tenant__isnull=True).order_by('pk')
+    batch = pending
+    while True:
+        pks = list(batch.values_list('pk', flat=True)[:BATCH_SIZE])
+        if not pks:
+            return
+        model.objects.filter(pk__in=pks).update(tenant=Subquery(entry))
+        batch = pending.filter(pk__gt=pks[-1])
+
+
+def backfill_tenants(apps, schema_editor):
+    """Creates the SlugEntry of owners without one, then links every row."""
+    SlugEntry = apps.get_model('portfolio', 'SlugEntry')
+    models_ = [apps.get_model('portfolio', name) for name in OWNED_MODELS]
+
+    owners = set()
+    for model in models_:
+        owners.update(model.objects.values_list('owner', flat=True).distinct())
+    SlugEntry.objects.bulk_create(
+        [SlugEntry(slug=owner) for owner in owners], ignore_conflicts=True
+    )
+    for model in models_:
+        backfill_model(model, SlugEntry)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        # Its backfill reads image owners from content owner slugs.
+        ('administration', '0006_image_owner'),
+        ('portfolio', '0018_deck_sprite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgrounddata',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='backgrounds', to='portfolio.slugentry'),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='decks', to='portfolio.slugentry'),
+        ),
+        migrations.AddField(
+            model_name='decksprite',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.slugentry'),
+        ),
+        migrations.AddField(
+            model_name='pagesmodel',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='pages', to='portfolio.slugentry'),
+        ),
+        migrations.AddField(
+            model_name='projectcard',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='project_cards', to='portfolio.slugentry'),
+        ),
+        migrations.RunPython(backfill_tenants, migrations.RunPython.noop),
+    ]
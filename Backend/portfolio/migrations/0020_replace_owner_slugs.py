@@ -0,0 +1,143 @@
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+owner_foreign_key = importlib.import_module('portfolio.migrations.0019_owner_foreign_key')
+
+
+def backfill_late_rows(apps, schema_editor):
+    """
+    Links the rows written since the online backfill of 0019. The tables are
+    locked against writes until this migration commits, so no row can be left
+    without a tenant when the owner columns are replaced.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        for name in owner_foreign_key.OWNED_MODELS:
+            table = apps.get_model('portfolio', name)._meta.db_table
+            cursor.execute(f'LOCK TABLE {schema_editor.quote_name(table)} IN SHARE MODE')
+    owner_foreign_key.backfill_tenants(apps, schema_editor)
+    # Checks the new foreign keys now; pending checks would block the ALTERs.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0019_owner_foreign_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_late_rows, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='pagesmodel',
+            unique_together=set(),
+        ),
+        migrations.RemoveIndex(
+            model_name='deck',
+            name='portfolio_d_owner_e9fbcc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='pagesmodel',
+            name='portfolio_p_owner_0c8ef6_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='projectcard',
+            name='portfolio_p_owner_207cc0_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='projectcard',
+            name='portfolio_p_owner_0cb7a3_idx',
+        ),
+        migrations.RemoveField(
+            model_name='backgrounddata',
+            name='owner',
+        ),
+        migrations.RemoveField(
+            model_name='deck',
+            name='owner',
+        ),
+        migrations.RemoveField(
+            model_name='decksprite',
+            name='owner',
+        ),
+        migrations.RemoveField(
+            model_name='pagesmodel',
+            name='owner',
+        ),
+        migrations.RemoveField(
+            model_name='projectcard',
+            name='owner',
+        ),
+        migrations.RenameField(
+            model_name='backgrounddata',
+            old_name='tenant',
+            new_name='owner',
+        ),
+        migrations.RenameField(
+            model_name='deck',
+            old_name='tenant',
+            new_name='owner',
+        ),
+        migrations.RenameField(
+            model_name='decksprite',
+            old_name='tenant',
+            new_name='owner',
+        ),
+        migrations.RenameField(
+            model_name='pagesmodel',
+            old_name='tenant',
+            new_name='owner',
+        ),
+        migrations.RenameField(
+            model_name='projectcard',
+            old_name='tenant',
+            new_name='owner',
+        ),
+        migrations.AlterField(
+            model_name='backgrounddata',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='backgrounds', to='portfolio.slugentry'),
+        ),
+        migrations.AlterField(
+            model_name='deck',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='decks', to='portfolio.slugentry'),
+        ),
+        migrations.AlterField(
+            model_name='decksprite',
+            name='owner',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='deck_sprite', to='portfolio.slugentry'),
+        ),
+        migrations.AlterField(
+            model_name='pagesmodel',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='pages', to='portfolio.slugentry'),
+        ),
+        migrations.AlterField(
+            model_name='projectcard',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='project_cards', to='portfolio.slugentry'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pagesmodel',
+            unique_together={('owner', 'category')},
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['owner', 'sort_ts'], name='portfolio_d_owner_i_7a176a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagesmodel',
+            index=models.Index(fields=['owner', 'sort_ts'], name='portfolio_p_owner_i_d4ded0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectcard',
+            index=models.Index(fields=['owner', 'sort_ts'], name='portfolio_p_owner_i_8e5d5b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectcard',
+            index=models.Index(fields=['owner', 'deck', 'sort_ts'], name='portfolio_p_owner_i_052bfc_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("portfolio", "0020_replace_owner_slugs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="backgrounddata",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="deck",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="pagesmodel",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="projectcard",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
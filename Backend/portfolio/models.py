@@ -1,16 +1,126 @@
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from administration.models import ImageUpload
 
+from .cache import GLOBAL_SCOPE, invalidate
+from .references import content_image_urls, image_ids_by_url, resolve_image_urls
+
 # Create your models here.
 
 
-class Deck(models.Model):
+class ImageReferencing(models.Model):
+    """
+    Base for models using images. Saving rewrites the row's ImageReference
+    rows when the images it uses changed since it was loaded; deleting
+    cascades to them. Writes bypassing `save` (bulk_create, update) must
+    maintain the references themselves.
+    """
+
+    # ImageReference field pointing back at this model.
+    reference_source = None
+    # Fields deciding the references; saves leaving them all out of
+    # `update_fields` keep the references as they are.
+    reference_fields = ()
+
+    _reference_key = None
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        deferred = instance.get_deferred_fields()
+        if not any(
+            cls._meta.get_field(name).attname in deferred
+            for name in cls.reference_fields
+        ):
+            instance._reference_key = instance.reference_key()
+        return instance
+
+    def reference_key(self):
+        """Cheap value, without queries, that changes with the used images."""
+        return tuple(
+            getattr(self, self._meta.get_field(name).attname)
+            for name in self.reference_fields
+        )
+
+    def referenced_images(self):
+        """Returns `(image_id, field)` pairs for the images this row uses."""
+        raise NotImplementedError
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        key = self.reference_key()
+        if key == self._reference_key or (
+            update_fields is not None
+            and not set(update_fields) & set(self.reference_fields)
+        ):
+            return super().save(*args, **kwargs)
+
+        adding = self._state.adding
+        wanted = set(self.referenced_images())
+        if adding and not wanted:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if not adding:
+                    ImageReference.objects.filter(
+                        **{self.reference_source: self}
+                    ).delete()
+                ImageReference.objects.bulk_create(
+                    ImageReference(
+                        image_id=image_id, field=field, **{self.reference_source: self}
+                    )
+                    for image_id, field in wanted
+                )
+        self._reference_key = key
+
+    @classmethod
+    def bulk_referenced_images(cls, instances):
+        """`referenced_images` of each instance, in order."""
+        return [instance.referenced_images() for instance in instances]
+
+    @classmethod
+    def bulk_sync_references(cls, instances, created=False):
+        """
+        Brings the references of rows written with bulk_create (`created`) or
+        bulk_update in line with their images, in at most three queries.
+        """
+        changed = [
+            instance
+            for instance in instances
+            if created or instance.reference_key() != instance._reference_key
+        ]
+        if not changed:
+            return
+        if not created:
+            ImageReference.objects.filter(
+                **{f"{cls.reference_source}__in": changed}
+            ).delete()
+        ImageReference.objects.bulk_create(
+            ImageReference(
+                image_id=image_id, field=field, **{cls.reference_source: instance}
+            )
+            for instance, wanted in zip(changed, cls.bulk_referenced_images(changed))
+            for image_id, field in wanted
+        )
+        for instance in changed:
+            instance._reference_key = instance.reference_key()
+
+
+class Deck(ImageReferencing):
     title = models.CharField(max_length=50)
     displayed_name = models.CharField(max_length=50)
-    owner = models.CharField(max_length=50)
+    owner = models.ForeignKey(
+        "portfolio.SlugEntry",
+        on_delete=models.PROTECT,
+        related_name="decks",
+    )
 
     image = models.ForeignKey(
         "administration.ImageUpload",
@@ -42,29 +152,95 @@ class Deck(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     edited_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Bumped by every admin write; the ETag of the edit endpoints.
+    version = models.PositiveIntegerField(default=1)
+    sort_ts = models.GeneratedField(
+        expression=Coalesce("edited_at", "created_at"),
+        output_field=models.DateTimeField(),
+        db_persist=True,
+    )
+
+    reference_source = "deck"
+    reference_fields = ("image", "hover_img")
 
     class Meta:
         ordering = ["id"]
         indexes = [
             models.Index(fields=["-edited_at"]),
             models.Index(fields=["-created_at"]),
+            models.Index(fields=["owner", "sort_ts"]),
         ]
 
     def __str__(self):
         return self.title
 
+    def referenced_images(self):
+        return {
+            (image_id, field)
+            for image_id, field in (
+                (self.image_id, "image"),
+                (self.hover_img_id, "hover_img"),
+            )
+            if image_id is not None
+        }
+
+
+class DeckSprite(models.Model):
+    """
+    Sprite atlas of the deck images of a slug, built by `portfolio.sprites`.
+    `tiles` maps the file name of each source image to its `[x, y, width,
+    height]` in the atlas.
+    """
+
+    owner = models.OneToOneField(
+        "portfolio.SlugEntry",
+        on_delete=models.CASCADE,
+        related_name="deck_sprite",
+    )
+    image = models.FileField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    tiles = models.JSONField(default=dict)
+    # Digest of the source names and atlas settings the atlas was built from.
+    source_key = models.CharField(max_length=40)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    edited_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Sprite of {self.owner}"
+
 
 class SlugEntry(models.Model):
     slug = models.CharField(max_length=50, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     edited_at = models.DateTimeField(null=True, blank=True)
 
+    _saved_slug = None
+
     def __str__(self):
         return self.slug
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_slug = instance.__dict__.get("slug")
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Read responses embed the slug: those cached under its old and new
+        # name and the slug list are stale, whichever path renamed it.
+        invalidate(GLOBAL_SCOPE, self._saved_slug, self.slug)
+        self._saved_slug = self.slug
+
 
 class BackgroundData(models.Model):
-    owner = models.CharField(max_length=50)
+    owner = models.ForeignKey(
+        "portfolio.SlugEntry",
+        on_delete=models.PROTECT,
+        related_name="backgrounds",
+    )
 
     color1 = models.CharField(max_length=50)
     color2 = models.CharField(max_length=50)
@@ -84,12 +260,14 @@ class BackgroundData(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     edited_at = models.DateTimeField(null=True, blank=True)
+    # Bumped by every admin write; the ETag of the edit endpoints.
+    version = models.PositiveIntegerField(default=1)
 
     def __str__(self):
-        return self.owner
+        return str(self.owner)
 
 
-class ProjectCard(models.Model):
+class ProjectCard(ImageReferencing):
     title = models.CharField(max_length=50)
     image = models.ForeignKey(
         "administration.ImageUpload",
@@ -103,7 +281,11 @@ class ProjectCard(models.Model):
     label_letter = models.CharField(max_length=2)
     label_color = models.CharField(max_length=50)
     inline_color = models.CharField(max_length=50)
-    owner = models.CharField(max_length=50)
+    owner = models.ForeignKey(
+        "portfolio.SlugEntry",
+        on_delete=models.PROTECT,
+        related_name="project_cards",
+    )
     deck = models.ForeignKey(
         Deck,
         on_delete=models.CASCADE,
@@ -113,30 +295,56 @@ class ProjectCard(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     edited_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Bumped by every admin write; the ETag of the edit endpoints.
+    version = models.PositiveIntegerField(default=1)
+    sort_ts = models.GeneratedField(
+        expression=Coalesce("edited_at", "created_at"),
+        output_field=models.DateTimeField(),
+        db_persist=True,
+    )
+
+    reference_source = "project_card"
+    reference_fields = ("image",)
 
     class Meta:
         ordering = ["id"]
         indexes = [
             models.Index(fields=["-edited_at"]),
             models.Index(fields=["-created_at"]),
+            models.Index(fields=["owner", "sort_ts"]),
+            models.Index(fields=["owner", "deck", "sort_ts"]),
         ]
 
     def __str__(self):
         return self.title
 
+    def referenced_images(self):
+        return {(self.image_id, "image")} if self.image_id is not None else set()
+
 
-class PagesModel(models.Model):
+class PagesModel(ImageReferencing):
     CATEGORY_CHOICES = [
         ("page_one", "Page 1"),
         ("page_two", "Page 2"),
     ]
 
-    owner = models.SlugField(max_length=50)
+    owner = models.ForeignKey(
+        "portfolio.SlugEntry",
+        on_delete=models.PROTECT,
+        related_name="pages",
+    )
     category = models.CharField(max_length=50)
 
     content = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
     edited_at = models.DateTimeField(null=True, blank=True)
+    # Bumped by every admin write; the ETag of the edit endpoints.
+    version = models.PositiveIntegerField(default=1)
+    sort_ts = models.GeneratedField(
+        expression=Coalesce("edited_at", "created_at"),
+        output_field=models.DateTimeField(),
+        db_persist=True,
+    )
 
     project_card = models.OneToOneField(
         "portfolio.ProjectCard",
@@ -146,10 +354,65 @@ class PagesModel(models.Model):
         related_name="page",
     )
 
+    reference_source = "page"
+    reference_fields = ("content",)
+
     class Meta:
         unique_together = ["owner", "category"]
+        indexes = [
+            models.Index(fields=["owner", "sort_ts"]),
+        ]
 
     def __str__(self):
         if self.project_card:
             return f"Page for ProjectCard ID {self.project_card.id}"
         return f"{self.owner} - {self.category}"
+
+    def reference_key(self):
+        return frozenset(content_image_urls(self.content))
+
+    def referenced_images(self):
+        urls = content_image_urls(self.content)
+        return {
+            (image_id, "content") for image_id in resolve_image_urls(urls, ImageUpload)
+        }
+
+    @classmethod
+    def bulk_referenced_images(cls, instances):
+        urls = [content_image_urls(instance.content) for instance in instances]
+        ids_by_url = image_ids_by_url(set().union(*urls), ImageUpload)
+        return [
+            {
+                (image_id, "content")
+                for url in page_urls
+                for image_id in ids_by_url.get(url, ())
+            }
+            for page_urls in urls
+        ]
+
+
+class ImageReference(models.Model):
+    """
+    One use of an image: the image or hover image of a deck, the image of a
+    project card, or an image or link URL in a page's content. Counting rows
+    per image tells whether it is in use.
+    """
+
+    image = models.ForeignKey(
+        "administration.ImageUpload",
+        on_delete=models.CASCADE,
+        related_name="references",
+    )
+    field = models.CharField(max_length=20)
+    deck = models.ForeignKey(
+        Deck, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    project_card = models.ForeignKey(
+        ProjectCard, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    page = models.ForeignKey(
+        PagesModel, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+
+    def __str__(self):
+        return f"{self.image_id} ({self.field})"
@@ -0,0 +1,269 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    LimitOffsetPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class NoCountLimitOffsetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination that skips the COUNT(*) query. One extra row is
+    fetched to know whether a next page exists.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+
+        rows = list(queryset[self.offset : self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[: self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"].pop("count")
+        response_schema["required"].remove("count")
+        return response_schema
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over `(<view.keyset_field>, id)` in descending order. The
+    opaque cursor carries the boundary row, so every page is a single indexed
+    range scan regardless of depth and no COUNT(*) is run.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    default_field = "sort_ts"
+
+    def __init__(self, default_limit):
+        self.default_limit = default_limit
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field = getattr(view, "keyset_field", self.default_field)
+        self.limit = self.get_limit(request)
+        value, pk, reverse = self.decode_cursor(request)
+        self.had_cursor = value is not None
+
+        if self.had_cursor:
+            if reverse:
+                boundary = Q(**{f"{self.field}__gt": value}) | Q(
+                    **{self.field: value, "id__gt": pk}
+                )
+            else:
+                boundary = Q(**{f"{self.field}__lt": value}) | Q(
+                    **{self.field: value, "id__lt": pk}
+                )
+            queryset = queryset.filter(boundary)
+
+        if reverse:
+            queryset = queryset.order_by(self.field, "id")
+        else:
+            queryset = queryset.order_by(f"-{self.field}", "-id")
+
+        rows = list(queryset[: self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[: self.limit]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.had_cursor
+
+        self.rows = rows
+        return rows
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.limit_query_param], strict=True
+            )
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            value = parse_datetime(payload["v"])
+            pk = int(payload["i"])
+            reverse = bool(payload.get("r", False))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound("Invalid cursor")
+        if value is None:
+            raise NotFound("Invalid cursor")
+        return value, pk, reverse
+
+    def _row_key(self, row):
+        if isinstance(row, dict):
+            return row[self.field], row["id"]
+        return getattr(row, self.field), row.id
+
+    def encode_cursor(self, row, reverse):
+        value, pk = self._row_key(row)
+        payload = {"v": value.isoformat(), "i": pk}
+        if reverse:
+            payload["r"] = True
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+
+class CursorOnlyPagination(KeysetPagination):
+    """KeysetPagination for views without limit/offset, PAGE_SIZE rows a page."""
+
+    max_limit = 100
+
+    def __init__(self):
+        super().__init__(api_settings.PAGE_SIZE)
+
+    def get_limit(self, request):
+        return min(super().get_limit(request), self.max_limit)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.limit_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Number of results to return, at most {self.max_limit}.",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Opaque cursor returned in next/previous links.",
+                "schema": {"type": "string"},
+            },
+        ]
+
+
+class PortfolioPagination(BasePagination):
+    """
+    LimitOffsetPagination by default. `?paginate=cursor` switches to keyset
+    pagination and `?paginate=nocount` to limit/offset without the COUNT(*).
+    """
+
+    mode_query_param = "paginate"
+
+    def __init__(self):
+        self.limit_offset = LimitOffsetPagination()
+        self.modes = {
+            "cursor": KeysetPagination(self.limit_offset.default_limit),
+            "nocount": NoCountLimitOffsetPagination(),
+        }
+        self.paginator = self.limit_offset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = request.query_params.get(self.mode_query_param)
+        self.paginator = self.modes.get(mode, self.limit_offset)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, "display_page_controls", False)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_paginated_response_schema(self, schema):
+        return self.limit_offset.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *self.limit_offset.get_schema_operation_parameters(view),
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": (
+                    "Pagination mode: 'cursor' for keyset pagination, 'nocount' "
+                    "for limit/offset without the total count."
+                ),
+                "schema": {"type": "string", "enum": ["cursor", "nocount"]},
+            },
+            {
+                "name": KeysetPagination.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Opaque cursor returned in next/previous links.",
+                "schema": {"type": "string"},
+            },
+        ]
@@ -0,0 +1,57 @@
+"""
+`Link: rel=preload` hints for the landing page of a slug, so the browser
+starts fetching its deck images and the payloads the page needs while the
+HTML is still being rendered. The SSR server forwards them on its response
+and, where the runtime supports it, ahead of it as 103 Early Hints.
+
+URLs are root relative: the site, its API and its media share one origin.
+"""
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from administration.storage import image_storage
+
+from .models import Deck, DeckSprite
+
+
+def link(url, as_, **params):
+    """One `Link` header value preloading `url` as the given destination."""
+    parts = [f"<{url}>", "rel=preload", f"as={as_}"]
+    for name, value in params.items():
+        name = name.replace("_", "-")
+        parts.append(name if value is True else f'{name}="{value}"')
+    return "; ".join(parts)
+
+
+def preload_links(slug):
+    """
+    Hints for the deck list and gradient payloads, the deck image atlas and
+    the images of the first PRELOAD_DECK_IMAGES decks, the first of which is
+    the landing page's largest paint.
+    """
+    links = [
+        link(
+            f"{reverse('get_deck_sluged', args=[slug])}?sprite=1",
+            "fetch",
+            crossorigin=True,
+        ),
+        link(reverse("Gradient_color_sluged", args=[slug]), "fetch", crossorigin=True),
+    ]
+
+    sprite = (
+        DeckSprite.objects.filter(owner__slug=slug)
+        .values_list("image", flat=True)
+        .first()
+    )
+    if sprite:
+        links.append(link(default_storage.url(sprite), "image", type="image/webp"))
+
+    names = Deck.objects.filter(owner__slug=slug, image__isnull=False).values_list(
+        "image__image", flat=True
+    )[: settings.PRELOAD_DECK_IMAGES]
+    for index, name in enumerate(names):
+        params = {"fetchpriority": "high"} if index == 0 else {}
+        links.append(link(image_storage().url(name), "image", **params))
+    return links
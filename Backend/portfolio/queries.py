@@ -0,0 +1,32 @@
+"""Querysets shared by the public views and the admin endpoints."""
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from administration.models import ImageUpload
+
+from .models import ImageReference
+
+
+def listed_images():
+    """Images with the fields and `usage_count` of ImageListSerializer."""
+    usage = (
+        ImageReference.objects.filter(image=OuterRef("pk"))
+        .values("image")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return (
+        ImageUpload.objects.select_related("owner")
+        .only(
+            "id",
+            "title",
+            "owner__slug",
+            "image",
+            "width",
+            "height",
+            "dominant_color",
+            "uploaded_at",
+        )
+        .annotate(usage_count=Coalesce(Subquery(usage), 0))
+    )
@@ -0,0 +1,65 @@
+"""
+Which images portfolio content uses, for the ImageReference index.
+
+Decks and project cards use images through foreign keys; pages use them by
+URL inside their content, either the media URL of the file or a variant URL
+of the image (`/api/images/<id>/variant`).
+"""
+
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import Resolver404, resolve
+
+CONTENT_URL_KEYS = ("url", "iconUrl")
+
+
+def content_image_urls(content):
+    """URLs of the image and link items of a page's content."""
+    urls = set()
+    for block in content if isinstance(content, list) else ():
+        items = block.get("content") if isinstance(block, dict) else None
+        for item in items if isinstance(items, list) else ():
+            if not isinstance(item, dict):
+                continue
+            for key in CONTENT_URL_KEYS:
+                if isinstance(item.get(key), str):
+                    urls.add(item[key])
+    return urls
+
+
+def image_ids_by_url(urls, image_model):
+    """
+    Maps each URL to the ids of the `image_model` rows it points at. Media
+    URLs match every row storing that file, since they cannot tell identical
+    uploads apart.
+    """
+    targets = {}
+    for url in urls:
+        path = unquote(urlsplit(url).path)
+        if path.startswith(settings.MEDIA_URL):
+            targets[url] = ("image", path[len(settings.MEDIA_URL) :])
+            continue
+        try:
+            match = resolve(path)
+        except Resolver404:
+            continue
+        if match.url_name == "image_variant":
+            targets[url] = ("id", match.kwargs["pk"])
+
+    if not targets:
+        return {}
+    variant_ids = {value for key, value in targets.values() if key == "id"}
+    names = {value for key, value in targets.values() if key == "image"}
+    rows = image_model.objects.filter(Q(id__in=variant_ids) | Q(image__in=names))
+    ids_by = {}
+    for pk, name in rows.values_list("id", "image"):
+        ids_by.setdefault(("id", pk), set()).add(pk)
+        ids_by.setdefault(("image", name), set()).add(pk)
+    return {url: ids_by.get(target, set()) for url, target in targets.items()}
+
+
+def resolve_image_urls(urls, image_model):
+    """Ids of the `image_model` rows the URLs point at."""
+    return set().union(*image_ids_by_url(urls, image_model).values())
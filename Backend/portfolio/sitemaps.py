@@ -2,7 +2,6 @@
 from urllib.parse import urlencode
 
 from django.contrib.sitemaps import Sitemap
-from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
 
@@ -29,16 +28,16 @@ class PageOneSitemap(Sitemap):
 
     def items(self):
         return (
-            PagesModel.objects.filter(category="page_one")
-            .annotate(sort_ts=Coalesce("edited_at", "created_at"))
+            PagesModel.objects.select_related("owner")
+            .filter(category="page_one")
             .order_by("id")
         )
 
     def location(self, obj: PagesModel) -> str:
-        return f"/page_one/{obj.owner}"
+        return f"/page_one/{obj.owner.slug}"
 
     def lastmod(self, obj: PagesModel):
-        return obj.edited_at or obj.created_at
+        return obj.sort_ts
 
 
 class PageTwoSitemap(Sitemap):
@@ -47,16 +46,16 @@ class PageTwoSitemap(Sitemap):
 
     def items(self):
         return (
-            PagesModel.objects.filter(category="page_two")
-            .annotate(sort_ts=Coalesce("edited_at", "created_at"))
+            PagesModel.objects.select_related("owner")
+            .filter(category="page_two")
             .order_by("id")
         )
 
     def location(self, obj: PagesModel) -> str:
-        return f"/page_two/{obj.owner}"
+        return f"/page_two/{obj.owner.slug}"
 
     def lastmod(self, obj: PagesModel):
-        return obj.edited_at or obj.created_at
+        return obj.sort_ts
 
 
 class ProjectPageSitemap(Sitemap):
@@ -65,15 +64,14 @@ class ProjectPageSitemap(Sitemap):
 
     def items(self):
         return (
-            PagesModel.objects.select_related("project_card")
+            PagesModel.objects.select_related("owner", "project_card")
             .filter(project_card__isnull=False)
-            .annotate(sort_ts=Coalesce("edited_at", "created_at"))
             .order_by("id")
         )
 
     def location(self, obj: PagesModel) -> str:
-        qs = urlencode({"slug": obj.owner})
+        qs = urlencode({"slug": obj.owner.slug})
         return f"/project_page/{obj.project_card_id}?{qs}"
 
     def lastmod(self, obj: PagesModel):
-        return obj.edited_at or obj.created_at
+        return obj.sort_ts
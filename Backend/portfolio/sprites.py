@@ -0,0 +1,270 @@
+"""
+Per-slug sprite atlas of the deck images: one packed WebP holding the image
+and hover image of every deck of a slug, and a map of where each one sits, so
+a deck wheel paints from a single image request.
+
+Tiles are the DECK_SPRITE_TILE_WIDTH variants of the sources (see
+`administration.variants`), so rebuilding after one deck changed renders only
+that deck's images and reads the others back from the variant cache. Atlases
+are rebuilt once the deck write commits, in a background worker, and not at
+all while their source images stay the same. Superseded atlases stay on disk
+for DECK_SPRITE_RETENTION_HOURS, as cached responses keep naming them.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from administration import variants
+from administration.storage import image_storage
+
+from .cache import invalidate
+from .models import Deck, DeckSprite, SlugEntry
+
+logger = logging.getLogger(__name__)
+
+# Largest width or height of a WebP image.
+WEBP_MAX_DIMENSION = 16383
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deck-sprite")
+_queued = {}
+_queued_lock = threading.Lock()
+
+
+def _source_key(names):
+    parts = [
+        str(settings.DECK_SPRITE_TILE_WIDTH),
+        str(settings.DECK_SPRITE_MAX_WIDTH),
+        str(settings.DECK_SPRITE_QUALITY),
+        *names,
+    ]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def _load_tile(name):
+    path = variants.get_variant(
+        image_storage(),
+        name,
+        settings.DECK_SPRITE_TILE_WIDTH,
+        settings.IMAGE_VARIANT_DEFAULT_QUALITY,
+        "webp",
+    )
+    with Image.open(path) as tile:
+        tile.load()
+        return tile.copy()
+
+
+def pack(sizes, max_width):
+    """
+    Shelf-packs `(width, height)` tiles, tallest first, into rows at most
+    `max_width` wide. Returns `{index: (x, y)}` and the atlas size; tiles that
+    would make the atlas taller than WebP allows are left out.
+    """
+    positions = {}
+    x = y = shelf_height = width = 0
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        tile_width, tile_height = sizes[index]
+        if x and x + tile_width > max_width:
+            y += shelf_height
+            x = shelf_height = 0
+        if y + tile_height > WEBP_MAX_DIMENSION:
+            continue
+        positions[index] = (x, y)
+        x += tile_width
+        shelf_height = max(shelf_height, tile_height)
+        width = max(width, x)
+    return positions, (width, y + shelf_height)
+
+
+def _mark_superseded(name):
+    try:
+        os.utime(default_storage.path(name))
+    except FileNotFoundError:
+        pass
+
+
+def _retire(name):
+    """
+    Leaves the superseded atlas `name` in place for cached responses still
+    pointing at it; its modification time starts DECK_SPRITE_RETENTION_HOURS.
+    """
+    if name and not DeckSprite.objects.filter(image=name).exists():
+        transaction.on_commit(partial(_mark_superseded, name))
+
+
+def delete_retired_sprites(max_age):
+    """
+    Deletes atlas files no DeckSprite uses that were last built or superseded
+    more than the timedelta `max_age` ago. Returns how many were deleted.
+    """
+    root = default_storage.path(settings.DECK_SPRITE_DIR)
+    cutoff = (timezone.now() - max_age).timestamp()
+    candidates = []
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            if os.stat(path).st_mtime < cutoff:
+                name = os.path.relpath(path, default_storage.location)
+                candidates.append(name.replace(os.sep, "/"))
+    used = set(
+        DeckSprite.objects.filter(image__in=candidates).values_list("image", flat=True)
+    )
+    retired = [name for name in candidates if name not in used]
+    for name in retired:
+        default_storage.delete(name)
+    return len(retired)
+
+
+def build_deck_sprite(owner):
+    """
+    Brings the atlas of the slug `owner` in line with its decks and returns
+    it, or None when no deck of the slug has an image. Sources that cannot be
+    read are left out of the atlas.
+    """
+    rows = Deck.objects.filter(owner__slug=owner).values_list(
+        "image__image", "hover_img__image"
+    )
+    names = sorted({name for row in rows for name in row if name})
+    key = _source_key(names)
+    sprite = DeckSprite.objects.filter(owner__slug=owner).first()
+    if sprite is not None and sprite.source_key == key:
+        return sprite
+
+    tiles = []
+    for name in names:
+        try:
+            tiles.append((name, _load_tile(name)))
+        except (OSError, Image.DecompressionBombError):
+            logger.warning("Skipping unreadable deck image %s", name)
+
+    if not tiles:
+        if sprite is not None:
+            with transaction.atomic():
+                sprite.delete()
+                _retire(sprite.image.name)
+                invalidate(owner)
+        return None
+
+    positions, size = pack(
+        [tile.size for _, tile in tiles], settings.DECK_SPRITE_MAX_WIDTH
+    )
+    atlas = Image.new("RGBA", size, (0, 0, 0, 0))
+    placed = {}
+    for index, (x, y) in positions.items():
+        name, tile = tiles[index]
+        atlas.paste(tile, (x, y))
+        placed[name] = [x, y, tile.width, tile.height]
+
+    buffer = io.BytesIO()
+    atlas.save(buffer, "WEBP", quality=settings.DECK_SPRITE_QUALITY)
+    data = buffer.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    file_name = f"{settings.DECK_SPRITE_DIR}/{digest[:2]}/{digest}.webp"
+    if not default_storage.exists(file_name):
+        file_name = default_storage.save(file_name, ContentFile(data))
+
+    entry = SlugEntry.objects.filter(slug=owner).first()
+    if entry is None:
+        return None
+
+    old_name = sprite.image.name if sprite is not None else None
+    with transaction.atomic():
+        sprite, _ = DeckSprite.objects.update_or_create(
+            owner=entry,
+            defaults={
+                "image": file_name,
+                "width": size[0],
+                "height": size[1],
+                "tiles": placed,
+                "source_key": key,
+            },
+        )
+        if old_name != file_name:
+            _retire(old_name)
+        invalidate(owner)
+    return sprite
+
+
+def _build_in_background(owner):
+    try:
+        build_deck_sprite(owner)
+    except Exception:
+        logger.exception("Building the deck sprite of %s failed", owner)
+    finally:
+        connections.close_all()
+
+
+def _schedule(owner):
+    if not settings.DECK_SPRITE_BACKGROUND:
+        build_deck_sprite(owner)
+        return
+
+    with _queued_lock:
+        future = _queued.get(owner)
+        # A build that has not started yet will see this write too.
+        if future is not None and not future.running() and not future.done():
+            return
+        future = _executor.submit(_build_in_background, owner)
+        _queued[owner] = future
+
+    def forget(done):
+        with _queued_lock:
+            if _queued.get(owner) is done:
+                del _queued[owner]
+
+    future.add_done_callback(forget)
+
+
+def schedule_deck_sprites(*owners):
+    """Rebuilds the atlases of the given slugs once the transaction commits."""
+    for owner in {owner for owner in owners if owner}:
+        transaction.on_commit(partial(_schedule, owner))
+
+
+def deck_sprites(rows):
+    """
+    Returns the `sprite` field of each deck row from `deck_rows`: the atlas of
+    its slug with the tile of each of its images, None for an image the atlas
+    does not hold (yet), or None altogether when the slug has no atlas.
+    """
+    owners = {row["owner__slug"] for row in rows}
+    queryset = (
+        DeckSprite.objects.filter(owner__slug__in=owners)
+        .select_related("owner")
+        .only("owner__slug", "image", "width", "height", "tiles")
+    )
+    sprites = {sprite.owner.slug: sprite for sprite in queryset}
+
+    def tile(sprite, name):
+        position = sprite.tiles.get(name) if name else None
+        if position is None:
+            return None
+        return dict(zip(("x", "y", "width", "height"), position))
+
+    fields = []
+    for row in rows:
+        sprite = sprites.get(row["owner__slug"])
+        if sprite is None:
+            fields.append(None)
+            continue
+        fields.append(
+            {
+                "url": sprite.image.url,
+                "width": sprite.width,
+                "height": sprite.height,
+                "image": tile(sprite, row["image__image"]),
+                "hover_img": tile(sprite, row["hover_img__image"]),
+            }
+        )
+    return fields
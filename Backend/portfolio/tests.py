@@ -1,3 +1,914 @@
-from django.test import TestCase
+import io
+import os
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from administration import variants
+from administration.models import ImageUpload
+from administration.serializers import (
+    DeckSerializer,
+    GradientColorsSerializer,
+    PageDetailsSerializer,
+    PageNamesSerializer,
+    ProjectCardSerializer,
+)
+from administration.variants import version_token
+from shmooz.testing import (
+    QueryBudgetMixin,
+    TemporaryMediaRootMixin,
+    png_bytes,
+    seed_slug,
+)
+
+from .cache import STATS_KEYS, invalidate, read_cache_stats
+from .fast_serializers import (
+    deck_rows,
+    project_card_rows,
+    serialize_decks,
+    serialize_project_cards,
+)
+from .models import (
+    BackgroundData,
+    Deck,
+    DeckSprite,
+    ImageReference,
+    PagesModel,
+    ProjectCard,
+    SlugEntry,
+)
+from .sprites import build_deck_sprite, pack
+
+SLUG = "parity"
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class FastSerializerParityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.entry = SlugEntry.objects.create(slug=SLUG)
+        cls.image = ImageUpload.objects.create(
+            title="front",
+            image=f"uploads/{SLUG}/front image.png",
+            width=1200,
+            height=800,
+            aspect_ratio=1.5,
+            dominant_color="#336699",
+            placeholder="data:image/webp;base64,UklGRg==",
+        )
+        cls.hover = ImageUpload.objects.create(
+            title="hover", image=f"uploads/{SLUG}/hover.webp"
+        )
+        cls.background = BackgroundData.objects.create(
+            owner=cls.entry,
+            color1="#000000",
+            color2="#111111",
+            color3="#222222",
+            position1="0%",
+            position2="50%",
+            position3="100%",
+            page1="About",
+            page2="Contact",
+        )
+
+        cls.decks = [
+            Deck.objects.create(
+                title="full",
+                displayed_name="Full deck",
+                owner=cls.entry,
+                image=cls.image,
+                hover_img=cls.hover,
+                card_amount=3,
+                x_offsets=[0.0, 1.5, -2.25],
+                y_offsets=[0.1, 0.2, 0.3],
+                rotations=[-5.0, 0.0, 5.0],
+                alphas=[1.0, 0.75, 0.5],
+                brightness=[1.0, 0.9, 0.8],
+                hover_x_offsets=[1.0, 2.0, 3.0],
+                hover_y_offsets=[-1.0, -2.0, -3.0],
+                hover_rotations=[10.0, 20.0, 30.0],
+                hover_brightness=[1.1, 1.2, 1.3],
+                text_color="#ffffff",
+                hover_color="rgba(0, 0, 0, 0.5)",
+                edited_at=timezone.now() + timedelta(minutes=5),
+            ),
+            Deck.objects.create(
+                title="bare",
+                displayed_name="Bare ünïcode deck",
+                owner=cls.entry,
+                text_color="#000",
+                hover_color="#fff",
+            ),
+            Deck.objects.create(
+                title="no hover",
+                displayed_name="No hover",
+                owner=cls.entry,
+                image=cls.image,
+                text_color="#000",
+                hover_color="#fff",
+            ),
+        ]
+
+        cls.cards = []
+        for deck in cls.decks:
+            for index, image in enumerate([cls.image, None]):
+                cls.cards.append(
+                    ProjectCard.objects.create(
+                        title=f"{deck.title}-{index}",
+                        image=image,
+                        text="Card text",
+                        text_color="#ffffff",
+                        label_letter="A",
+                        label_color="#000000",
+                        inline_color="#cccccc",
+                        owner=cls.entry,
+                        deck=deck,
+                        edited_at=timezone.now() if index else None,
+                    )
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_decks_match_model_serializer(self):
+        queryset = Deck.objects.filter(owner__slug=SLUG)
+        self.assertEqual(
+            render(serialize_decks(deck_rows(queryset))),
+            render(DeckSerializer(queryset, many=True).data),
+        )
+
+    def test_project_cards_match_model_serializer(self):
+        queryset = ProjectCard.objects.filter(owner__slug=SLUG)
+        self.assertEqual(
+            render(serialize_project_cards(project_card_rows(queryset))),
+            render(ProjectCardSerializer(queryset, many=True).data),
+        )
+
+    def test_deck_list_response_is_byte_identical(self):
+        response = self.client.get(f"/api/deck/{SLUG}")
+        expected = {
+            "count": len(self.decks),
+            "next": None,
+            "previous": None,
+            "results": DeckSerializer(
+                Deck.objects.filter(owner__slug=SLUG), many=True
+            ).data,
+        }
+        self.assertEqual(response.content, render(expected))
+
+    def test_project_card_list_response_is_byte_identical(self):
+        deck = self.decks[0]
+        response = self.client.get(f"/api/projects/{SLUG}", HTTP_X_DECK_ID=str(deck.id))
+        expected = {
+            "count": 2,
+            "next": None,
+            "previous": None,
+            "results": ProjectCardSerializer(
+                ProjectCard.objects.filter(deck=deck), many=True
+            ).data,
+        }
+        self.assertEqual(response.content, render(expected))
+
+    def test_grouped_project_cards_are_byte_identical(self):
+        response = self.client.get(f"/api/projects/{SLUG}?deck=all")
+        expected = {
+            str(deck.id): ProjectCardSerializer(
+                ProjectCard.objects.filter(deck=deck), many=True
+            ).data
+            for deck in self.decks
+        }
+        self.assertEqual(response.content, render(expected))
+
+    def test_bootstrap_response_is_byte_identical(self):
+        response = self.client.get(f"/api/bootstrap/{SLUG}")
+        expected = {
+            "background": GradientColorsSerializer(self.background).data,
+            "page_names": PageNamesSerializer(self.background).data,
+            "page_details": PageDetailsSerializer(self.background).data,
+            "decks": DeckSerializer(
+                Deck.objects.filter(owner__slug=SLUG), many=True
+            ).data,
+            "project_cards": {
+                str(deck.id): ProjectCardSerializer(
+                    ProjectCard.objects.filter(deck=deck), many=True
+                ).data
+                for deck in self.decks
+            },
+        }
+        self.assertEqual(response.content, render(expected))
+
+    def test_fast_path_runs_one_query_per_list(self):
+        with self.assertNumQueries(1):
+            serialize_decks(deck_rows(Deck.objects.filter(owner__slug=SLUG)))
+        with self.assertNumQueries(1):
+            serialize_project_cards(
+                project_card_rows(ProjectCard.objects.filter(owner__slug=SLUG))
+            )
+
+
+class PublicEndpointQueryBudgetTests(
+    TemporaryMediaRootMixin, QueryBudgetMixin, TestCase
+):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_slug_list(self):
+        self.assertQueryBudget(lambda f: ("get", "/api/slugs/", {}))
+
+    def test_bootstrap(self):
+        self.assertQueryBudget(lambda f: ("get", f"/api/bootstrap/{f.slug}", {}))
+
+    def test_background_views(self):
+        for prefix in ("gradient-colors", "page-names", "page-details"):
+            with self.subTest(prefix=prefix):
+                self.assertQueryBudget(lambda f: ("get", f"/api/{prefix}/{f.slug}", {}))
+
+    def test_navigation_pages(self):
+        for prefix in ("page1", "page2"):
+            with self.subTest(prefix=prefix):
+                self.assertQueryBudget(lambda f: ("get", f"/api/{prefix}/{f.slug}", {}))
+
+    def test_project_page(self):
+        self.assertQueryBudget(
+            lambda f: ("get", f"/api/project_page/{f.cards[0].id}", {})
+        )
+
+    def test_deck_list(self):
+        for query in ("", "?paginate=cursor", "?paginate=nocount", "?sprite=1"):
+            with self.subTest(query=query):
+                self.assertQueryBudget(
+                    lambda f: ("get", f"/api/deck/{f.slug}{query}", {})
+                )
+
+    def test_project_card_list(self):
+        self.assertQueryBudget(
+            lambda f: (
+                "get",
+                f"/api/projects/{f.slug}",
+                {"HTTP_X_DECK_ID": str(f.decks[0].id)},
+            )
+        )
+        self.assertQueryBudget(
+            lambda f: ("get", f"/api/projects/{f.slug}?deck=all", {})
+        )
+
+    def test_image_list(self):
+        for query in ("", "?slug={slug}", "?limit=5"):
+            with self.subTest(query=query):
+                self.assertQueryBudget(
+                    lambda f: ("get", "/api/images/" + query.format(slug=f.slug), {})
+                )
+
+    def test_preload_hints(self):
+        self.assertQueryBudget(lambda f: ("get", f"/api/preload/{f.slug}", {}))
+
+    def test_sitemap(self):
+        self.assertQueryBudget(lambda f: ("get", "/sitemap.xml", {}))
+
+    def test_image_variant(self):
+        def build(f):
+            image = f.images[0]
+            default_storage.save(image.image.name, ContentFile(png_bytes()))
+            return ("get", f"/api/images/{image.id}/variant?w=160", {})
+
+        self.assertQueryBudget(build)
+
+
+class ReadCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.fixture = seed_slug("cached", 1)
+
+    def test_equivalent_accept_headers_share_entries(self):
+        path = "/api/deck/cached"
+        self.client.get(path, HTTP_ACCEPT="application/json")
+        for accept in ("*/*", "application/json, text/plain, */*"):
+            with self.subTest(accept=accept):
+                response = self.client.get(path, HTTP_ACCEPT=accept)
+                self.assertEqual(response["X-Read-Cache"], "HIT")
+        packed = self.client.get(path, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(packed["X-Read-Cache"], "MISS")
+        self.assertEqual(packed["Content-Type"], "application/msgpack")
+
+    def test_project_page_hits_run_no_query(self):
+        card = self.fixture.cards[0]
+        path = f"/api/project_page/{card.id}"
+        self.client.get(path)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(path)["X-Read-Cache"], "HIT")
+
+        # Moving the card invalidates the slug it left; the page is looked up
+        # under its new slug.
+        other = SlugEntry.objects.create(slug="other")
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjectCard.objects.filter(pk=card.pk).update(owner=other)
+            invalidate("cached", "other")
+        self.assertEqual(self.client.get(path)["X-Read-Cache"], "MISS")
+        self.assertEqual(self.client.get(path)["X-Read-Cache"], "HIT")
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate("other")
+        self.assertEqual(self.client.get(path)["X-Read-Cache"], "MISS")
+
+    def test_writes_invalidate_their_slug_only(self):
+        path = "/api/deck/cached"
+        seed_slug("untouched", 1)
+        self.client.get(path)
+        self.client.get("/api/deck/untouched")
+        self.assertEqual(self.client.get(path)["X-Read-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate("cached")
+        self.assertEqual(self.client.get(path)["X-Read-Cache"], "MISS")
+        untouched = self.client.get("/api/deck/untouched")
+        self.assertEqual(untouched["X-Read-Cache"], "HIT")
+
+    def test_slug_renames_drop_cached_bodies(self):
+        path = f"/api/project_page/{self.fixture.cards[0].id}"
+        self.client.get(path)
+        self.client.get("/api/slugs/")
+        self.assertEqual(self.client.get(path)["X-Read-Cache"], "HIT")
+
+        entry = SlugEntry.objects.get(pk=self.fixture.entry.pk)
+        entry.slug = "renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.save()
+        response = self.client.get(path)
+        self.assertEqual(response["X-Read-Cache"], "MISS")
+        self.assertIn(b"renamed", response.content)
+        self.assertEqual(self.client.get("/api/slugs/")["X-Read-Cache"], "MISS")
+
+    @override_settings(PORTFOLIO_READ_CACHE_STATS_FLUSH=1000)
+    def test_stats_are_counted_in_process(self):
+        before = read_cache_stats()
+        self.client.get("/api/deck/cached")
+        self.client.get("/api/deck/cached")
+        self.assertEqual(cache.get(STATS_KEYS["hits"], 0), before["hits"])
+        after = read_cache_stats()
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+
+
+class PaginationModeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.fixture = seed_slug("paged", 5)
+        # Every row shares one sort_ts, so pages are split on the id alone.
+        created = timezone.now()
+        Deck.objects.update(created_at=created, edited_at=None)
+        ProjectCard.objects.update(created_at=created, edited_at=None)
+        self.deck_path = "/api/deck/paged"
+        self.card_path = "/api/projects/paged"
+        self.card_headers = {"HTTP_X_DECK_ID": str(self.fixture.decks[0].id)}
+
+    def walk(self, url, link, **headers):
+        pages = []
+        while url:
+            response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row["id"] for row in response.json()["results"]])
+            url = response.json()[link]
+        return pages
+
+    def test_cursor_walks_both_ways_without_gaps(self):
+        for path, headers in (
+            (self.deck_path, {}),
+            (self.card_path, self.card_headers),
+        ):
+            with self.subTest(path=path):
+                forward = self.walk(
+                    f"{path}?paginate=cursor&limit=2", "next", **headers
+                )
+                self.assertEqual([len(page) for page in forward], [2, 2, 1])
+                ids = [pk for page in forward for pk in page]
+                self.assertEqual(ids, sorted(ids, reverse=True))
+                self.assertEqual(len(ids), 5)
+
+                last = self.client.get(
+                    f"{path}?paginate=cursor&limit=2", **headers
+                ).json()
+                while last["next"]:
+                    last = self.client.get(last["next"], **headers).json()
+                backward = self.walk(last["previous"], "previous", **headers)
+                self.assertEqual(backward, forward[-2::-1])
+
+    def test_nocount_omits_the_count(self):
+        for path, headers in (
+            (self.deck_path, {}),
+            (self.card_path, self.card_headers),
+        ):
+            with self.subTest(path=path):
+                first = self.client.get(
+                    f"{path}?paginate=nocount&limit=2", **headers
+                ).json()
+                self.assertNotIn("count", first)
+                self.assertIsNotNone(first["next"])
+
+                pages = self.walk(f"{path}?paginate=nocount&limit=2", "next", **headers)
+                self.assertEqual([len(page) for page in pages], [2, 2, 1])
+                # A last page exactly filled has no next page either.
+                exact = self.client.get(
+                    f"{path}?paginate=nocount&limit=5", **headers
+                ).json()
+                self.assertEqual(len(exact["results"]), 5)
+                self.assertIsNone(exact["next"])
+                self.assertIn(
+                    "count", self.client.get(f"{path}?limit=2", **headers).json()
+                )
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.fixture = seed_slug("validated", 1)
+        self.path = "/api/deck/validated"
+
+    def revalidate(self, etag):
+        cache.clear()
+        return self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+
+    def test_image_changes_change_the_validators(self):
+        etag = self.client.get(self.path)["ETag"]
+        self.assertEqual(self.revalidate(etag).status_code, 304)
+
+        image = self.fixture.decks[0].image
+        ImageUpload.objects.filter(pk=image.pk).update(
+            width=4, height=4, dominant_color="#123456", updated_at=timezone.now()
+        )
+        response = self.revalidate(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"][0]["image_meta"]["dominant_color"], "#123456"
+        )
+
+        etag = response["ETag"]
+        ImageUpload.objects.filter(pk=self.fixture.decks[0].hover_img_id).delete()
+        self.assertEqual(self.revalidate(etag).status_code, 200)
+
+    def test_owner_renames_change_the_validators(self):
+        path = f"/api/project_page/{self.fixture.cards[0].id}"
+        etag = self.client.get(path)["ETag"]
+        cache.clear()
+        self.assertEqual(
+            self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        SlugEntry.objects.filter(pk=self.fixture.entry.pk).update(slug="renamed")
+        cache.clear()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_unchanged_rows_answer_not_modified(self):
+        response = self.client.get(self.path)
+        self.assertIn("Last-Modified", response)
+        cache.clear()
+        revalidated = self.client.get(
+            self.path, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated["ETag"], response["ETag"])
+
+
+class ImageVariantTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        name = default_storage.save(
+            "uploads/variants/wide.png", ContentFile(png_bytes(size=(800, 400)))
+        )
+        self.image = ImageUpload.objects.create(title="wide", image=name)
+        self.url = f"/api/images/{self.image.id}/variant"
+
+    def open_image(self, response):
+        return Image.open(io.BytesIO(b"".join(response.streaming_content)))
+
+    def test_resizes_and_negotiates_format(self):
+        response = self.client.get(f"{self.url}?w=320", HTTP_ACCEPT="image/webp,*/*")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("Accept", response["Vary"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        image = self.open_image(response)
+        self.assertEqual((image.format, image.size), ("WEBP", (320, 160)))
+
+    def test_explicit_format_and_versioned_url_are_immutable(self):
+        token = version_token(self.image.image.name)
+        response = self.client.get(f"{self.url}?w=160&fm=jpeg&q=60&v={token}")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(self.open_image(response).size, (160, 80))
+
+    def test_never_upscales(self):
+        response = self.client.get(f"{self.url}?w=1920&fm=webp")
+        self.assertEqual(self.open_image(response).size, (800, 400))
+
+    def test_variants_are_cached_on_disk(self):
+        self.client.get(f"{self.url}?w=160&fm=webp")
+        with mock.patch("administration.variants._render") as render:
+            response = self.client.get(f"{self.url}?w=160&fm=webp")
+        render.assert_not_called()
+        self.assertEqual(self.open_image(response).size, (160, 80))
+
+    def test_qualities_snap_to_the_served_set(self):
+        with mock.patch.object(variants, "_render", wraps=variants._render) as render:
+            for quality in (70, 75, 79):
+                response = self.client.get(f"{self.url}?w=160&fm=webp&q={quality}")
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual([call.args[3] for call in render.call_args_list], [75])
+
+    def test_rejects_unknown_widths_and_formats(self):
+        for query in ("w=123", "w=160&fm=gif", "w=160&q=5", "w=abc"):
+            with self.subTest(query=query):
+                response = self.client.get(f"{self.url}?{query}")
+                self.assertEqual(response.status_code, 400)
+
+    def test_missing_image(self):
+        response = self.client.get(f"/api/images/{self.image.id + 1}/variant?w=160")
+        self.assertEqual(response.status_code, 404)
+
+
+class ImageReferenceTests(TestCase):
+    def setUp(self):
+        self.entry = SlugEntry.objects.create(slug="ref")
+        self.images = ImageUpload.objects.bulk_create(
+            ImageUpload(title=f"image-{i}", image=f"uploads/ref/{i}.png")
+            for i in range(3)
+        )
+
+    def references(self, **source):
+        return set(
+            ImageReference.objects.filter(**source).values_list("image_id", "field")
+        )
+
+    def create_deck(self, **kwargs):
+        return Deck.objects.create(
+            title="deck",
+            displayed_name="Deck",
+            owner=self.entry,
+            text_color="#ffffff",
+            hover_color="#000000",
+            **kwargs,
+        )
+
+    def test_deck_and_card_saves_maintain_references(self):
+        first, second, third = self.images
+        deck = self.create_deck(image=first, hover_img=second)
+        self.assertEqual(
+            self.references(deck=deck), {(first.id, "image"), (second.id, "hover_img")}
+        )
+
+        deck.hover_img = third
+        deck.save()
+        self.assertEqual(
+            self.references(deck=deck), {(first.id, "image"), (third.id, "hover_img")}
+        )
+
+        card = ProjectCard.objects.create(
+            title="card", owner=self.entry, deck=deck, image=first
+        )
+        self.assertEqual(self.references(project_card=card), {(first.id, "image")})
+
+        deck.delete()
+        self.assertFalse(ImageReference.objects.exists())
+
+    def test_unchanged_images_skip_the_index(self):
+        deck = self.create_deck(image=self.images[0])
+        deck = Deck.objects.get(pk=deck.pk)
+        deck.displayed_name = "Renamed"
+        with self.assertNumQueries(1):
+            deck.save()
+
+    def test_page_content_urls_are_resolved(self):
+        first, second, third = self.images
+        content = [
+            {
+                "id": "block",
+                "content": [
+                    {
+                        "id": "a",
+                        "type": "image",
+                        "url": f"http://testserver{first.image.url}",
+                    },
+                    {
+                        "id": "b",
+                        "type": "image",
+                        "url": f"/api/images/{second.id}/variant?w=640",
+                    },
+                    {"id": "c", "type": "link", "url": "https://example.com/"},
+                    {"id": "d", "type": "image", "url": "/api/images/0/variant"},
+                ],
+            }
+        ]
+        page = PagesModel.objects.create(
+            owner=self.entry, category="page_one", content=content
+        )
+        self.assertEqual(
+            self.references(page=page), {(first.id, "content"), (second.id, "content")}
+        )
+
+        page.content[0]["content"] = []
+        page.save()
+        self.assertEqual(self.references(page=page), set())
+
+    def test_image_list_reports_usage_counts(self):
+        first, second, third = self.images
+        self.create_deck(image=first, hover_img=first)
+        ProjectCard.objects.create(title="card", owner=self.entry, image=second)
+
+        response = APIClient().get("/api/images/")
+        counts = {row["id"]: row["usage_count"] for row in response.data["results"]}
+        self.assertEqual(counts, {first.id: 2, second.id: 1, third.id: 0})
+
+        first.delete()
+        self.assertFalse(ImageReference.objects.filter(image_id=first.id).exists())
+
+
+class ImageListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.images = {
+            slug: ImageUpload.objects.bulk_create(
+                ImageUpload(title=f"{slug}-{i}", owner=owner, image=f"x/{slug}{i}.png")
+                for i in range(5)
+            )
+            for slug, owner in (
+                (slug, SlugEntry.objects.create(slug=slug))
+                for slug in ("alpha", "beta")
+            )
+        }
+
+    def test_filters_by_slug_newest_first(self):
+        response = APIClient().get("/api/images/?slug=alpha")
+        ids = [row["id"] for row in response.data["results"]]
+        self.assertEqual(ids, [image.id for image in reversed(self.images["alpha"])])
+
+    def test_rows_are_compact(self):
+        image = self.images["beta"][0]
+        row = APIClient().get("/api/images/?slug=beta&limit=100").data["results"][-1]
+        self.assertEqual(row["owner"], "beta")
+        self.assertEqual(
+            row["thumbnail"],
+            f"/api/images/{image.id}/variant?w=320&v={version_token(image.image.name)}",
+        )
+        self.assertNotIn("placeholder", row)
+        self.assertNotIn("srcset", row)
+
+    def test_cursor_pages_cover_every_image(self):
+        client = APIClient()
+        seen = []
+        url = "/api/images/?limit=3"
+        while url:
+            with self.assertNumQueries(1):
+                response = client.get(url)
+            self.assertNotIn("count", response.data)
+            seen += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+        everything = self.images["alpha"] + self.images["beta"]
+        self.assertEqual(sorted(seen), sorted(image.id for image in everything))
+
+
+class OwnerMigrationTests(TransactionTestCase):
+    """Runs the owner data migrations over rows written before them."""
+
+    before = [
+        ("administration", "0005_upload_session"),
+        ("portfolio", "0018_deck_sprite"),
+    ]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.latest = MigrationExecutor(connection).loader.graph.leaf_nodes()
+        self.old_apps = self.migrate(self.before)
+
+    def tearDown(self):
+        self.migrate(self.latest)
+
+    def test_owners_become_slug_entries(self):
+        model = self.old_apps.get_model
+        model("portfolio", "SlugEntry").objects.create(slug="old-slug")
+        legacy, hashed, unused = model(
+            "administration", "ImageUpload"
+        ).objects.bulk_create(
+            [
+                model("administration", "ImageUpload")(
+                    title="legacy", image="uploads/old-slug/a.png"
+                ),
+                model("administration", "ImageUpload")(
+                    title="hashed", image="uploads/ab/cd/abcd.png"
+                ),
+                model("administration", "ImageUpload")(
+                    title="unused", image="uploads/ef/01/ef01.png"
+                ),
+            ]
+        )
+        card = model("portfolio", "ProjectCard").objects.create(
+            title="card", owner="card-slug", image_id=hashed.id
+        )
+        model("portfolio", "ImageReference").objects.create(
+            image_id=hashed.id, field="image", project_card_id=card.id
+        )
+
+        self.migrate(self.latest)
+
+        # Image owners come from legacy paths, then references; content
+        # owners without an entry get one, images fall back to no owner.
+        owners = dict(ImageUpload.objects.values_list("title", "owner__slug"))
+        self.assertEqual(
+            owners, {"legacy": "old-slug", "hashed": "card-slug", "unused": None}
+        )
+        self.assertEqual(ProjectCard.objects.get().owner.slug, "card-slug")
+
+    def test_rows_written_after_the_online_backfill_are_linked(self):
+        apps = self.migrate([("portfolio", "0019_owner_foreign_key")])
+        # Written by the previous release, which only knows the owner slug.
+        apps.get_model("portfolio", "PagesModel").objects.create(
+            owner="late-slug", category="page_one", content={}
+        )
+
+        self.migrate(self.latest)
+
+        self.assertEqual(PagesModel.objects.get().owner.slug, "late-slug")
+
+
+@override_settings(DECK_SPRITE_BACKGROUND=False)
+class DeckSpriteTests(TemporaryMediaRootMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.entry = SlugEntry.objects.create(slug="sprite")
+        self.images = [
+            ImageUpload.objects.create(
+                title=color,
+                owner=self.entry,
+                image=default_storage.save(
+                    f"uploads/sprite/{i}.png",
+                    ContentFile(png_bytes(size=(640, 320 + 80 * i), color=color)),
+                ),
+            )
+            for i, color in enumerate(("#ff0000", "#00ff00", "#0000ff"))
+        ]
+        self.deck = Deck.objects.create(
+            title="deck",
+            displayed_name="Deck",
+            owner=self.entry,
+            image=self.images[0],
+            hover_img=self.images[1],
+        )
+
+    def rendered_names(self, action):
+        with mock.patch.object(variants, "_render", wraps=variants._render) as render:
+            action()
+        return [call.args[1] for call in render.call_args_list]
+
+    def test_pack_keeps_rows_within_the_width(self):
+        positions, size = pack([(300, 100), (300, 200), (300, 150)], 700)
+        self.assertEqual(positions, {1: (0, 0), 2: (300, 0), 0: (0, 200)})
+        self.assertEqual(size, (600, 300))
+
+    def test_builds_one_atlas_of_every_deck_image(self):
+        sprite = build_deck_sprite("sprite")
+        first, second = (image.image.name for image in self.images[:2])
+        self.assertEqual(set(sprite.tiles), {first, second})
+
+        with default_storage.open(sprite.image.name) as file, Image.open(file) as atlas:
+            self.assertEqual((atlas.format, atlas.size), ("WEBP", (640, 200)))
+            x, y, width, height = sprite.tiles[first]
+            self.assertEqual((width, height), (320, 160))
+            red = atlas.convert("RGB").getpixel((x + width // 2, y + height // 2))
+            self.assertGreater(red[0], 200)
+
+    def test_rebuilds_render_only_changed_images(self):
+        old = build_deck_sprite("sprite")
+        self.assertEqual(self.rendered_names(lambda: build_deck_sprite("sprite")), [])
+
+        self.deck.hover_img = self.images[2]
+        self.deck.save()
+        rendered = self.rendered_names(lambda: build_deck_sprite("sprite"))
+        self.assertEqual(rendered, [self.images[2].image.name])
+
+        sprite = DeckSprite.objects.get(owner=self.entry)
+        self.assertIn(self.images[2].image.name, sprite.tiles)
+        self.assertNotIn(self.images[1].image.name, sprite.tiles)
+        self.assertNotEqual(sprite.image.name, old.image.name)
+
+    def test_removes_the_atlas_without_images(self):
+        build_deck_sprite("sprite")
+        self.deck.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(build_deck_sprite("sprite"))
+        self.assertFalse(DeckSprite.objects.exists())
+
+    def test_superseded_atlases_are_deleted_after_retention(self):
+        old = build_deck_sprite("sprite").image.name
+        self.deck.hover_img = self.images[2]
+        self.deck.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            current = build_deck_sprite("sprite").image.name
+
+        call_command("build_deck_sprites", stdout=io.StringIO())
+        self.assertTrue(default_storage.exists(old))
+
+        past = time.time() - 25 * 3600
+        for name in (old, current):
+            os.utime(default_storage.path(name), (past, past))
+        call_command("build_deck_sprites", stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(current))
+
+    def test_deck_list_exposes_tiles_on_request(self):
+        def sprite_field(query):
+            deck = self.client.get(f"/api/deck/sprite{query}").json()["results"][0]
+            return deck.get("sprite", "absent")
+
+        self.assertEqual(sprite_field(""), "absent")
+        self.assertIsNone(sprite_field("?sprite=1"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sprite = build_deck_sprite("sprite")
+        field = sprite_field("?sprite=1")
+        x, y, width, height = sprite.tiles[self.images[0].image.name]
+        self.assertEqual(field["url"], sprite.image.url)
+        self.assertEqual((field["width"], field["height"]), (640, 200))
+        self.assertEqual(
+            field["image"], {"x": x, "y": y, "width": width, "height": height}
+        )
+
+        # Until the atlas is rebuilt, images it does not hold have no tile.
+        Deck.objects.filter(pk=self.deck.pk).update(hover_img=self.images[2])
+        cache.clear()
+        self.assertIsNone(sprite_field("?sprite=1")["hover_img"])
+
+    def test_deck_edits_rebuild_the_atlas_after_commit(self):
+        user = get_user_model().objects.create_user("editor")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                f"/api/auth/alter_deck/{self.deck.id}",
+                {"hover_img_id": self.images[2].id},
+                format="json",
+            )
+        sprite = DeckSprite.objects.get(owner=self.entry)
+        self.assertIn(self.images[2].image.name, sprite.tiles)
+
+
+@override_settings(PRELOAD_DECK_IMAGES=2)
+class PreloadHintsTests(TestCase):
+    def setUp(self):
+        entry = SlugEntry.objects.create(slug="hints")
+        images = ImageUpload.objects.bulk_create(
+            ImageUpload(title=f"{i}", owner=entry, image=f"uploads/hints/{i}.png")
+            for i in range(3)
+        )
+        for image in (None, *images):
+            Deck.objects.create(
+                title="deck", displayed_name="Deck", owner=entry, image=image
+            )
+        DeckSprite.objects.create(
+            owner=entry, image="sprites/ab/atlas.webp", width=1, height=1
+        )
+
+    def test_hints_payloads_atlas_and_first_deck_images(self):
+        response = APIClient().get("/api/preload/hints")
+        self.assertEqual(
+            response.json()["links"],
+            [
+                "</api/deck/hints?sprite=1>; rel=preload; as=fetch; crossorigin",
+                "</api/gradient-colors/hints>; rel=preload; as=fetch; crossorigin",
+                '</media/sprites/ab/atlas.webp>; rel=preload; as=image; type="image/webp"',
+                '</media/uploads/hints/0.png>; rel=preload; as=image; fetchpriority="high"',
+                "</media/uploads/hints/1.png>; rel=preload; as=image",
+            ],
+        )
+        self.assertEqual(response["Link"], ", ".join(response.json()["links"]))
+
+    def test_cached_responses_keep_the_link_header(self):
+        client = APIClient()
+        link = client.get("/api/preload/hints")["Link"]
+        response = client.get("/api/preload/hints")
+        self.assertEqual(response["X-Read-Cache"], "HIT")
+        self.assertEqual(response["Link"], link)
@@ -1,7 +1,11 @@
 import sys
 
-from django.db.models.functions import Coalesce
+from django.conf import settings
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404, render
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     OpenApiExample,
     OpenApiParameter,
@@ -10,29 +14,144 @@ from drf_spectacular.utils import (
     extend_schema_view,
 )
 from rest_framework import filters
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import ListAPIView
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from administration import variants
 from administration.models import ImageUpload
 from administration.serializers import (
     BackgroundDataSerializer,
     DeckSerializer,
     GradientColorsSerializer,
-    ImageUploadSerializer,
+    ImageListSerializer,
     PageDetailsSerializer,
     PageNamesSerializer,
     PagesModelSerializer,
+    PreloadHintsSerializer,
     ProjectCardSerializer,
+    SlugBootstrapSerializer,
     SlugEntrySerializer,
 )
-
-from .models import BackgroundData, Deck, PagesModel, ProjectCard, SlugEntry
+from shmooz.query_budget import query_budget
+
+from .cache import GLOBAL_SCOPE, RememberedScope, cached_read
+from .conditional import conditional_get
+from .fast_serializers import (
+    deck_rows,
+    project_card_rows,
+    serialize_decks,
+    serialize_project_cards,
+)
+from .models import (
+    BackgroundData,
+    Deck,
+    DeckSprite,
+    PagesModel,
+    ProjectCard,
+    SlugEntry,
+)
+from .pagination import CursorOnlyPagination
+from .preload import preload_links
+from .queries import listed_images
+from .sprites import deck_sprites
 
 # Create your views here.
 
 
+def _background_querysets(request, slug=None, **kwargs):
+    return [BackgroundData.objects.filter(owner__slug=slug)]
+
+
+def _wants_sprite(request):
+    return request.GET.get("sprite") in ("1", "true")
+
+
+def _deck_querysets(request, slug=None, **kwargs):
+    querysets = [Deck.objects.filter(owner__slug=slug)]
+    if _wants_sprite(request):
+        querysets.append(DeckSprite.objects.filter(owner__slug=slug))
+    return querysets
+
+
+def _parse_deck_ids(value):
+    """
+    Parses the `deck` query parameter: `all` returns None, otherwise a list of
+    deck IDs from a comma separated value.
+    """
+    if value == "all":
+        return None
+    try:
+        deck_ids = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise ValidationError({"deck": "Expected 'all' or comma separated deck IDs."})
+    if not deck_ids:
+        raise ValidationError({"deck": "Expected 'all' or comma separated deck IDs."})
+    return deck_ids
+
+
+def _project_cards_for_decks(slug, deck_ids):
+    cards = ProjectCard.objects.filter(owner__slug=slug)
+    if deck_ids is None:
+        return cards.filter(deck__isnull=False)
+    return cards.filter(deck_id__in=deck_ids)
+
+
+def _project_card_querysets(request, slug=None, **kwargs):
+    deck_param = request.GET.get("deck")
+    if deck_param is not None:
+        try:
+            return [_project_cards_for_decks(slug, _parse_deck_ids(deck_param))]
+        except ValidationError:
+            return [ProjectCard.objects.none()]
+
+    deck_id = request.headers.get("X-deck-id")
+    if not deck_id:
+        return [ProjectCard.objects.none()]
+    return [ProjectCard.objects.filter(owner__slug=slug, deck_id=deck_id)]
+
+
+def _slug_querysets(request, **kwargs):
+    return [SlugEntry.objects.all()]
+
+
+def _page_querysets(request, slug=None, category=None, **kwargs):
+    return [PagesModel.objects.filter(owner__slug=slug, category=category)]
+
+
+def _project_page_querysets(request, id=None, **kwargs):
+    return [PagesModel.objects.filter(project_card_id=id)]
+
+
+def _global_scope(request, **kwargs):
+    return GLOBAL_SCOPE
+
+
+@RememberedScope
+def _project_page_scope(request, id=None, **kwargs):
+    return (
+        ProjectCard.objects.filter(id=id).values_list("owner__slug", flat=True).first()
+    )
+
+
+def _preload_querysets(request, slug=None, **kwargs):
+    return [
+        Deck.objects.filter(owner__slug=slug),
+        DeckSprite.objects.filter(owner__slug=slug),
+    ]
+
+
+def _bootstrap_querysets(request, slug=None, **kwargs):
+    return [
+        BackgroundData.objects.filter(owner__slug=slug),
+        Deck.objects.filter(owner__slug=slug),
+        ProjectCard.objects.filter(owner__slug=slug),
+    ]
+
+
 @extend_schema(
     summary="Get gradient background colors by slug",
     description="Retrieves gradient background configuration for a given user slug.",
@@ -47,11 +166,16 @@ from .models import BackgroundData, Deck, PagesModel, ProjectCard, SlugEntry
     ],
     responses={200: GradientColorsSerializer},
 )
+@method_decorator(cached_read(), name="dispatch")
+@method_decorator(conditional_get(_background_querysets), name="get")
+@query_budget(2)
 class GradientColorView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, slug=None):
-        background = get_object_or_404(BackgroundData, owner=slug)
+        background = get_object_or_404(
+            BackgroundData.objects.select_related("owner"), owner__slug=slug
+        )
         serializer = GradientColorsSerializer(background)
         return Response(serializer.data)
 
@@ -70,11 +194,16 @@ class GradientColorView(APIView):
     ],
     responses={200: PageNamesSerializer},
 )
+@method_decorator(cached_read(), name="dispatch")
+@method_decorator(conditional_get(_background_querysets), name="get")
+@query_budget(2)
 class PageNamesView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, slug=None):
-        names = get_object_or_404(BackgroundData, owner=slug)
+        names = get_object_or_404(
+            BackgroundData.objects.select_related("owner"), owner__slug=slug
+        )
         serializer = PageNamesSerializer(names)
         return Response(serializer.data)
 
@@ -93,11 +222,16 @@ class PageNamesView(APIView):
     ],
     responses={200: PageDetailsSerializer},
 )
+@method_decorator(cached_read(), name="dispatch")
+@method_decorator(conditional_get(_background_querysets), name="get")
+@query_budget(2)
 class PageDetailsView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, slug=None):
-        details = get_object_or_404(BackgroundData, owner=slug)
+        details = get_object_or_404(
+            BackgroundData.objects.select_related("owner"), owner__slug=slug
+        )
         serializer = PageDetailsSerializer(details)
         return Response(serializer.data)
 
@@ -113,9 +247,25 @@ class PageDetailsView(APIView):
             required=True,
             type=str,
         ),
+        OpenApiParameter(
+            name="sprite",
+            location=OpenApiParameter.QUERY,
+            description=(
+                "With `1`, every deck gets a `sprite` field: the `url`, `width` "
+                "and `height` of the slug's deck image atlas and the `x`, `y`, "
+                "`width` and `height` of its `image` and `hover_img` in it. "
+                "Images missing from the atlas, e.g. just after an edit, are "
+                "null; `sprite` is null while the slug has no atlas."
+            ),
+            required=False,
+            type=bool,
+        ),
     ],
     responses={200: DeckSerializer(many=True)},
 )
+@method_decorator(cached_read(), name="dispatch")
+@method_decorator(conditional_get(_deck_querysets), name="get")
+@query_budget(5)
 class DeckListView(ListAPIView):
     serializer_class = DeckSerializer
     permission_classes = [AllowAny]
@@ -126,13 +276,32 @@ class DeckListView(ListAPIView):
         slug = self.kwargs.get("slug")
         qs = Deck.objects.all()
         if slug:
-            qs = qs.filter(owner=slug)
-        return qs.annotate(sort_ts=Coalesce("edited_at", "created_at"))
+            qs = qs.filter(owner__slug=slug)
+        return qs
+
+    def serialize(self, rows):
+        decks = serialize_decks(rows)
+        if _wants_sprite(self.request):
+            for deck, sprite in zip(decks, deck_sprites(rows)):
+                deck["sprite"] = sprite
+        return decks
+
+    def list(self, request, *args, **kwargs):
+        rows = deck_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.serialize(page))
+        return Response(self.serialize(list(rows)))
 
 
 @extend_schema(
     summary="Get project cards by slug and deck ID",
-    description="Returns a list of project cards for a given owner slug and deck ID passed in the `X-deck-id` header.",
+    description=(
+        "Returns project cards for a given owner slug. With the `deck` query "
+        "parameter (`1,2,3` or `all`) the cards of every requested deck are "
+        "returned in one response as an object keyed by deck ID. Without it, "
+        "returns a paginated list for the deck ID passed in the `X-deck-id` header."
+    ),
     parameters=[
         OpenApiParameter(
             name="slug",
@@ -141,11 +310,18 @@ class DeckListView(ListAPIView):
             required=True,
             type=str,
         ),
+        OpenApiParameter(
+            name="deck",
+            location=OpenApiParameter.QUERY,
+            description="Comma separated deck IDs, or `all` for every deck of the slug",
+            required=False,
+            type=str,
+        ),
         OpenApiParameter(
             name="X-deck-id",
             location=OpenApiParameter.HEADER,
-            description="Deck ID used to filter project cards",
-            required=True,
+            description="Deck ID used to filter project cards (legacy form)",
+            required=False,
             type=int,
         ),
     ],
@@ -155,6 +331,11 @@ class DeckListView(ListAPIView):
         400: OpenApiResponse(description="Bad request or missing header"),
     },
 )
+@method_decorator(cached_read(vary=("X-deck-id",)), name="dispatch")
+@method_decorator(
+    conditional_get(_project_card_querysets, vary=("X-deck-id",)), name="get"
+)
+@query_budget(3)
 class ProjectCardListView(ListAPIView):
     serializer_class = ProjectCardSerializer
     permission_classes = [AllowAny]
@@ -165,10 +346,36 @@ class ProjectCardListView(ListAPIView):
     def get_queryset(self):
         owner = self.kwargs.get("slug", "shmooz")
         deck_id = self.request.headers.get("X-deck-id")
-        qs = ProjectCard.objects.none()
         if owner and deck_id:
-            qs = ProjectCard.objects.filter(owner=owner, deck_id=deck_id)
-        return qs.annotate(sort_ts=Coalesce("edited_at", "created_at"))
+            return ProjectCard.objects.filter(owner__slug=owner, deck_id=deck_id)
+        return ProjectCard.objects.none()
+
+    def list(self, request, *args, **kwargs):
+        deck_param = request.query_params.get("deck")
+        if deck_param is None:
+            rows = project_card_rows(self.filter_queryset(self.get_queryset()))
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(serialize_project_cards(page))
+            return Response(serialize_project_cards(rows))
+
+        deck_ids = _parse_deck_ids(deck_param)
+        rows = project_card_rows(
+            self.filter_queryset(
+                _project_cards_for_decks(self.kwargs.get("slug"), deck_ids)
+            )
+        )
+
+        grouped = {str(deck_id): [] for deck_id in deck_ids or []}
+        for row in rows:
+            grouped.setdefault(str(row["deck_id"]), []).append(row)
+
+        return Response(
+            {
+                deck_id: serialize_project_cards(deck_cards)
+                for deck_id, deck_cards in grouped.items()
+            }
+        )
 
 
 @extend_schema(
@@ -176,6 +383,9 @@ class ProjectCardListView(ListAPIView):
     description="Returns all slugs registered in the system.",
     responses={200: SlugEntrySerializer(many=True)},
 )
+@method_decorator(cached_read(_global_scope), name="dispatch")
+@method_decorator(conditional_get(_slug_querysets), name="get")
+@query_budget(2)
 class SlugListView(APIView):
     permission_classes = [AllowAny]
 
@@ -210,6 +420,9 @@ class SlugListView(APIView):
         400: OpenApiResponse(description="Missing or invalid category/slug"),
     },
 )
+@method_decorator(cached_read(), name="dispatch")
+@method_decorator(conditional_get(_page_querysets), name="get")
+@query_budget(2)
 class PageFetchView(APIView):
     permission_classes = [AllowAny]
 
@@ -217,7 +430,11 @@ class PageFetchView(APIView):
         category = self.kwargs.get("category")
         if not category or not slug:
             return Response({"detail": "Missing category or slug"}, status=400)
-        page = get_object_or_404(PagesModel, owner=slug, category=category)
+        page = get_object_or_404(
+            PagesModel.objects.select_related("owner"),
+            owner__slug=slug,
+            category=category,
+        )
         return Response(PagesModelSerializer(page).data)
 
 
@@ -238,13 +455,16 @@ class PageFetchView(APIView):
         404: OpenApiResponse(description="No page found for this project card"),
     },
 )
+@method_decorator(cached_read(_project_page_scope), name="dispatch")
+@method_decorator(conditional_get(_project_page_querysets), name="get")
+@query_budget(4)
 class ProjectPageFetchView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, id):
         card = get_object_or_404(ProjectCard, id=id)
         try:
-            page = PagesModel.objects.get(project_card=card)
+            page = PagesModel.objects.select_related("owner").get(project_card=card)
         except PagesModel.DoesNotExist:
             return Response(
                 {"detail": "Page for this project card does not exist."}, status=404
@@ -254,14 +474,210 @@ class ProjectPageFetchView(APIView):
 
 
 @extend_schema(
-    summary="List all uploaded images",
-    description="Returns a list of all uploaded images with their ID and public URL.",
-    responses={200: ImageUploadSerializer(many=True)},
+    summary="List uploaded images",
+    description=(
+        "Returns uploaded images, newest first, with a thumbnail URL and "
+        "`usage_count`, the number of decks, project cards and pages using "
+        "them; images with a count of 0 are safe to remove. Paginated by "
+        "cursor: follow the `next` and `previous` links."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name="slug",
+            location=OpenApiParameter.QUERY,
+            description="Only list images uploaded for this slug",
+            required=False,
+            type=str,
+        ),
+    ],
+    responses={200: ImageListSerializer(many=True)},
 )
+@query_budget(1)
 class ImageListView(ListAPIView):
     permission_classes = [AllowAny]
 
-    queryset = ImageUpload.objects.all()
-    serializer_class = ImageUploadSerializer
-    filter_backends = [filters.OrderingFilter]
-    ordering_fields = ["id", "uploaded_at"]
+    serializer_class = ImageListSerializer
+    pagination_class = CursorOnlyPagination
+    filter_backends = []
+    keyset_field = "uploaded_at"
+
+    def get_queryset(self):
+        queryset = listed_images()
+        slug = self.request.query_params.get("slug")
+        if slug:
+            queryset = queryset.filter(owner__slug=slug)
+        return queryset
+
+
+class _IgnoreAcceptNegotiation(BaseContentNegotiation):
+    """Errors render as JSON whatever image types the client accepts."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def _int_param(request, name, default):
+    value = request.GET.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "Expected an integer."})
+
+
+@extend_schema(
+    summary="Get a resized image variant",
+    description=(
+        "Returns the image resized to one of the allowed widths. Without `fm` the "
+        "format is picked from the Accept header (AVIF, WebP, then JPEG). "
+        "`q` is rounded to the nearest served quality. Responses for URLs carrying "
+        "the current version token `v` are immutable."
+    ),
+    parameters=[
+        OpenApiParameter(name="w", type=int, required=True, description="Width"),
+        OpenApiParameter(name="q", type=int, description="Quality (30-95)"),
+        OpenApiParameter(name="fm", type=str, description="avif, webp or jpeg"),
+        OpenApiParameter(name="v", type=str, description="Version token"),
+    ],
+    responses={
+        (200, "image/*"): OpenApiTypes.BINARY,
+        400: OpenApiResponse(description="Unsupported width, quality or format"),
+        404: OpenApiResponse(description="Image not found"),
+    },
+)
+@query_budget(1)
+class ImageVariantView(APIView):
+    permission_classes = [AllowAny]
+    content_negotiation_class = _IgnoreAcceptNegotiation
+
+    def get(self, request, pk):
+        width = _int_param(request, "w", None)
+        if width not in settings.IMAGE_VARIANT_WIDTHS:
+            raise ValidationError(
+                {"w": f"Expected one of {settings.IMAGE_VARIANT_WIDTHS}."}
+            )
+
+        quality = _int_param(request, "q", settings.IMAGE_VARIANT_DEFAULT_QUALITY)
+        if not 30 <= quality <= 95:
+            raise ValidationError({"q": "Expected a value between 30 and 95."})
+        quality = variants.snap_quality(quality)
+
+        fmt = request.GET.get("fm")
+        if fmt is not None and fmt not in variants.supported_formats():
+            raise ValidationError(
+                {"fm": f"Expected one of {variants.supported_formats()}."}
+            )
+
+        name = ImageUpload.objects.filter(pk=pk).values_list("image", flat=True).first()
+        if not name:
+            raise NotFound()
+
+        negotiated = fmt is None
+        if negotiated:
+            fmt = variants.negotiate_format(request.headers.get("Accept"))
+
+        storage = ImageUpload._meta.get_field("image").storage
+        try:
+            path = variants.get_variant(storage, name, width, quality, fmt)
+        except FileNotFoundError:
+            raise NotFound("Image file is missing.")
+
+        response = FileResponse(open(path, "rb"), content_type=variants.FORMATS[fmt][0])
+        if request.GET.get("v") == variants.version_token(name):
+            patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        if negotiated:
+            patch_vary_headers(response, ["Accept"])
+        return response
+
+
+@extend_schema(
+    summary="Get everything needed to render a slug",
+    description=(
+        "Returns the background, page names, page details, decks and the project "
+        "cards grouped by deck ID for a given slug in a single response."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name="slug",
+            location=OpenApiParameter.PATH,
+            description="Owner slug",
+            required=True,
+            type=str,
+        ),
+    ],
+    responses={
+        200: SlugBootstrapSerializer,
+        404: OpenApiResponse(description="No background data for this slug"),
+    },
+)
+@method_decorator(cached_read(), name="dispatch")
+@method_decorator(conditional_get(_bootstrap_querysets), name="get")
+@query_budget(6)
+class SlugBootstrapView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, slug=None):
+        background = get_object_or_404(
+            BackgroundData.objects.select_related("owner"), owner__slug=slug
+        )
+        decks = list(deck_rows(Deck.objects.filter(owner__slug=slug)))
+
+        project_cards = {str(deck["id"]): [] for deck in decks}
+        cards = project_card_rows(
+            ProjectCard.objects.filter(
+                owner__slug=slug, deck_id__in=[deck["id"] for deck in decks]
+            )
+        )
+        for card in cards:
+            project_cards[str(card["deck_id"])].append(card)
+
+        return Response(
+            {
+                "background": GradientColorsSerializer(background).data,
+                "page_names": PageNamesSerializer(background).data,
+                "page_details": PageDetailsSerializer(background).data,
+                "decks": serialize_decks(decks),
+                "project_cards": {
+                    deck_id: serialize_project_cards(deck_cards)
+                    for deck_id, deck_cards in project_cards.items()
+                },
+            }
+        )
+
+
+@extend_schema(
+    summary="Get preload hints for a slug's landing page",
+    description=(
+        "Returns `rel=preload` `Link` header values for the deck list and "
+        "gradient payloads, the deck image atlas and the first deck images of "
+        "a slug, in the body and in the `Link` header. The SSR server forwards "
+        "them on the page response and as 103 Early Hints where supported."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name="slug",
+            location=OpenApiParameter.PATH,
+            description="Owner slug",
+            required=True,
+            type=str,
+        ),
+    ],
+    responses={200: PreloadHintsSerializer},
+)
+@method_decorator(cached_read(), name="dispatch")
+@method_decorator(conditional_get(_preload_querysets), name="get")
+@query_budget(4)
+class PreloadHintsView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, slug=None):
+        links = preload_links(slug)
+        response = Response({"links": links})
+        response["Link"] = ", ".join(links)
+        return response
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the API renderers.
+
+Encodes payloads shaped like our real endpoints (a deck list page, the slug
+bootstrap response and a long PagesModel content document) with DRF's stdlib
+JSONRenderer, the orjson-backed ORJSONRenderer and the MessagePackRenderer,
+and reports encode time and payload size (raw and gzipped). No database is
+needed.
+
+Usage (from Backend/):
+    python scripts/bench_renderers.py [--runs 200]
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import timeit
+
+import django
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shmooz.settings")
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from shmooz.renderers import MessagePackRenderer, ORJSONRenderer  # noqa: E402
+
+TIMESTAMP = "2025-08-19T16:13:05.123456Z"
+FLOAT_ARRAYS = [
+    "x_offsets",
+    "y_offsets",
+    "rotations",
+    "alphas",
+    "brightness",
+    "hover_x_offsets",
+    "hover_y_offsets",
+    "hover_rotations",
+    "hover_brightness",
+]
+
+
+def deck(i, cards=12):
+    data = {
+        "id": i,
+        "title": f"deck-{i}",
+        "displayed_name": f"Deck number {i}",
+        "owner": "shmooz",
+        "image": 2 * i,
+        "image_url": f"/media/uploads/shmooz/deck-{i}.png",
+        "hover_img": 2 * i + 1,
+        "hover_img_url": f"/media/uploads/shmooz/deck-{i}-hover.png",
+        "card_amount": cards,
+    }
+    for n, name in enumerate(FLOAT_ARRAYS):
+        data[name] = [round((k + n) * 0.137 - 3.3, 4) for k in range(cards)]
+    data.update(
+        {
+            "created_at": TIMESTAMP,
+            "edited_at": TIMESTAMP,
+            "text_color": "#ffffff",
+            "hover_color": "#000000",
+        }
+    )
+    return data
+
+
+def project_card(i, deck_id):
+    return {
+        "id": i,
+        "title": f"Project {i}",
+        "text": "A short description of the project",
+        "text_color": "#ffffff",
+        "label_letter": "P",
+        "label_color": "#112233",
+        "inline_color": "#445566",
+        "owner": "shmooz",
+        "image": i,
+        "image_url": f"/media/uploads/shmooz/card-{i}.webp",
+        "deck": deck_id,
+        "created_at": TIMESTAMP,
+        "edited_at": None,
+    }
+
+
+def page(blocks=40, items=6):
+    content = []
+    for b in range(blocks):
+        block_items = []
+        for k in range(items):
+            item = {
+                "id": f"item-{b}-{k}",
+                "rowStart": k + 1,
+                "colStart": 1,
+                "rowSpan": 1,
+                "colSpan": 2,
+            }
+            if k % 3 == 0:
+                item.update(
+                    type="image",
+                    url=f"/media/uploads/shmooz/page-{b}-{k}.jpg",
+                    alt="Screenshot",
+                    objectFit="cover",
+                )
+            elif k % 3 == 1:
+                item.update(
+                    type="text",
+                    text="Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+                    * 4,
+                    color="#222222",
+                    tag="p",
+                    textAlign="left",
+                    fontSize="1rem",
+                )
+            else:
+                item.update(
+                    type="link",
+                    url="https://example.com/project",
+                    text="Visit project",
+                    iconPosition="left",
+                )
+            block_items.append(item)
+        content.append(
+            {
+                "id": f"block-{b}",
+                "backgroundColor": "#ffffff",
+                "borderColor": "#000000",
+                "gridTemplateColumns": "repeat(4, 1fr)",
+                "gridTemplateRows": "auto auto",
+                "content": block_items,
+            }
+        )
+    return {
+        "id": 1,
+        "owner": "shmooz",
+        "category": "page_one",
+        "content": content,
+        "created_at": TIMESTAMP,
+        "edited_at": TIMESTAMP,
+    }
+
+
+def shapes():
+    decks = [deck(i) for i in range(30)]
+    return {
+        "deck list page (20 decks)": {
+            "count": 30,
+            "next": "http://localhost/api/deck/shmooz?limit=20&offset=20",
+            "previous": None,
+            "results": decks[:20],
+        },
+        "bootstrap (30 decks, 120 cards)": {
+            "decks": decks,
+            "project_cards": {
+                str(d["id"]): [project_card(d["id"] * 4 + k, d["id"]) for k in range(4)]
+                for d in decks
+            },
+        },
+        "page content (40 blocks)": page(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    renderers = {
+        "JSONRenderer (stdlib)": JSONRenderer(),
+        "ORJSONRenderer": ORJSONRenderer(),
+        "MessagePackRenderer": MessagePackRenderer(),
+    }
+
+    for label, data in shapes().items():
+        print(f"\n=== {label}")
+        baseline = None
+        for name, renderer in renderers.items():
+            payload = renderer.render(data, renderer.media_type)
+            seconds = timeit.timeit(
+                lambda: renderer.render(data, renderer.media_type), number=args.runs
+            )
+            per_call = seconds / args.runs * 1e6
+            baseline = baseline or per_call
+            print(
+                f"{name:<24} {per_call:9.1f} us  x{baseline / per_call:5.1f}  "
+                f"{len(payload):8d} B  {len(gzip.compress(payload)):7d} B gzip"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the fast-path deck serialization used by the public views.
+
+For 1k and 10k decks (each with an image and a hover image) compares:
+- DeckSerializer over a plain queryset (today's path, one image query per row)
+- DeckSerializer over a select_related queryset
+- portfolio.fast_serializers over `.values()` rows
+
+and reports total time, per-row cost, query count and whether the rendered
+JSON is byte-identical. Everything is seeded inside a transaction that is
+rolled back at the end.
+
+Usage (from Backend/):
+    python scripts/bench_serializers.py [--sizes 1000 10000] [--runs 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import django
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shmooz.settings")
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from administration.models import ImageUpload  # noqa: E402
+from administration.serializers import DeckSerializer  # noqa: E402
+from portfolio.fast_serializers import deck_rows, serialize_decks  # noqa: E402
+from portfolio.models import Deck, SlugEntry  # noqa: E402
+
+BENCH_OWNER = "__bench_serializers__"
+OFFSETS = [float(i) / 7 for i in range(12)]
+
+
+def seed(size):
+    owner = SlugEntry.objects.create(slug=BENCH_OWNER)
+    images = ImageUpload.objects.bulk_create(
+        ImageUpload(title=f"bench-{i}", image=f"uploads/{BENCH_OWNER}/{i}.png")
+        for i in range(2 * size)
+    )
+    Deck.objects.bulk_create(
+        Deck(
+            title=f"deck-{i}",
+            displayed_name=f"Deck {i}",
+            owner=owner,
+            image=images[2 * i],
+            hover_img=images[2 * i + 1],
+            card_amount=len(OFFSETS),
+            x_offsets=OFFSETS,
+            y_offsets=OFFSETS,
+            rotations=OFFSETS,
+            alphas=OFFSETS,
+            brightness=OFFSETS,
+            hover_x_offsets=OFFSETS,
+            hover_y_offsets=OFFSETS,
+            hover_rotations=OFFSETS,
+            hover_brightness=OFFSETS,
+            text_color="#ffffff",
+            hover_color="#000000",
+        )
+        for i in range(size)
+    )
+
+    with connection.cursor() as cursor:
+        for model in (ImageUpload, Deck):
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+
+def measure(build, runs):
+    best = None
+    for _ in range(runs):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            data = build()
+            elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, len(queries), data)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    renderer = JSONRenderer()
+    for size in args.sizes:
+        with transaction.atomic():
+            seed(size)
+            decks = Deck.objects.filter(owner__slug=BENCH_OWNER)
+
+            paths = {
+                "DeckSerializer": lambda: DeckSerializer(decks.all(), many=True).data,
+                "DeckSerializer + select_related": lambda: DeckSerializer(
+                    decks.select_related("owner", "image", "hover_img"), many=True
+                ).data,
+                "fast path (.values())": lambda: serialize_decks(
+                    deck_rows(decks.all())
+                ),
+            }
+
+            print(f"\n=== {size} decks")
+            reference = None
+            for label, build in paths.items():
+                elapsed, query_count, data = measure(build, args.runs)
+                payload = renderer.render(data)
+                if reference is None:
+                    reference = payload
+                print(
+                    f"{label:<34} {elapsed * 1000:9.1f} ms "
+                    f"{elapsed / size * 1e6:8.1f} us/row "
+                    f"{query_count:6d} queries "
+                    f"identical={payload == reference}"
+                )
+
+            transaction.set_rollback(True)
+
+
+if __name__ == "__main__":
+    main()
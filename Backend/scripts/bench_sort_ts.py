@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the stored `sort_ts` column on ProjectCard.
+
+Seeds 100k project cards for a throwaway owner, then compares the query plans
+and timings of ordering by the old runtime `Coalesce(edited_at, created_at)`
+annotation against ordering by the indexed `sort_ts` column, and shows the
+per-slug validator aggregate being answered by an index-only scan.
+
+The seeded rows are committed (VACUUM cannot run inside a transaction) and
+removed again at the end.
+
+Usage (from Backend/):
+    python scripts/bench_sort_ts.py [--cards 100000] [--decks 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+import django
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shmooz.settings")
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.db.models import Max  # noqa: E402
+from django.db.models.functions import Coalesce  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from portfolio.models import Deck, ProjectCard, SlugEntry  # noqa: E402
+
+BENCH_OWNER = "__bench_sort_ts__"
+PAGE_SIZE = 20
+
+
+def seed(card_count, deck_count):
+    owner = SlugEntry.objects.create(slug=BENCH_OWNER)
+    decks = Deck.objects.bulk_create(
+        Deck(
+            title=f"bench-{i}",
+            displayed_name=f"bench-{i}",
+            owner=owner,
+            text_color="#000000",
+            hover_color="#ffffff",
+        )
+        for i in range(deck_count)
+    )
+
+    now = timezone.now()
+    batch = []
+    for i in range(card_count):
+        batch.append(
+            ProjectCard(
+                title=f"card-{i}",
+                text="bench",
+                text_color="#000000",
+                label_letter="B",
+                label_color="#000000",
+                inline_color="#000000",
+                owner=owner,
+                deck=decks[i % deck_count],
+                # Roughly a third of the rows have been edited since creation.
+                edited_at=now - timedelta(seconds=i) if i % 3 == 0 else None,
+            )
+        )
+        if len(batch) == 5000:
+            ProjectCard.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProjectCard.objects.bulk_create(batch)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"VACUUM ANALYZE {ProjectCard._meta.db_table}")
+    return decks
+
+
+def cleanup():
+    ProjectCard.objects.filter(owner__slug=BENCH_OWNER).delete()
+    Deck.objects.filter(owner__slug=BENCH_OWNER).delete()
+    SlugEntry.objects.filter(slug=BENCH_OWNER).delete()
+
+
+def timed(label, qs, runs=20):
+    list(qs.all())
+    start = time.perf_counter()
+    for _ in range(runs):
+        list(qs.all())
+    elapsed = (time.perf_counter() - start) / runs * 1000
+    plan = qs.explain(analyze=True, buffers=True)
+    uses_sort = any(line.strip().startswith("Sort") for line in plan.splitlines())
+    index_only = "Index Only Scan" in plan
+
+    print(f"\n=== {label}")
+    print(f"mean: {elapsed:.3f} ms | sort node: {uses_sort} | index-only: {index_only}")
+    print(plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--decks", type=int, default=20)
+    args = parser.parse_args()
+
+    cleanup()
+    print(f"Seeding {args.cards} project cards across {args.decks} decks...")
+    decks = seed(args.cards, args.decks)
+    deck_id = decks[0].id
+
+    try:
+        owner_cards = ProjectCard.objects.filter(owner__slug=BENCH_OWNER)
+        deck_cards = owner_cards.filter(deck_id=deck_id)
+
+        timed(
+            "owner, ORDER BY Coalesce(edited_at, created_at) DESC (before)",
+            owner_cards.annotate(
+                coalesced=Coalesce("edited_at", "created_at")
+            ).order_by("-coalesced")[:PAGE_SIZE],
+        )
+        timed(
+            "owner, ORDER BY sort_ts DESC",
+            owner_cards.order_by("-sort_ts")[:PAGE_SIZE],
+        )
+        timed(
+            "owner + deck, ORDER BY Coalesce(edited_at, created_at) DESC (before)",
+            deck_cards.annotate(coalesced=Coalesce("edited_at", "created_at")).order_by(
+                "-coalesced"
+            )[:PAGE_SIZE],
+        )
+        timed(
+            "owner + deck, ORDER BY sort_ts DESC",
+            deck_cards.order_by("-sort_ts")[:PAGE_SIZE],
+        )
+        timed(
+            "owner + deck, ordered sort_ts keys only",
+            deck_cards.order_by("-sort_ts").values_list("sort_ts", flat=True)[
+                :PAGE_SIZE
+            ],
+        )
+        timed(
+            "owner + deck, newest sort_ts (conditional GET validator)",
+            deck_cards.order_by().values("owner").annotate(last=Max("sort_ts")),
+        )
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
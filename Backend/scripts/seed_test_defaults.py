@@ -66,7 +66,7 @@ def upload_image_from_path(title, file_path, slug="test"):
             # Get just the filename for the upload
             filename = os.path.basename(full_path)
             img = ImageUpload(title=title, image=File(f, name=filename))
-            img.upload_slug = slug
+            img.owner = SlugEntry.objects.get_or_create(slug=slug)[0]
             img.save()
             print(f"✅ Uploaded image: {filename} as '{title}' (ID: {img.id})")
             return img
@@ -75,6 +75,11 @@ def upload_image_from_path(title, file_path, slug="test"):
         return None
 
 
+def test_entry():
+    """The 'test' SlugEntry every default object belongs to."""
+    return SlugEntry.objects.get_or_create(slug="test")[0]
+
+
 def create_slug_entry():
     """Create or get the test slug entry."""
     slug_entry, created = SlugEntry.objects.get_or_create(slug="test")
@@ -88,7 +93,7 @@ def create_slug_entry():
 def create_background_data():
     """Create background data for test if it doesn't exist."""
     bg_data, created = BackgroundData.objects.get_or_create(
-        owner="test",
+        owner=test_entry(),
         defaults={
             "color1": "#4A90E2",
             "color2": "#2C3E50",
@@ -163,7 +168,7 @@ def create_decks():
     for deck_data in decks_data:
         deck, created = Deck.objects.get_or_create(
             title=deck_data["title"],
-            owner="test",
+            owner=test_entry(),
             defaults=deck_data
         )
         if created:
@@ -221,7 +226,7 @@ def create_project_cards(decks):
     for card_data in cards_data:
         card, created = ProjectCard.objects.get_or_create(
             title=card_data["title"],
-            owner="test",
+            owner=test_entry(),
             deck=card_data["deck"],
             defaults={
                 "text": card_data["text"],
@@ -500,7 +505,7 @@ def create_project_pages(project_cards):
             continue
         
         page = PagesModel.objects.create(
-            owner="test",
+            owner=test_entry(),
             content=pages_content_templates[i],
             category=f"project_{project_card.id}",
             project_card=project_card,
@@ -579,7 +584,7 @@ EXAMPLE: How to add images to this script
 The upload_image_from_path() function will:
 - Check if the file exists
 - Upload it to the database with the specified title
-- Set the upload_slug to "test" for organization
+- Set the owner to "test" for organization
 - Return the ImageUpload object for use in your models
 - Print success/error messages
 
@@ -0,0 +1,77 @@
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(budget):
+    """
+    Declares the maximum number of SQL queries one request to a view may run,
+    authentication included. The budget must not depend on how many rows the
+    slug owns. Works on view classes and on function views.
+    """
+
+    def decorator(view):
+        if isinstance(view, type):
+            view.query_budget = budget
+            return view
+
+        @wraps(view)
+        def budgeted_view(*args, **kwargs):
+            return view(*args, **kwargs)
+
+        budgeted_view.query_budget = budget
+        return budgeted_view
+
+    return decorator
+
+
+def get_query_budget(view_func):
+    view_class = getattr(view_func, "view_class", None)
+    budget = getattr(view_class, "query_budget", None)
+    if budget is None:
+        budget = getattr(view_func, "query_budget", None)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """
+    Dev-mode guard counting the queries of every request against the budget
+    declared on its view. Over-budget requests are logged, or raise
+    QueryBudgetExceeded when settings.QUERY_BUDGET_RAISE is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = None
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = self.get_response(request)
+
+        budget = request.query_budget
+        if budget is not None and len(queries) > budget:
+            message = (
+                f"{request.method} {request.path} ran {len(queries)} queries, "
+                f"over its budget of {budget}"
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra={"queries": queries})
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
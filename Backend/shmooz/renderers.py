@@ -0,0 +1,71 @@
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .server_timing import phase
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    """Falls back to DRF's encoder for types orjson/msgpack do not know."""
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson. Compact output matches DRF's renderer byte
+    for byte, except that floats in exponent notation are written shorter
+    (`1e-7` for `1e-07`) and non-finite floats render as null instead of
+    raising. Indented output (browsable API, `; indent=` media type parameter)
+    and ASCII-only output are left to the stdlib implementation.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase("render"):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Dates and times go through DRF's encoder, which writes UTC as "Z".
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        try:
+            ret = orjson.dumps(data, default=_default, option=option)
+        except TypeError:
+            # Non-str keys, e.g. the per-index errors of a list serializer;
+            # the stdlib renders them as strings too.
+            option |= orjson.OPT_NON_STR_KEYS
+            ret = orjson.dumps(data, default=_default, option=option)
+
+        # Same strict javascript subset escaping as JSONRenderer.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack for clients sending `Accept: application/msgpack`
+    (e.g. the SSR server), or `?format=msgpack`.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with phase("render"):
+            return msgpack.packb(data, default=_default, use_bin_type=True)
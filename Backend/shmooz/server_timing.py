@@ -0,0 +1,126 @@
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("server_timing", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.phases = defaultdict(float)
+        self.view_window = None
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def snapshot(self):
+        return time.perf_counter(), self.db, self.phases["render"]
+
+    def serialize_time(self, view_start, view_end):
+        """View time that is neither database access nor rendering."""
+        start, db_start, render_start = view_start
+        end, db_end, render_end = view_end
+        return max(
+            0.0, (end - start) - (db_end - db_start) - (render_end - render_start)
+        )
+
+
+@contextmanager
+def phase(name):
+    """Adds the time spent in the block to the current request's `name` phase."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[name] += time.perf_counter() - start
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class ServerTimingMiddleware:
+    """
+    Splits every request into database, serializer, renderer and total time
+    and reports them in a `Server-Timing` header and one structured log line.
+
+    Serializer time is the time spent in the view minus database and render
+    time, since views serialize inline. Render time comes from the renderers
+    (see shmooz.renderers) through `phase("render")`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        request.server_timing = timings
+        token = _current.set(timings)
+        try:
+            with connection.execute_wrapper(timings.record_query):
+                response = self.get_response(request)
+            if timings.view_window and len(timings.view_window) == 1:
+                timings.view_window.append(timings.snapshot())
+            total = time.perf_counter() - timings.started
+        finally:
+            _current.reset(token)
+
+        serialize = (
+            timings.serialize_time(*timings.view_window) if timings.view_window else 0.0
+        )
+        metrics = {
+            "db_ms": _ms(timings.db),
+            "queries": timings.queries,
+            "serialize_ms": _ms(serialize),
+            "render_ms": _ms(timings.phases["render"]),
+            "total_ms": _ms(total),
+        }
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={metrics["db_ms"]};desc="{timings.queries} queries"',
+                f"serialize;dur={metrics['serialize_ms']}",
+                f"render;dur={metrics['render_ms']}",
+                f"total;dur={metrics['total_ms']}",
+            ]
+        )
+        logger.info(
+            "%s %s %s %s",
+            request.method,
+            request.path,
+            response.status_code,
+            " ".join(f"{key}={value}" for key, value in metrics.items()),
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                **metrics,
+            },
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.server_timing.view_window = [request.server_timing.snapshot()]
+
+    def process_template_response(self, request, response):
+        window = request.server_timing.view_window
+        if window and len(window) == 1:
+            window.append(request.server_timing.snapshot())
+        return response
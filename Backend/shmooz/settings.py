@@ -51,12 +51,38 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_RENDERER_CLASSES": [
+        "shmooz.renderers.ORJSONRenderer",
+        "shmooz.renderers.MessagePackRenderer",
+    ],
+    "DEFAULT_PAGINATION_CLASS": "portfolio.pagination.PortfolioPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_FILTER_BACKENDS": [
         "rest_framework.filters.OrderingFilter",
     ],
 }
+
+# Django's cache framework backs the versioned per-slug read cache. Local memory
+# is per process; use FileBasedCache to share entries between workers on one box.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+PORTFOLIO_READ_CACHE_ALIAS = "default"
+PORTFOLIO_READ_CACHE_TIMEOUT = 300
+# Hits and misses are counted per process and added to the shared counters
+# every this many lookups.
+PORTFOLIO_READ_CACHE_STATS_FLUSH = 100
+
+# Cache-Control sent with validated responses of the public portfolio endpoints;
+# clients revalidate with If-None-Match and may serve stale copies meanwhile.
+PORTFOLIO_CACHE_MAX_AGE = 0
+PORTFOLIO_STALE_WHILE_REVALIDATE = 60
+# Part of every ETag; bump it when the shape of response payloads changes (new
+# fields) so clients stop getting 304s. Row and image edits change ETags alone.
+PORTFOLIO_ETAG_VERSION = 3
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -73,6 +99,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "shmooz.server_timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -82,6 +109,12 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Views declare how many queries a request may run with @query_budget. In dev the
+# middleware logs requests over budget, or raises when QUERY_BUDGET_RAISE is set.
+QUERY_BUDGET_RAISE = False
+if DEBUG:
+    MIDDLEWARE.append("shmooz.query_budget.QueryBudgetMiddleware")
+
 CSRF_COOKIE_SECURE = True
 
 SIMPLE_JWT = {
@@ -128,6 +161,23 @@ DATABASES = {
 }
 
 
+# One structured line per request with its Server-Timing phases.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "shmooz.server_timing": {
+            "handlers": ["console"],
+            "level": os.getenv("SERVER_TIMING_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -166,6 +216,63 @@ STATIC_URL = "static/"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+# Uploads stream to temporary files and are checked from the image header
+# before anything is decoded.
+IMAGE_UPLOAD_MAX_BYTES = 25 * 1024 * 1024
+IMAGE_UPLOAD_MAX_REQUEST_BYTES = 200 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 50_000_000
+IMAGE_UPLOAD_FORMATS = ["JPEG", "PNG", "WEBP", "GIF", "AVIF"]
+# Bulk uploads validate and measure their files in a worker pool.
+IMAGE_BULK_UPLOAD_MAX_FILES = 50
+IMAGE_BULK_UPLOAD_WORKERS = 4
+# Uploads over this many pixels that Pillow cannot decode at a reduced scale
+# (all but JPEG) get their dominant color and placeholder from a variant after
+# they commit, in a background worker unless IMAGE_PREVIEW_BACKGROUND is off,
+# instead of a full decode in the request.
+IMAGE_METADATA_INLINE_PIXELS = 4_000_000
+IMAGE_PREVIEW_BACKGROUND = True
+
+# Resumable uploads assemble their chunks in MEDIA_ROOT/UPLOAD_SESSION_DIR, on
+# the same filesystem as the uploads so finalizing is a rename. Sessions idle
+# for UPLOAD_SESSION_EXPIRY_HOURS are removed by `purge_upload_sessions`.
+UPLOAD_SESSION_DIR = ".sessions"
+UPLOAD_SESSION_MAX_CHUNK_BYTES = 8 * 1024 * 1024
+UPLOAD_SESSION_EXPIRY_HOURS = 24
+
+# Resized image variants served by /api/images/<id>/variant, cached on disk under
+# MEDIA_ROOT/IMAGE_VARIANT_DIR. Only the listed widths are rendered.
+IMAGE_VARIANT_DIR = "variants"
+IMAGE_VARIANT_WIDTHS = [160, 320, 640, 960, 1280, 1920]
+IMAGE_VARIANT_DEFAULT_QUALITY = 75
+# Requested qualities snap to the nearest of these, so each image has a bounded
+# number of variants on disk.
+IMAGE_VARIANT_QUALITIES = [50, 75, 90]
+IMAGE_VARIANT_WORKERS = 2
+# Variant width of the thumbnails in image listings.
+IMAGE_THUMBNAIL_WIDTH = 320
+
+# Per-slug sprite atlas of the deck images (`?sprite=1` on the deck list),
+# stored under MEDIA_ROOT/DECK_SPRITE_DIR and rebuilt after deck writes in a
+# background worker unless DECK_SPRITE_BACKGROUND is off.
+DECK_SPRITE_DIR = "sprites"
+DECK_SPRITE_TILE_WIDTH = 320
+DECK_SPRITE_MAX_WIDTH = 2048
+DECK_SPRITE_QUALITY = 80
+DECK_SPRITE_BACKGROUND = True
+# Superseded atlases stay this long for cached responses (read cache, clients,
+# the SSR page cache) still naming them; `build_deck_sprites` deletes them after.
+DECK_SPRITE_RETENTION_HOURS = 24
+# Decks whose image /api/preload/<slug> hints, in deck list order.
+PRELOAD_DECK_IMAGES = 3
+# Most operations one /api/auth/batch/ request may carry.
+BATCH_MAX_OPERATIONS = 500
+# /api/auth/changes/ cursors point this far back, so rows written by
+# transactions still open when the changes were read are sent next time.
+CHANGES_CURSOR_OVERLAP_SECONDS = 5
+# Tombstones older than this are removed by `prune_tombstones`; cursors older
+# than this get the full state of the slug again.
+CHANGES_TOMBSTONE_DAYS = 30
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,194 @@
+"""
+Helpers for the per-endpoint query budget tests.
+
+`seed_slug` builds a realistic slug (background, pages, decks with cards and
+project pages) at a given size; `QueryBudgetMixin` runs one request against
+every size in SEED_SIZES and checks the query count stays within the budget
+declared on the view and does not grow with the number of rows.
+"""
+
+import io
+import shutil
+import tempfile
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from PIL import Image
+
+from administration.models import ImageUpload
+from portfolio.models import BackgroundData, Deck, PagesModel, ProjectCard, SlugEntry
+from shmooz.query_budget import get_query_budget
+
+SEED_SIZES = (2, 12)
+
+PAGE_CONTENT = [
+    {
+        "id": "block-1",
+        "gridTemplateColumns": "1fr 1fr",
+        "gridTemplateRows": "auto",
+        "content": [
+            {
+                "id": "text-1",
+                "type": "text",
+                "text": "Hello",
+                "rowStart": 1,
+                "colStart": 1,
+            },
+        ],
+    }
+]
+
+
+def png_bytes(size=(4, 4), color="#336699"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def png_upload(name="upload.png", **kwargs):
+    return SimpleUploadedFile(name, png_bytes(**kwargs), content_type="image/png")
+
+
+def seed_slug(slug, size):
+    """
+    Creates `slug` with `size` decks of `size` project cards each, a project
+    page per card, both navigation pages and its background data.
+    """
+    entry = SlugEntry.objects.create(slug=slug)
+    background = BackgroundData.objects.create(
+        owner=entry,
+        color1="#000000",
+        color2="#111111",
+        color3="#222222",
+        position1="0%",
+        position2="50%",
+        position3="100%",
+        page1="About",
+        page2="Contact",
+    )
+    images = ImageUpload.objects.bulk_create(
+        ImageUpload(title=f"{slug}-{i}", owner=entry, image=f"uploads/{slug}/{i}.png")
+        for i in range(2 * size)
+    )
+    decks = Deck.objects.bulk_create(
+        Deck(
+            title=f"deck-{i}",
+            displayed_name=f"Deck {i}",
+            owner=entry,
+            image=images[2 * i],
+            hover_img=images[2 * i + 1],
+            card_amount=3,
+            x_offsets=[0.0, 1.0, 2.0],
+            y_offsets=[0.0, 1.0, 2.0],
+            rotations=[0.0, 1.0, 2.0],
+            alphas=[1.0, 1.0, 1.0],
+            brightness=[1.0, 1.0, 1.0],
+            text_color="#ffffff",
+            hover_color="#000000",
+        )
+        for i in range(size)
+    )
+    cards = ProjectCard.objects.bulk_create(
+        ProjectCard(
+            title=f"card-{i}",
+            text="text",
+            text_color="#ffffff",
+            label_letter="C",
+            label_color="#000000",
+            inline_color="#cccccc",
+            owner=entry,
+            image=images[i % len(images)],
+            deck=deck,
+        )
+        for deck in decks
+        for i in range(size)
+    )
+    pages = PagesModel.objects.bulk_create(
+        [
+            PagesModel(owner=entry, category="page_one", content=PAGE_CONTENT),
+            PagesModel(owner=entry, category="page_two", content=PAGE_CONTENT),
+        ]
+        + [
+            PagesModel(
+                owner=entry,
+                category=f"project_{card.id}",
+                content=PAGE_CONTENT,
+                project_card=card,
+            )
+            for card in cards
+        ]
+    )
+    return SimpleNamespace(
+        slug=slug,
+        entry=entry,
+        background=background,
+        images=images,
+        decks=decks,
+        cards=cards,
+        pages=pages,
+    )
+
+
+class TemporaryMediaRootMixin:
+    """TestCase mixin pointing MEDIA_ROOT at a directory removed afterwards."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+
+class QueryBudgetMixin:
+    """TestCase mixin; `self.client` is used for the requests."""
+
+    def assertQueryBudget(self, build_request, status_code=200):
+        """
+        `build_request(fixture)` returns `(method, path, kwargs)` for a slug
+        seeded by `seed_slug`. The request runs once per seed size inside a
+        rolled back transaction, with the read cache cleared beforehand.
+        """
+        counts = {}
+        for size in SEED_SIZES:
+            with transaction.atomic():
+                fixture = seed_slug(f"budget-{size}", size)
+                method, path, kwargs = build_request(fixture)
+                budget = get_query_budget(resolve(urlsplit(path).path).func)
+                cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    response = getattr(self.client, method)(path, **kwargs)
+                transaction.set_rollback(True)
+
+            self.assertEqual(
+                response.status_code,
+                status_code,
+                f"{method.upper()} {path} returned {response.status_code}",
+            )
+            self.assertIsNotNone(budget, f"{path} declares no query budget")
+            queries = [query["sql"] for query in captured.captured_queries]
+            self.assertLessEqual(
+                len(queries),
+                budget,
+                f"{method.upper()} {path} ran {len(queries)} queries, over its "
+                f"budget of {budget}:\n" + "\n".join(queries),
+            )
+            counts[size] = len(queries)
+
+        self.assertEqual(
+            len(set(counts.values())),
+            1,
+            f"query count grows with the seeded rows: {counts}",
+        )
@@ -0,0 +1,126 @@
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
+from uuid import UUID
+
+import msgpack
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import URLPattern, get_resolver
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from portfolio.models import SlugEntry
+from portfolio.views import SlugListView
+
+from .query_budget import QueryBudgetExceeded, get_query_budget
+from .renderers import ORJSONRenderer
+
+# Schema and docs endpoints are generated by drf-spectacular; media files are
+# served by Django's static() helper in DEBUG only.
+UNBUDGETED_ROUTES = {"schema", "swagger-ui"}
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_every_route_declares_a_budget(self):
+        for pattern in get_resolver().url_patterns:
+            if not isinstance(pattern, URLPattern) or pattern.name in UNBUDGETED_ROUTES:
+                continue
+            if pattern.callback.__module__ == "django.views.static":
+                continue
+            with self.subTest(route=str(pattern.pattern)):
+                self.assertIsNotNone(get_query_budget(pattern.callback))
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_middleware_raises_over_budget(self):
+        with mock.patch.object(SlugListView, "query_budget", 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                APIClient().get("/api/slugs/")
+
+    def test_middleware_logs_over_budget(self):
+        with mock.patch.object(SlugListView, "query_budget", 0):
+            with self.assertLogs("shmooz.query_budget", "WARNING"):
+                response = APIClient().get("/api/slugs/")
+        self.assertEqual(response.status_code, 200)
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_header_and_log_line(self):
+        with self.assertLogs("shmooz.server_timing", "INFO") as logs:
+            response = APIClient().get("/api/slugs/")
+
+        metrics = {
+            entry.split(";")[0]: entry
+            for entry in response["Server-Timing"].split(", ")
+        }
+        self.assertEqual(list(metrics), ["db", "serialize", "render", "total"])
+        self.assertIn('desc="2 queries"', metrics["db"])
+        self.assertEqual(logs.records[0].queries, 2)
+        self.assertEqual(logs.records[0].status, 200)
+        self.assertGreater(logs.records[0].render_ms, 0)
+
+    def test_cached_responses_are_timed(self):
+        client = APIClient()
+        client.get("/api/slugs/")
+        response = client.get("/api/slugs/")
+        self.assertEqual(response["X-Read-Cache"], "HIT")
+        self.assertIn('desc="0 queries"', response["Server-Timing"])
+
+
+class RendererTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_orjson_output_matches_the_json_renderer(self):
+        data = {
+            "aware": datetime(2025, 8, 19, 16, 13, 5, 123456, tzinfo=timezone.utc),
+            "naive": datetime(2025, 8, 19, 16, 13, 5),
+            "date": date(2025, 8, 19),
+            "time": time(16, 13, 5, 123456),
+            "duration": timedelta(seconds=90),
+            "decimal": Decimal("1.10"),
+            "uuid": UUID("12345678-1234-5678-1234-567812345678"),
+            "floats": [0.1, 1.0, -3.3, 123456789.12345679],
+            "text": 'caf\u00e9 \u2028 \u2029 \U0001f600 "quoted"',
+            "nested": [{"a": None, "b": True, "c": []}, {}],
+            "errors": {0: ["Invalid."], 2: ["Required."]},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_exponent_floats_only_differ_in_format(self):
+        data = {"values": [1e-7, 1e16, 2.5e-300]}
+        fast = ORJSONRenderer().render(data)
+        self.assertEqual(json.loads(fast), json.loads(JSONRenderer().render(data)))
+
+    def test_indented_output_is_left_to_the_json_renderer(self):
+        data = {"a": [1, 2]}
+        media_type = "application/json; indent=2"
+        self.assertEqual(
+            ORJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
+
+    def test_msgpack_is_negotiated(self):
+        SlugEntry.objects.create(slug="packed")
+        client = APIClient()
+        expected = client.get("/api/slugs/", HTTP_ACCEPT="application/json").json()
+
+        for query, accept in (
+            ("", "application/msgpack"),
+            ("?format=msgpack", "*/*"),
+        ):
+            with self.subTest(query=query, accept=accept):
+                response = client.get(f"/api/slugs/{query}", HTTP_ACCEPT=accept)
+                self.assertEqual(response["Content-Type"], "application/msgpack")
+                self.assertEqual(msgpack.unpackb(response.content), expected)
+
+        response = client.get("/api/slugs/", HTTP_ACCEPT="*/*")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("Accept", response["Vary"])
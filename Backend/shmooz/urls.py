@@ -34,6 +34,9 @@ from administration.views import (
     AdminApiView,
     BackgroundDataUpdateDeleteView,
     BackgroundDataUploadView,
+    BatchView,
+    BulkImageUploadView,
+    ChangesView,
     CookieTokenObtainPairView,
     CookieTokenRefreshView,
     CSRFCookieView,
@@ -45,8 +48,12 @@ from administration.views import (
     PageUploadView,
     ProjectCardCreateView,
     ProjectCardUpdateDeleteView,
+    ReadCacheStatsView,
     SlugCreateView,
     SlugEntryUpdateDeleteView,
+    UploadSessionCreateView,
+    UploadSessionFinalizeView,
+    UploadSessionView,
 )
 from portfolio.sitemaps import (
     PageOneSitemap,
@@ -58,13 +65,24 @@ from portfolio.views import (
     DeckListView,
     GradientColorView,
     ImageListView,
+    ImageVariantView,
     PageDetailsView,
     PageFetchView,
     PageNamesView,
+    PreloadHintsView,
     ProjectCardListView,
     ProjectPageFetchView,
+    SlugBootstrapView,
     SlugListView,
 )
+from shmooz.query_budget import query_budget
+
+sitemaps = {
+    "slugs": SlugRootSitemap,
+    "page_one": PageOneSitemap,
+    "page_two": PageTwoSitemap,
+    "project_pages": ProjectPageSitemap,
+}
 
 urlpatterns = [
     path("api/token/", CookieTokenObtainPairView.as_view(), name="token_obtain_pair"),
@@ -72,6 +90,11 @@ urlpatterns = [
     path("api/auth/logout/", LogoutView.as_view(), name="logout"),
     path("api/auth/", AdminApiView.as_view(), name="Admin_actions"),
     path("api/auth/csrf/", CSRFCookieView.as_view(), name="csrf_cookie"),
+    path(
+        "api/auth/read-cache/",
+        ReadCacheStatsView.as_view(),
+        name="read_cache_stats",
+    ),
     path(
         "api/auth/create_deck/<str:slug>",
         DeckCreateView.as_view(),
@@ -113,10 +136,38 @@ urlpatterns = [
         name="background_data_upload",
     ),
     path("api/auth/create_slug/", SlugCreateView.as_view(), name="slug_create"),
+    path("api/auth/batch/", BatchView.as_view(), name="batch"),
+    path("api/auth/changes/<str:slug>", ChangesView.as_view(), name="changes"),
     path("api/auth/upload_page/", PageUploadView.as_view(), name="upload_page"),
     path("api/upload-image/<str:slug>", ImageUploadView.as_view()),
     path("api/upload-image/", ImageUploadView.as_view()),
+    path("api/upload-images/<str:slug>", BulkImageUploadView.as_view()),
+    path(
+        "api/upload-images/",
+        BulkImageUploadView.as_view(),
+        name="bulk_image_upload",
+    ),
+    path(
+        "api/upload-sessions/<uuid:pk>",
+        UploadSessionView.as_view(),
+        name="upload_session",
+    ),
+    path(
+        "api/upload-sessions/<uuid:pk>/finalize",
+        UploadSessionFinalizeView.as_view(),
+        name="upload_session_finalize",
+    ),
+    path(
+        "api/upload-sessions/",
+        UploadSessionCreateView.as_view(),
+        name="upload_session_create",
+    ),
     path("api/slugs/", SlugListView.as_view(), name="slug_list"),
+    path(
+        "api/bootstrap/<slug:slug>",
+        SlugBootstrapView.as_view(),
+        name="slug_bootstrap",
+    ),
     path(
         "api/gradient-colors/<str:slug>",
         GradientColorView.as_view(),
@@ -148,13 +199,24 @@ urlpatterns = [
         name="project_page_handler",
     ),
     path("api/deck/<slug:slug>", DeckListView.as_view(), name="get_deck_sluged"),
+    path("api/preload/<slug:slug>", PreloadHintsView.as_view(), name="preload_hints"),
     path(
         "api/projects/<slug:slug>",
         ProjectCardListView.as_view(),
         name="get_projects_sluged",
     ),
     path("api/images/", ImageListView.as_view(), name="image_list"),
-    path("sitemap.xml", sitemap, {"sitemaps": sitemap}, name="django-sitemap"),
+    path(
+        "api/images/<int:pk>/variant",
+        ImageVariantView.as_view(),
+        name="image_variant",
+    ),
+    path(
+        "sitemap.xml",
+        query_budget(8)(sitemap),
+        {"sitemaps": sitemaps},
+        name="django-sitemap",
+    ),
 ]
 
 urlpatterns += [
@@ -10,7 +10,7 @@ import { MatInputModule } from '@angular/material/input';
 import { MatProgressSpinnerModule } from '@angular/material/progress-spinner';
 import { MatTabsModule } from '@angular/material/tabs';
 
-import { ImageDto, ImageService, Page } from './image.service';
+import { CursorPage, ImageDto, ImageService } from './image.service';
 
 export interface ImagePickResult {
   id: number;
@@ -42,7 +42,9 @@ export class ImagePickerDialogComponent implements OnInit {
   data = inject<{ ownerSlug: string }>(MAT_DIALOG_DATA);
 
   limit = 40;
-  pageOffset = 0;
+  pageNumber = 1;
+  nextCursor: string | null = null;
+  previousCursor: string | null = null;
   images: ImageDto[] = [];
   loading = signal(false);
   uploading = signal(false);
@@ -80,27 +82,34 @@ export class ImagePickerDialogComponent implements OnInit {
     return `https://127.0.0.1:8080${path}`;
   }
 
-  load() {
+  load(cursor: string | null = null) {
     this.loading.set(true);
-    this.imagesApi.listImages(this.limit, this.pageOffset).subscribe((page: Page<ImageDto>) => {
-      this.images = page.results;
-      this.loading.set(false);
-    });
+    this.imagesApi
+      .listImages(this.data.ownerSlug, this.limit, cursor)
+      .subscribe((page: CursorPage<ImageDto>) => {
+        this.images = page.results;
+        this.nextCursor = this.imagesApi.cursorOf(page.next);
+        this.previousCursor = this.imagesApi.cursorOf(page.previous);
+        this.loading.set(false);
+      });
   }
 
   hasNext() {
-    return this.images.length === this.limit;
+    return this.nextCursor !== null;
+  }
+  hasPrevious() {
+    return this.pageNumber > 1;
   }
   nextPage() {
     if (this.hasNext()) {
-      this.pageOffset += this.limit;
-      this.load();
+      this.pageNumber += 1;
+      this.load(this.nextCursor);
     }
   }
   prevPage() {
-    if (this.pageOffset > 0) {
-      this.pageOffset -= this.limit;
-      this.load();
+    if (this.hasPrevious()) {
+      this.pageNumber -= 1;
+      this.load(this.previousCursor);
     }
   }
 
@@ -8,12 +8,17 @@ import { ApiService } from '../../services/api.service';
 export interface ImageDto {
   id: number;
   title: string;
+  owner: string;
   image: string;
+  thumbnail: string;
+  width: number | null;
+  height: number | null;
+  dominant_color: string;
+  usage_count: number;
   uploaded_at: string;
 }
 
-export interface Page<T> {
-  count: number;
+export interface CursorPage<T> {
   next: string | null;
   previous: string | null;
   results: T[];
@@ -24,18 +29,28 @@ export class ImageService {
   private http = inject(HttpClient);
   private api = inject(ApiService);
 
-  listImages(limit = 40, offset = 0, ordering = '-uploaded_at'): Observable<Page<ImageDto>> {
-    const url = this.api.buildUrl(
-      `images/?limit=${limit}&offset=${offset}&ordering=${encodeURIComponent(ordering)}`,
-    );
-    return this.http.get<Page<ImageDto>>(url).pipe(
+  /** Newest images of a slug; `cursor` comes from a previous page's next/previous link. */
+  listImages(
+    ownerSlug: string,
+    limit = 40,
+    cursor: string | null = null,
+  ): Observable<CursorPage<ImageDto>> {
+    const params = new URLSearchParams({ slug: ownerSlug, limit: String(limit) });
+    if (cursor) params.set('cursor', cursor);
+    const url = this.api.buildUrl(`images/?${params}`);
+    return this.http.get<CursorPage<ImageDto>>(url).pipe(
       catchError((err) => {
         console.error('List images failed', err);
-        return of({ count: 0, next: null, previous: null, results: [] });
+        return of({ next: null, previous: null, results: [] });
       }),
     );
   }
 
+  /** Cursor parameter of a next/previous link. */
+  cursorOf(link: string | null): string | null {
+    return link ? new URL(link).searchParams.get('cursor') : null;
+  }
+
   uploadImage(ownerSlug: string, title: string, file: File): Observable<ImageDto | null> {
     const url = this.api.buildUrl(`upload-image/${encodeURIComponent(ownerSlug)}`);
     const form = new FormData();
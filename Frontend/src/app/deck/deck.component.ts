@@ -2,9 +2,19 @@ import { CommonModule, NgOptimizedImage } from '@angular/common';
 import { Component, ElementRef, EventEmitter,Input, Output, ViewChild } from '@angular/core';
 import { inject } from '@angular/core';
 
-import { Deck } from '../services/deck.service';
+import { Deck, DeckSprite } from '../services/deck.service';
 import { PlatformService } from '../services/platform.service';
 
+// Size of a card, as in deck.component.css.
+const CARD_WIDTH = 269;
+const CARD_HEIGHT = 192;
+
+interface CardBackground {
+  image: string;
+  size: string;
+  position: string;
+}
+
 @Component({
   standalone: true,
   selector: 'app-deck',
@@ -17,6 +27,8 @@ export class DeckComponent {
   displayName: string = '';
   imageUrl: string = '';
   hoverImg: string = '';
+  cardBackground: CardBackground | null = null;
+  hoverTile: Record<string, string> | null = null;
   card_amount: number = 4;
   x_offsets: number[] = [];
   y_offsets: number[] = [];
@@ -44,6 +56,8 @@ export class DeckComponent {
     this.displayName = value.displayed_name;
     this.imageUrl = this.getImageUrl(value.image_url || '');
     this.hoverImg = value.hover_img_url ? this.getImageUrl(value.hover_img_url) : '';
+    this.cardBackground = this.spriteBackground(value.sprite);
+    this.hoverTile = this.hoverImg ? this.spriteHoverTile(value.sprite) : null;
     this.card_amount = value.card_amount ?? 4;
     this.x_offsets = this.ensure(value.x_offsets, [3, 5, 1, -10]);
     this.y_offsets = this.ensure(value.y_offsets, [1, 0, 4, 1]);
@@ -91,6 +105,55 @@ export class DeckComponent {
     return `rgba(${r}, ${g}, ${b}, ${alpha})`;
   }
 
+  /**
+   * Paints the cover and stacked cards from the slug's deck atlas when it
+   * holds the deck image, scaled and offset like `background-size: cover` would.
+   */
+  spriteBackground(sprite: DeckSprite | null | undefined): CardBackground | null {
+    const tile = sprite?.image;
+    if (!sprite || !tile) return null;
+
+    const scale = Math.max(CARD_WIDTH / tile.width, CARD_HEIGHT / tile.height);
+    const x = tile.x * scale + (tile.width * scale - CARD_WIDTH) / 2;
+    const y = tile.y * scale + (tile.height * scale - CARD_HEIGHT) / 2;
+    return {
+      image: `url('${this.getImageUrl(sprite.url)}')`,
+      size: `${sprite.width * scale}px ${sprite.height * scale}px`,
+      position: `${-x}px ${-y}px`,
+    };
+  }
+
+  /**
+   * Box and background painting the hover image from the deck atlas, fitted
+   * into the card like `object-fit: contain` would.
+   */
+  spriteHoverTile(sprite: DeckSprite | null | undefined): Record<string, string> | null {
+    const tile = sprite?.hover_img;
+    if (!sprite || !tile) return null;
+
+    const scale = Math.min(CARD_WIDTH / tile.width, CARD_HEIGHT / tile.height);
+    const width = tile.width * scale;
+    const height = tile.height * scale;
+    return {
+      left: `${(CARD_WIDTH - width) / 2}px`,
+      top: `${(CARD_HEIGHT - height) / 2}px`,
+      width: `${width}px`,
+      height: `${height}px`,
+      'background-image': `url('${this.getImageUrl(sprite.url)}')`,
+      'background-size': `${sprite.width * scale}px ${sprite.height * scale}px`,
+      'background-position': `${-tile.x * scale}px ${-tile.y * scale}px`,
+    };
+  }
+
+  get coverStyle(): Record<string, string> {
+    const background = this.cardBackground!;
+    return {
+      'background-image': background.image,
+      'background-size': background.size,
+      'background-position': background.position,
+    };
+  }
+
   hovered = false;
 
   getDeckCardsStyle(card: number): Record<string, string> {
@@ -107,9 +170,18 @@ export class DeckComponent {
 
     const index = 40 - 10 * idx;
 
+    const shade = `linear-gradient(rgba(0,0,0,${alpha}), rgba(0,0,0,${alpha}))`;
+    const background = this.cardBackground
+      ? {
+          'background-image': `${shade}, ${this.cardBackground.image}`,
+          'background-size': `cover, ${this.cardBackground.size}`,
+          'background-position': `center, ${this.cardBackground.position}`,
+        }
+      : { 'background-image': `${shade}, url('${this.imageUrl}')` };
+
     return {
       'z-index': `${index}`,
-      'background-image': `linear-gradient(rgba(0,0,0,${alpha}), rgba(0,0,0,${alpha})), url('${this.imageUrl}')`,
+      ...background,
       transform: `translateX(${x_offset}px) translateY(${y_offset}px) rotate(${rotation}deg)`,
       filter: `brightness(${brightness}) blur(${blur}px)`,
     };
@@ -10,6 +10,22 @@ interface PaginatedResponse<T> {
   results: T[];
 }
 
+export interface SpriteTile {
+  x: number;
+  y: number;
+  width: number;
+  height: number;
+}
+
+/** Where a deck's images sit in the deck image atlas of its slug. */
+export interface DeckSprite {
+  url: string;
+  width: number;
+  height: number;
+  image: SpriteTile | null;
+  hover_img: SpriteTile | null;
+}
+
 export interface Deck {
   id: string;
   title: string;
@@ -30,6 +46,7 @@ export interface Deck {
   hover_brightness?: number[];
   hover_color?: string;
   text_color: string;
+  sprite?: DeckSprite | null;
 }
 
 @Injectable({
@@ -56,7 +73,7 @@ export class DeckService {
   }
 
   getDecks(path: string): Observable<Deck[]> {
-    const endpoint = path ? this.api.buildUrl(`deck/${path}`) : this.api.buildUrl(`deck/shmooz`);
+    const endpoint = this.api.buildUrl(`deck/${path || 'shmooz'}?sprite=1`);
     return this.http
       .get<PaginatedResponse<Deck>>(endpoint)
       .pipe(map((res: PaginatedResponse<Deck>) => res?.results ?? []));
@@ -122,6 +122,79 @@ class LRUCache {
 
 const ssrCache = new LRUCache(SSR_CACHE_MAX_ENTRIES, SSR_CACHE_MAX_BYTES);
 
+// Preload hints come from /api/preload/<slug>; they are sent as 103 Early Hints
+// where Node supports it and as a Link header on the page response.
+const API_ORIGIN = process.env['API_ORIGIN'] || 'http://backend:8000';
+const EARLY_HINTS = process.env['EARLY_HINTS'] !== 'off';
+const PRELOAD_TTL_MS = parseInt(process.env['PRELOAD_TTL_MS'] || '60000', 10);
+const PRELOAD_TIMEOUT_MS = 150;
+const preloadCache = new Map<string, { links: string[]; expires: number }>();
+
+// First path segments that are not landing pages; see app.routes.ts.
+const RESERVED_SEGMENTS = new Set([
+  'login',
+  'dashboard',
+  'admin',
+  'page_one',
+  'page_two',
+  'project_page',
+]);
+
+function landingSlug(req: import('express').Request): string | null {
+  if (req.path === '/') {
+    const slug = req.query['slug'];
+    return typeof slug === 'string' && slug ? slug : 'shmooz';
+  }
+  // Landing pages render at /:slug.
+  const match = /^\/([^/]+)\/?$/.exec(req.path);
+  if (!match) return null;
+  let slug: string;
+  try {
+    slug = decodeURIComponent(match[1]);
+  } catch {
+    return null;
+  }
+  return RESERVED_SEGMENTS.has(slug) ? null : slug;
+}
+
+async function preloadLinks(slug: string): Promise<string[]> {
+  const cached = preloadCache.get(slug);
+  if (cached && cached.expires > Date.now()) return cached.links;
+
+  let links: string[] = [];
+  try {
+    const res = await fetch(`${API_ORIGIN}/api/preload/${encodeURIComponent(slug)}`, {
+      signal: AbortSignal.timeout(PRELOAD_TIMEOUT_MS),
+    });
+    if (res.ok) links = ((await res.json()) as { links?: string[] }).links ?? [];
+  } catch {
+    // Hints are an optimization; render without them.
+  }
+  preloadCache.set(slug, { links, expires: Date.now() + PRELOAD_TTL_MS });
+  return links;
+}
+
+function writePreloadHints(res: import('express').Response, links: string[]) {
+  if (!links.length || res.headersSent) return;
+  if (EARLY_HINTS && typeof res.writeEarlyHints === 'function') {
+    res.writeEarlyHints({ link: links });
+  }
+  res.setHeader('Link', links.join(', '));
+}
+
+// Never waits: fresh hints are written at once, others when the fetch
+// answers, if the response has not been sent by then.
+function sendPreloadHints(req: import('express').Request, res: import('express').Response) {
+  const slug = landingSlug(req);
+  if (!slug) return;
+  const cached = preloadCache.get(slug);
+  if (cached && cached.expires > Date.now()) {
+    writePreloadHints(res, cached.links);
+    return;
+  }
+  void preloadLinks(slug).then((links) => writePreloadHints(res, links));
+}
+
 function getOrigin(req: import('express').Request): string {
   const proto = (req.headers['x-forwarded-proto'] as string) || req.protocol || 'http';
   const host = req.headers.host || 'localhost:4000';
@@ -200,6 +273,7 @@ app.post('/__admin/ssr-cache/invalidate', requireAdminKey, (req, res): void => {
   if (k === 'deck') {
     // Decks render on /:slug
     toDelete = [`/${slug}`];
+    preloadCache.delete(slug);
   }
 
   if (k === 'page') {
@@ -319,6 +393,8 @@ app.get('**', async (req, res, next): Promise<void> => {
     const origin = getOrigin(req);
     const key = normPath(req.originalUrl);
 
+    sendPreloadHints(req, res);
+
     const cached = ssrCache.get(key);
     if (cached?.html) {
       res.set('X-SSR-Cache', 'HIT');